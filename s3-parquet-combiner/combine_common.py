@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Shared Combiner Pieces
+
+The few definitions both the combiner and the verifier need: where the combiner
+keeps its manifests, and the byte budget both use to cap the data that concurrent
+work holds in memory. Kept apart so neither script imports the other.
+
+"""
+
+import threading
+
+MANIFEST_DIR = '_combine_manifest'  # Per-group manifests live under {prefix}{MANIFEST_DIR}/
+
+
+class ByteBudget:
+    """
+    Blocking byte counter used to cap how much data concurrent work holds in memory
+
+    A request larger than the whole budget is clamped to the budget so that it can
+    still run, just not alongside anything else.
+    """
+
+    def __init__(self, limit_bytes: int):
+        self.limit_bytes = max(1, int(limit_bytes))
+        self.in_use = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, nbytes: int) -> int:
+        """Block until nbytes fit in the budget; returns the amount actually reserved"""
+        reserved = min(max(0, int(nbytes)), self.limit_bytes)
+        with self._condition:
+            while self.in_use + reserved > self.limit_bytes:
+                self._condition.wait()
+            self.in_use += reserved
+        return reserved
+
+    def release(self, reserved: int):
+        """Return a reservation made by acquire()"""
+        with self._condition:
+            self.in_use -= reserved
+            self._condition.notify_all()
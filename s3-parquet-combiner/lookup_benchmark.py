@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Point Lookup Benchmark
+
+Measures what bloom filters and sorting buy point lookups by id on a local synthetic
+table laid out the way the combiner writes it. For every layout it reports the file
+size, how many row groups and bytes a lookup has to read, and the lookup latency,
+for ids that are in the table and ids that aren't. Lookups go through
+parquet_bloom.lookup(), which prunes row groups by min/max statistics and, where
+the file has them, by bloom filters.
+
+PyArrow doesn't read page indexes, so for the page index layout only the size cost
+shows here; engines that do read them (Spark, Trino, DuckDB) also skip pages within
+the row groups that are left.
+
+Usage:
+    python3 lookup_benchmark.py [--rows N] [--row-group-rows N] [--lookups N] [--seed N]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from parquet_bloom import DEFAULT_BLOOM_FILTER_FPP, bloom_filter_options, candidate_row_groups, lookup
+
+MB = 1024 * 1024
+
+
+def synthetic_table(rows: int, seed: int) -> pa.Table:
+    """A tasks-like table keyed by unique, unordered ids drawn from twice their count"""
+    rng = np.random.default_rng(seed)
+    ids = rng.choice(2 * rows, size=rows, replace=False).astype(np.int64)
+    return pa.table({
+        'id': ids,
+        'user_id': rng.integers(0, rows // 50 + 1, rows),
+        'created_at': pa.array(rng.integers(1_500_000_000_000, 1_700_000_000_000, rows), pa.timestamp('ms')),
+        'score': rng.random(rows),
+        'status': pa.array(rng.choice(['open', 'done', 'skipped'], rows)),
+    })
+
+
+def layouts(table: pa.Table, row_group_rows: int) -> Dict[str, dict]:
+    """Writer options per layout, as the combiner would resolve them for --bloom-filters id etc."""
+    bloom = bloom_filter_options([('id', DEFAULT_BLOOM_FILTER_FPP)], min(table.num_rows, row_group_rows))
+    return {
+        'plain': {'table': table, 'options': {}},
+        'bloom filter': {'table': table, 'options': {'bloom_filter_options': bloom}},
+        'bloom + page index': {'table': table, 'options': {'bloom_filter_options': bloom, 'write_page_index': True}},
+        'sorted by id': {'table': table.sort_by('id'), 'options': {}},
+    }
+
+
+def bytes_read(metadata: pq.FileMetaData, probed: List[int], row_groups: List[int]) -> int:
+    """Bytes a lookup reads besides the footer: the bloom filters it probes and the row groups it keeps"""
+    total = 0
+    for i in row_groups:
+        row_group = metadata.row_group(i)
+        total += sum(row_group.column(j).total_compressed_size for j in range(row_group.num_columns))
+    return total + sum(metadata.row_group(i).column(0).bloom_filter_length or 0 for i in probed)
+
+
+def time_lookups(path: str, keys: List[int]) -> dict:
+    """Look every key up in a freshly opened file; returns latency and read statistics"""
+    latencies, row_groups, read, found = [], [], [], 0
+    for key in keys:
+        start = time.perf_counter()
+        with open(path, 'rb') as f:
+            found += lookup(f, 'id', key).num_rows
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        with open(path, 'rb') as f:
+            metadata = pq.read_metadata(f)
+            probed = candidate_row_groups(f, metadata, 'id', key, use_bloom_filters=False)
+            candidates = candidate_row_groups(f, metadata, 'id', key)
+        row_groups.append(len(candidates))
+        read.append(bytes_read(metadata, probed, candidates))
+
+    latencies.sort()
+    return {
+        'found': found,
+        'row_groups': statistics.mean(row_groups),
+        'mb_read': statistics.mean(read) / MB,
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare point lookup latency across Parquet layouts')
+    parser.add_argument('--rows', type=int, default=2_000_000, help='Rows in the synthetic table')
+    parser.add_argument('--row-group-rows', type=int, default=64 * 1024, help='Rows per row group')
+    parser.add_argument('--lookups', type=int, default=100, help='Lookups per layout, of each kind')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the table and the keys')
+    args = parser.parse_args()
+
+    table = synthetic_table(args.rows, args.seed)
+    ids = table.column('id').to_numpy()
+    rng = random.Random(args.seed)
+    present = [int(ids[rng.randrange(len(ids))]) for _ in range(args.lookups)]
+    id_set = set(ids.tolist())
+    absent = []
+    while len(absent) < args.lookups:
+        key = rng.randrange(2 * args.rows)
+        if key not in id_set:
+            absent.append(key)
+
+    print("=" * 80)
+    print(f"POINT LOOKUP BENCHMARK ({args.rows:,} rows, {args.row_group_rows:,} rows per row group, "
+          f"{args.lookups} lookups of each kind, seed {args.seed})")
+    print("=" * 80)
+
+    with tempfile.TemporaryDirectory(prefix='lookup-benchmark-') as directory:
+        results = {}
+        for name, layout in layouts(table, args.row_group_rows).items():
+            path = os.path.join(directory, name.replace(' ', '_') + '.parquet')
+            pq.write_table(layout['table'], path, row_group_size=args.row_group_rows, **layout['options'])
+            results[name] = {
+                'size': os.path.getsize(path) / MB,
+                'present': time_lookups(path, present),
+                'absent': time_lookups(path, absent),
+            }
+            assert results[name]['present']['found'] == len(present), f"{name}: lookups missed rows"
+            assert results[name]['absent']['found'] == 0, f"{name}: lookups found absent ids"
+
+        for kind in ('present', 'absent'):
+            print(f"\nids {kind} in the table:")
+            print(f"  {'layout':<20} {'file MB':>8} {'row groups':>11} {'MB read':>8} {'p50 ms':>8} {'p95 ms':>8}")
+            for name, result in results.items():
+                stats = result[kind]
+                print(f"  {name:<20} {result['size']:>8.1f} {stats['row_groups']:>11.2f} {stats['mb_read']:>8.2f} "
+                      f"{stats['p50']:>8.2f} {stats['p95']:>8.2f}")
+
+        baseline = results['plain']['present']['p50']
+        print(f"\nBloom filter lookups of present ids: {baseline / results['bloom filter']['present']['p50']:.1f}x "
+              f"faster at p50, for {results['bloom filter']['size'] / results['plain']['size'] - 1:.1%} more bytes")
+
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Packing Strategy Benchmark
+
+Compares the group packing strategies of s3_parquet_no_download_combiner.py on
+synthetic file size distributions. For every distribution and strategy it checks
+that each file lands in exactly one group and that no multi-file group exceeds the
+target, then reports the number of output files and how evenly sized they are.
+
+Usage:
+    python3 packing_benchmark.py [--seed N] [--target-mb MB]
+"""
+
+import argparse
+import math
+import random
+import statistics
+from typing import Callable, Dict, List, Tuple
+
+from s3_parquet_no_download_combiner import PACKING_STRATEGIES, TARGET_SIZE_MB
+
+MB = 1024 * 1024
+
+
+def lognormal_sizes(rng: random.Random, count: int, median_mb: float, sigma: float) -> List[int]:
+    return [int(rng.lognormvariate(math.log(median_mb * MB), sigma)) for _ in range(count)]
+
+
+# Synthetic size distributions, loosely modelled on the staging export
+DISTRIBUTIONS: Dict[str, Callable[[random.Random], List[int]]] = {
+    # ~363 part files of 1-2 MB, like public.tasks_task_steps
+    'many small parts': lambda rng: lognormal_sizes(rng, 363, 1.6, 0.3),
+    # ~127 files of a few MB with a heavy tail, like public.content_pages
+    'heavy tail': lambda rng: lognormal_sizes(rng, 127, 4.0, 1.0),
+    # Evenly spread sizes up to 100 MB
+    'uniform 1-100 MB': lambda rng: [rng.randint(1 * MB, 100 * MB) for _ in range(200)],
+    # Mostly tiny files plus a handful of large ones
+    'bimodal': lambda rng: ([rng.randint(1 * MB, 5 * MB) for _ in range(300)] +
+                            [rng.randint(150 * MB, 400 * MB) for _ in range(12)]),
+}
+
+
+def make_files(sizes: List[int]) -> List[Tuple[str, int, str]]:
+    return [(f"table/1/part-{i:05d}.parquet", size, '1') for i, size in enumerate(sizes)]
+
+
+def check_groups(files: List[Tuple[str, int, str]], groups: List[list], target_bytes: int):
+    """Fail loudly if a strategy lost, duplicated or overfilled anything"""
+    packed = sorted(file_info[0] for group in groups for file_info in group)
+    assert packed == sorted(file_info[0] for file_info in files), "files lost or duplicated"
+    for group in groups:
+        group_size = sum(size for _, size, _ in group)
+        assert len(group) == 1 or group_size <= target_bytes, f"group of {group_size} bytes exceeds target"
+
+
+def summarize(groups: List[list]) -> dict:
+    sizes_mb = [sum(size for _, size, _ in group) / MB for group in groups]
+    return {
+        'files': len(groups),
+        'mean': statistics.mean(sizes_mb),
+        'stdev': statistics.pstdev(sizes_mb),
+        'min': min(sizes_mb),
+        'max': max(sizes_mb),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare combiner packing strategies on synthetic data')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the synthetic sizes')
+    parser.add_argument('--target-mb', type=int, default=TARGET_SIZE_MB, help='Target output size in MB')
+    args = parser.parse_args()
+
+    target_bytes = args.target_mb * MB
+
+    print("=" * 80)
+    print(f"PACKING STRATEGY BENCHMARK (target {args.target_mb} MB, seed {args.seed})")
+    print("=" * 80)
+
+    for name, generate in DISTRIBUTIONS.items():
+        files = make_files(generate(random.Random(args.seed)))
+        total_mb = sum(size for _, size, _ in files) / MB
+        lower_bound = math.ceil(total_mb / args.target_mb)
+
+        print(f"\n{name}: {len(files)} files, {total_mb:.0f} MB total (lower bound {lower_bound} outputs)")
+        print(f"  {'strategy':<12} {'outputs':>8} {'mean MB':>9} {'stdev MB':>9} {'min MB':>8} {'max MB':>8}")
+
+        for strategy, pack in PACKING_STRATEGIES.items():
+            groups = pack(files, target_bytes)
+            check_groups(files, groups, target_bytes)
+            stats = summarize(groups)
+            print(f"  {strategy:<12} {stats['files']:>8} {stats['mean']:>9.1f} {stats['stdev']:>9.1f} "
+                  f"{stats['min']:>8.1f} {stats['max']:>8.1f}")
+
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Bloom Filters and Point Lookups
+
+Parquet can store a split-block bloom filter for each column chunk, so a lookup of
+one key can skip every row group whose filter rules the key out - including the
+row groups whose min/max statistics can't, which is all of them when the key is an
+unordered id. The combiner writes filters for chosen key columns; this module sizes
+them for the writer, and probes them for readers that don't, PyArrow among them.
+
+Probing follows the Parquet spec: the key's plain encoding is hashed with XXH64
+(seed 0), the top 32 bits pick a 256-bit block and the low 32 bits set one bit in
+each of its eight words.
+
+"""
+
+import struct
+from typing import Dict, List, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from parquet_footer import ThriftCompactReader, get_field
+
+DEFAULT_BLOOM_FILTER_FPP = 0.05  # False-positive probability of a filter (PyArrow's default)
+BLOOM_HEADER_READ_SIZE = 64  # Bytes read for a filter header when the footer doesn't record its length
+
+# BloomFilterHeader field ids (see parquet.thrift)
+BFH_NUM_BYTES = 1
+
+# Salts of the split-block bloom filter, one per 32-bit word of a block
+SALT = (0x47b6137b, 0x44974d91, 0x8824ad5b, 0xa2b7289d, 0x705495c7, 0x2df1424b, 0x9efc4947, 0x5c6bfb31)
+
+MASK64 = (1 << 64) - 1
+PRIME64_1 = 0x9E3779B185EBCA87
+PRIME64_2 = 0xC2B2AE3D27D4EB4F
+PRIME64_3 = 0x165667B19E3779F9
+PRIME64_4 = 0x85EBCA77C2B2AE63
+PRIME64_5 = 0x27D4EB2F165667C5
+
+
+def parse_bloom_filter_spec(spec: str) -> Tuple[str, float]:
+    """
+    Parse 'column' or 'column:fpp' into (column, false-positive probability)
+
+    Raises:
+        ValueError: if the probability isn't a number strictly between 0 and 1
+    """
+    column, _, fpp = spec.partition(':')
+    try:
+        fpp = float(fpp) if fpp else DEFAULT_BLOOM_FILTER_FPP
+    except ValueError:
+        fpp = None
+    if not column or fpp is None or not 0 < fpp < 1:
+        raise ValueError(f"Bloom filter spec '{spec}' must be COLUMN or COLUMN:FPP with 0 < FPP < 1")
+    return column, fpp
+
+
+def bloom_filter_options(specs: List[Tuple[str, float]], rows_per_row_group: int) -> Dict[str, dict]:
+    """
+    bloom_filter_options for pq.ParquetWriter
+
+    A filter covers one column chunk, so each is sized for the distinct values of one
+    row group, taken to be at most its row count; a filter sized for more values
+    than a chunk holds only costs space.
+    """
+    ndv = max(1, int(rows_per_row_group))
+    return {column: {'ndv': ndv, 'fpp': fpp} for column, fpp in specs}
+
+
+def _rotl(value: int, bits: int) -> int:
+    return ((value << bits) | (value >> (64 - bits))) & MASK64
+
+
+def _round(acc: int, lane: int) -> int:
+    acc = (acc + lane * PRIME64_2) & MASK64
+    return (_rotl(acc, 31) * PRIME64_1) & MASK64
+
+
+def _merge_round(acc: int, value: int) -> int:
+    acc ^= _round(0, value)
+    return (acc * PRIME64_1 + PRIME64_4) & MASK64
+
+
+def xxhash64(data: bytes, seed: int = 0) -> int:
+    """XXH64 of data, as Parquet bloom filters hash values"""
+    length = len(data)
+    pos = 0
+    if length >= 32:
+        v1 = (seed + PRIME64_1 + PRIME64_2) & MASK64
+        v2 = (seed + PRIME64_2) & MASK64
+        v3 = seed
+        v4 = (seed - PRIME64_1) & MASK64
+        while pos + 32 <= length:
+            lanes = struct.unpack_from('<4Q', data, pos)
+            v1, v2, v3, v4 = (_round(v, lane) for v, lane in zip((v1, v2, v3, v4), lanes))
+            pos += 32
+        h = (_rotl(v1, 1) + _rotl(v2, 7) + _rotl(v3, 12) + _rotl(v4, 18)) & MASK64
+        for v in (v1, v2, v3, v4):
+            h = _merge_round(h, v)
+    else:
+        h = (seed + PRIME64_5) & MASK64
+
+    h = (h + length) & MASK64
+    while pos + 8 <= length:
+        h ^= _round(0, struct.unpack_from('<Q', data, pos)[0])
+        h = (_rotl(h, 27) * PRIME64_1 + PRIME64_4) & MASK64
+        pos += 8
+    if pos + 4 <= length:
+        h ^= (struct.unpack_from('<I', data, pos)[0] * PRIME64_1) & MASK64
+        h = (_rotl(h, 23) * PRIME64_2 + PRIME64_3) & MASK64
+        pos += 4
+    while pos < length:
+        h ^= (data[pos] * PRIME64_5) & MASK64
+        h = (_rotl(h, 11) * PRIME64_1) & MASK64
+        pos += 1
+
+    h ^= h >> 33
+    h = (h * PRIME64_2) & MASK64
+    h ^= h >> 29
+    h = (h * PRIME64_3) & MASK64
+    h ^= h >> 32
+    return h
+
+
+def stores_count(field_type: pa.DataType) -> bool:
+    """True if Parquet stores values of this Arrow type as an integer count: dates, times, timestamps, durations"""
+    return pa.types.is_temporal(field_type) and not pa.types.is_interval(field_type)
+
+
+def stored_value(value, field_type: pa.DataType):
+    """
+    A key as a column of the given Arrow type (as read from the file's own schema) stores it
+
+    A date, time, timestamp or duration key may be a Python date, time, datetime or
+    timedelta, or already the stored count (days since the epoch, or units of the
+    column's resolution); either way the count is returned. Other keys are returned
+    as they are.
+    """
+    if not stores_count(field_type):
+        return value
+    storage_type = pa.int32() if field_type.bit_width == 32 else pa.int64()
+    return pa.scalar(value, field_type).cast(storage_type).as_py()
+
+
+def plain_bytes(value, physical_type: str) -> bytes:
+    """
+    Plain encoding of a key as a column of the given Parquet physical type stores it
+
+    Keys are given as stored (see stored_value()): an int for INT32/INT64 columns
+    (including dates and timestamps), a float for FLOAT/DOUBLE, str or bytes for
+    BYTE_ARRAY and FIXED_LEN_BYTE_ARRAY.
+
+    Raises:
+        TypeError: for BOOLEAN and INT96 columns, which Parquet doesn't filter
+    """
+    if physical_type == 'INT32':
+        return struct.pack('<i', value)
+    if physical_type == 'INT64':
+        return struct.pack('<q', value)
+    if physical_type == 'FLOAT':
+        return struct.pack('<f', value)
+    if physical_type == 'DOUBLE':
+        return struct.pack('<d', value)
+    if physical_type in ('BYTE_ARRAY', 'FIXED_LEN_BYTE_ARRAY'):
+        return value.encode('utf-8') if isinstance(value, str) else bytes(value)
+    raise TypeError(f"Bloom filters don't cover {physical_type} columns")
+
+
+def bloom_filter_contains(data: bytes, value_hash: int) -> bool:
+    """
+    Probe a serialized bloom filter (header and bitset) for a hashed value
+
+    False means the value is certainly not in the column chunk; True means it may be.
+    """
+    reader = ThriftCompactReader(data)
+    num_bytes = get_field(reader.read_struct(), BFH_NUM_BYTES) or 0
+    bitset = memoryview(data)[reader.pos:reader.pos + num_bytes]
+    if num_bytes < 32 or len(bitset) < num_bytes:
+        return True  # Truncated or unknown filter: it can't rule anything out
+
+    block = ((value_hash >> 32) * (num_bytes // 32)) >> 32
+    key = value_hash & 0xFFFFFFFF
+    words = struct.unpack_from('<8I', bitset, block * 32)
+    return all(word >> (((key * salt) & 0xFFFFFFFF) >> 27) & 1 for word, salt in zip(words, SALT))
+
+
+def read_bloom_filter(f, column_chunk: pq.ColumnChunkMetaData) -> bytes:
+    """Read a column chunk's serialized bloom filter from an open Parquet file, or None if it has none"""
+    offset = column_chunk.bloom_filter_offset
+    if offset is None:
+        return None
+    length = column_chunk.bloom_filter_length
+    f.seek(offset)
+    if length:
+        return f.read(length)
+
+    # Older writers don't record the length: read the header, then the bitset it sizes
+    data = f.read(BLOOM_HEADER_READ_SIZE)
+    reader = ThriftCompactReader(data)
+    num_bytes = get_field(reader.read_struct(), BFH_NUM_BYTES) or 0
+    f.seek(offset)
+    return f.read(reader.pos + num_bytes)
+
+
+def candidate_row_groups(f, metadata: pq.FileMetaData, column: str, value,
+                         use_bloom_filters: bool = True) -> List[int]:
+    """
+    Row groups of an open Parquet file that may hold rows whose column equals value
+
+    A row group is skipped when its min/max statistics exclude the value or, with
+    use_bloom_filters, when its bloom filter for the column does. Only the footer and
+    the filters of row groups the statistics keep are read. A date or timestamp key
+    may be a Python value or the stored count (see stored_value()); it is compared
+    with the stored statistics as a count.
+
+    Raises:
+        ValueError: if the file has no top-level column of that name
+    """
+    schema = metadata.schema
+    index = next((i for i in range(len(schema)) if schema.column(i).path == column), None)
+    if index is None:
+        raise ValueError(f"Column '{column}' is not in the file")
+    physical_type = schema.column(index).physical_type
+    field_type = schema.to_arrow_schema().field(column).type
+    counted = stores_count(field_type)
+    value = stored_value(value, field_type)
+
+    value_hash = None
+    candidates = []
+    for i in range(metadata.num_row_groups):
+        chunk = metadata.row_group(i).column(index)
+        stats = chunk.statistics
+        if stats is not None and stats.has_min_max:
+            low, high = (stats.min_raw, stats.max_raw) if counted else (stats.min, stats.max)
+            if not low <= value <= high:
+                continue
+        if use_bloom_filters and chunk.bloom_filter_offset is not None:
+            if value_hash is None:
+                value_hash = xxhash64(plain_bytes(value, physical_type))
+            if not bloom_filter_contains(read_bloom_filter(f, chunk), value_hash):
+                continue
+        candidates.append(i)
+    return candidates
+
+
+def lookup(f, column: str, value, use_bloom_filters: bool = True) -> pa.Table:
+    """
+    Rows of an open Parquet file whose column equals value
+
+    Reads only the row groups candidate_row_groups() keeps, then filters them.
+    """
+    parquet_file = pq.ParquetFile(f)
+    row_groups = candidate_row_groups(f, parquet_file.metadata, column, value, use_bloom_filters)
+    if not row_groups:
+        return parquet_file.schema_arrow.empty_table()
+    table = parquet_file.read_row_groups(row_groups)
+    column_type = table.schema.field(column).type
+    if stores_count(column_type):
+        # A count is in the stored type's units, which differ from date64's milliseconds
+        key = pa.scalar(value, parquet_file.metadata.schema.to_arrow_schema().field(column).type).cast(column_type)
+    else:
+        key = pa.scalar(value, column_type)
+    return table.filter(pc.equal(table.column(column), key))
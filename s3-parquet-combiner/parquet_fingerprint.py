@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Order-Independent Table Fingerprints
+
+Computes a content fingerprint of Arrow data that doesn't depend on row order, so
+two sets of files hold the same rows exactly when their fingerprints match - no
+sorting, no pandas conversion and no text rendering.
+
+Every row gets a 64-bit hash built column by column with vectorized numpy
+arithmetic. The fingerprint is the row count plus two sums (mod 2^64) of
+differently finalized row hashes, 128 bits in all. Sums are order independent,
+count duplicate rows and can be merged, so a fingerprint can be built up batch by
+batch or file by file and combined afterwards.
+
+A fingerprint can also keep these sums per bucket of rows (buckets picked by the
+top bits of the row hash), so when two fingerprints disagree the buckets holding the
+differing rows are known without another pass over the data.
+
+Values are hashed by their logical value: integers of any width hash alike, floats
+are compared as float64 (with -0.0 == 0.0 and a single NaN), and string, binary and
+dictionary-encoded columns hash the same whatever their physical layout.
+
+"""
+
+import hashlib
+import numpy as np
+import pyarrow as pa
+
+BATCH_ROWS = 65536  # Rows hashed per vectorized pass
+BATCH_BYTES = 4 * 1024 * 1024  # Bytes of string/binary data hashed per pass, bounding scratch memory
+SEED = 0x243F6A8885A308D3
+COLUMN_MULTIPLIER = 0x100000001B3  # Chains column hashes into a row hash
+NULL_HASH = 0x6A09E667F3BCC909  # Stands in for the value of a null
+LANE_KEYS = (0, 0x13198A2E03707344)  # Each fingerprint sum finalizes the row hashes with its own key
+MASK64 = (1 << 64) - 1
+BUCKET_BITS = 12  # 4096 buckets in a bucketed fingerprint
+
+_U64 = np.uint64
+
+
+def _mix(x: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer, applied elementwise to a uint64 array"""
+    with np.errstate(over='ignore'):
+        x = x + _U64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> _U64(30))) * _U64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> _U64(27))) * _U64(0x94D049BB133111EB)
+        return x ^ (x >> _U64(31))
+
+
+def _segment_sums(values: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Sum of values[offsets[i]:offsets[i+1]] for every i, with empty segments summing to 0"""
+    lengths = np.diff(offsets)
+    sums = np.zeros(len(lengths), dtype=np.uint64)
+    nonempty = np.flatnonzero(lengths)
+    if len(nonempty):
+        sums[nonempty] = np.add.reduceat(values, offsets[:-1][nonempty])
+    return sums
+
+
+def _positions(offsets: np.ndarray) -> np.ndarray:
+    """Index of every element within its own segment"""
+    lengths = np.diff(offsets)
+    return np.arange(offsets[-1] - offsets[0], dtype=np.int64) - np.repeat(offsets[:-1] - offsets[0], lengths)
+
+
+def _null_mask(array: pa.Array):
+    if array.null_count == 0:
+        return None
+    return array.is_null().to_numpy(zero_copy_only=False)
+
+
+def _with_nulls(hashes: np.ndarray, nulls) -> np.ndarray:
+    if nulls is not None:
+        hashes[nulls] = _U64(NULL_HASH)
+    return hashes
+
+
+def _fixed_width_values(array: pa.Array) -> np.ndarray:
+    """Values of a numeric or temporal array as uint64 bit patterns of their logical value"""
+    array_type = array.type
+    if pa.types.is_boolean(array_type):
+        return array.fill_null(False).to_numpy(zero_copy_only=False).astype(np.uint64)
+
+    if pa.types.is_floating(array_type):
+        values = array.to_numpy(zero_copy_only=False).astype(np.float64) + 0.0  # -0.0 -> 0.0
+        values[np.isnan(values)] = np.nan  # Nulls and every NaN payload hash alike
+        return values.view(np.uint64)
+
+    if pa.types.is_temporal(array_type):
+        # Dates, times, timestamps and durations hash as their integer storage
+        array = array.view(pa.int32() if array_type.bit_width == 32 else pa.int64())
+        array_type = array.type
+
+    values = array.fill_null(0).to_numpy(zero_copy_only=False)
+    if pa.types.is_unsigned_integer(array_type):
+        return values.astype(np.uint64)
+    return values.astype(np.int64).view(np.uint64)
+
+
+def _binary_hashes(array: pa.Array) -> np.ndarray:
+    """
+    Hash every value's bytes
+
+    Each byte contributes mix(position * 256 + byte), summed per value, which behaves
+    like tabulation hashing and is computed with segmented sums over the data buffer.
+    Rows are processed in runs of at most BATCH_BYTES so scratch memory stays small
+    however long the values are.
+    """
+    array = array.cast(pa.large_binary())
+    count = len(array)
+    _, offsets_buffer, data_buffer = array.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=np.int64)[array.offset:array.offset + count + 1]
+    data = np.frombuffer(data_buffer, dtype=np.uint8) if data_buffer is not None else np.empty(0, np.uint8)
+
+    sums = np.zeros(count, dtype=np.uint64)
+    start = 0
+    while start < count:
+        # Take rows until they hold BATCH_BYTES of data (always at least one row)
+        end = int(np.searchsorted(offsets, offsets[start] + BATCH_BYTES, side='right')) - 1
+        end = min(max(end, start + 1), count)
+        run_offsets = offsets[start:end + 1] - offsets[start]
+        run_data = data[offsets[start]:offsets[end]].astype(np.uint64)
+        with np.errstate(over='ignore'):
+            keys = (_positions(run_offsets).astype(np.uint64) << _U64(8)) | run_data
+        sums[start:end] = _segment_sums(_mix(keys ^ _U64(SEED)), run_offsets)
+        start = end
+
+    lengths = np.diff(offsets).astype(np.uint64)
+    with np.errstate(over='ignore'):
+        return _mix(sums + _mix(lengths))
+
+
+def _list_hashes(array: pa.Array) -> np.ndarray:
+    """Hash every list from its element hashes and their positions"""
+    offsets = array.offsets.to_numpy(zero_copy_only=False).astype(np.int64)
+    elements = array.values.slice(offsets[0], offsets[-1] - offsets[0])
+    with np.errstate(over='ignore'):
+        contributions = _mix(column_hashes(elements) ^ _mix(_positions(offsets).astype(np.uint64)))
+        return _mix(_segment_sums(contributions, offsets - offsets[0]) + _mix(np.diff(offsets).astype(np.uint64)))
+
+
+def _fallback_hashes(array: pa.Array) -> np.ndarray:
+    """Per-value hash of the Python representation, for types without a vectorized path"""
+    hashes = np.empty(len(array), dtype=np.uint64)
+    for i, value in enumerate(array.to_pylist()):
+        hashes[i] = int.from_bytes(hashlib.blake2b(repr(value).encode(), digest_size=8).digest(), 'little')
+    return hashes
+
+
+def column_hashes(array: pa.Array) -> np.ndarray:
+    """
+    Hash every value of an array
+
+    Args:
+        array: Arrow array (not chunked)
+
+    Returns:
+        uint64 numpy array with one hash per value; nulls all hash to NULL_HASH
+    """
+    array_type = array.type
+    nulls = _null_mask(array)
+
+    if pa.types.is_dictionary(array_type):
+        # Hash each distinct value once and gather by index
+        dictionary_hashes = column_hashes(array.dictionary)
+        if len(dictionary_hashes) == 0:
+            return np.full(len(array), _U64(NULL_HASH), dtype=np.uint64)
+        indices = array.indices.fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64)
+        return _with_nulls(dictionary_hashes[indices], nulls)
+
+    if (pa.types.is_integer(array_type) or pa.types.is_floating(array_type) or pa.types.is_boolean(array_type)
+            or (pa.types.is_temporal(array_type) and array_type.bit_width in (32, 64))):
+        return _with_nulls(_mix(_fixed_width_values(array) ^ _U64(SEED)), nulls)
+
+    if (pa.types.is_string(array_type) or pa.types.is_large_string(array_type)
+            or pa.types.is_binary(array_type) or pa.types.is_large_binary(array_type)
+            or pa.types.is_fixed_size_binary(array_type)):
+        return _with_nulls(_binary_hashes(array), nulls)
+
+    if pa.types.is_decimal(array_type):
+        return _with_nulls(_binary_hashes(array.cast(pa.string())), nulls)
+
+    if pa.types.is_struct(array_type):
+        hashes = np.full(len(array), _U64(SEED), dtype=np.uint64)
+        for child in array.flatten():
+            with np.errstate(over='ignore'):
+                hashes = _mix(hashes * _U64(COLUMN_MULTIPLIER) + column_hashes(child))
+        return _with_nulls(hashes, nulls)
+
+    if pa.types.is_list(array_type) or pa.types.is_large_list(array_type):
+        return _with_nulls(_list_hashes(array), nulls)
+
+    if pa.types.is_null(array_type):
+        return np.full(len(array), _U64(NULL_HASH), dtype=np.uint64)
+
+    return _with_nulls(_fallback_hashes(array), nulls)
+
+
+def row_buckets(hashes: np.ndarray) -> np.ndarray:
+    """Bucket of every row hash in a bucketed fingerprint"""
+    return (hashes >> _U64(64 - BUCKET_BITS)).astype(np.int64)
+
+
+def _bucket_sums(buckets: np.ndarray, values: np.ndarray) -> np.ndarray:
+    """
+    Sum (mod 2^64) of the uint64 values falling in each bucket
+
+    np.bincount only sums in float64, so the values are split into 32-bit halves whose
+    sums over a batch of at most BATCH_ROWS rows stay exact below 2^53.
+    """
+    count = 1 << BUCKET_BITS
+    low = np.bincount(buckets, weights=(values & _U64(0xFFFFFFFF)).astype(np.float64), minlength=count)
+    high = np.bincount(buckets, weights=(values >> _U64(32)).astype(np.float64), minlength=count)
+    return low.astype(np.uint64) + (high.astype(np.uint64) << _U64(32))
+
+
+def row_hashes(batch: pa.RecordBatch) -> np.ndarray:
+    """Hash every row of a record batch by chaining its column hashes in schema order"""
+    hashes = np.full(batch.num_rows, _U64(SEED), dtype=np.uint64)
+    for column in batch.columns:
+        with np.errstate(over='ignore'):
+            hashes = _mix(hashes * _U64(COLUMN_MULTIPLIER) + column_hashes(column))
+    return hashes
+
+
+class TableFingerprint:
+    """
+    Running order-independent fingerprint of a stream of rows
+
+    Feed it tables or record batches in any order and split; two fingerprints are
+    equal exactly when (up to hash collisions) they saw the same multiset of rows.
+
+    A bucketed fingerprint also keeps the row count and sums of every bucket, so
+    differing_buckets() can tell where two of them disagree.
+    """
+
+    def __init__(self, bucketed: bool = False):
+        self.num_rows = 0
+        self.sums = [0] * len(LANE_KEYS)
+        self.bucket_rows = np.zeros(1 << BUCKET_BITS, dtype=np.int64) if bucketed else None
+        self.bucket_sums = np.zeros((len(LANE_KEYS), 1 << BUCKET_BITS), dtype=np.uint64) if bucketed else None
+
+    def update(self, data) -> 'TableFingerprint':
+        """Fold in a pa.Table, a pa.RecordBatch or an iterable of either"""
+        if isinstance(data, pa.Table):
+            batches = data.to_batches(max_chunksize=BATCH_ROWS)
+        elif isinstance(data, pa.RecordBatch):
+            batches = [data.slice(offset, BATCH_ROWS) for offset in range(0, data.num_rows, BATCH_ROWS)]
+        else:
+            for item in data:
+                self.update(item)
+            return self
+
+        for batch in batches:
+            if batch.num_rows == 0:
+                continue
+            hashes = row_hashes(batch)
+            buckets = row_buckets(hashes) if self.bucket_rows is not None else None
+            if buckets is not None:
+                self.bucket_rows += np.bincount(buckets, minlength=len(self.bucket_rows))
+            for lane, key in enumerate(LANE_KEYS):
+                lane_hashes = _mix(hashes ^ _U64(key)) if key else hashes
+                lane_sum = int(np.add.reduce(lane_hashes, dtype=np.uint64))
+                self.sums[lane] = (self.sums[lane] + lane_sum) & MASK64
+                if buckets is not None:
+                    self.bucket_sums[lane] += _bucket_sums(buckets, lane_hashes)
+            self.num_rows += batch.num_rows
+        return self
+
+    def merge(self, other: 'TableFingerprint') -> 'TableFingerprint':
+        """Fold in the rows seen by another fingerprint"""
+        self.num_rows += other.num_rows
+        self.sums = [(mine + theirs) & MASK64 for mine, theirs in zip(self.sums, other.sums)]
+        if self.bucket_rows is not None:
+            if other.bucket_rows is None:
+                raise ValueError("Cannot merge a plain fingerprint into a bucketed one")
+            self.bucket_rows += other.bucket_rows
+            self.bucket_sums += other.bucket_sums
+        return self
+
+    def differing_buckets(self, other: 'TableFingerprint') -> np.ndarray:
+        """Buckets whose rows differ between two bucketed fingerprints, in bucket order"""
+        if self.bucket_rows is None or other.bucket_rows is None:
+            raise ValueError("Both fingerprints must be bucketed")
+        differs = (self.bucket_rows != other.bucket_rows) | (self.bucket_sums != other.bucket_sums).any(axis=0)
+        return np.flatnonzero(differs)
+
+    def hexdigest(self) -> str:
+        """Row count and sums as a comparable string"""
+        return f"{self.num_rows:x}-" + ''.join(f"{lane_sum:016x}" for lane_sum in self.sums)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, TableFingerprint) and self.hexdigest() == other.hexdigest()
+
+    def __repr__(self) -> str:
+        return f"TableFingerprint({self.hexdigest()})"
@@ -0,0 +1,624 @@
+#!/usr/bin/env python3
+"""
+Parquet Footer Utilities
+
+Reads and rewrites the Thrift-encoded FileMetaData footer of Parquet files. This lets
+the combiner concatenate files that share a schema by copying their column chunks
+verbatim and writing a new footer, instead of decoding and re-encoding every page.
+
+Only the parts of the Thrift compact protocol that Parquet footers use are
+implemented. Decoded structs are kept as ordered lists of [field_id, type, value]
+so that fields this module doesn't know about survive a round trip unchanged.
+"""
+
+import struct
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+MAGIC = b'PAR1'
+ENCRYPTED_MAGIC = b'PARE'
+FOOTER_READ_SIZE = 64 * 1024  # First ranged read when fetching a footer from S3
+DEFAULT_CODEC = 'snappy'  # Writer codec used when nothing better is known
+
+# Codec names reported by pyarrow column chunk metadata -> pyarrow writer codec names
+WRITER_CODECS = {
+    'UNCOMPRESSED': 'none',
+    'SNAPPY': 'snappy',
+    'GZIP': 'gzip',
+    'BROTLI': 'brotli',
+    'LZ4': 'lz4',
+    'LZ4_RAW': 'lz4',
+    'ZSTD': 'zstd',
+}
+
+# Thrift compact protocol type ids
+CT_STOP = 0
+CT_BOOLEAN_TRUE = 1
+CT_BOOLEAN_FALSE = 2
+CT_BYTE = 3
+CT_I16 = 4
+CT_I32 = 5
+CT_I64 = 6
+CT_DOUBLE = 7
+CT_BINARY = 8
+CT_LIST = 9
+CT_SET = 10
+CT_MAP = 11
+CT_STRUCT = 12
+
+# FileMetaData field ids (see parquet.thrift)
+FMD_VERSION = 1
+FMD_SCHEMA = 2
+FMD_NUM_ROWS = 3
+FMD_ROW_GROUPS = 4
+FMD_KEY_VALUE_METADATA = 5
+FMD_CREATED_BY = 6
+FMD_COLUMN_ORDERS = 7
+FMD_ENCRYPTION_ALGORITHM = 8
+
+# RowGroup field ids
+RG_COLUMNS = 1
+RG_NUM_ROWS = 3
+RG_FILE_OFFSET = 5
+RG_ORDINAL = 7
+
+# ColumnChunk field ids
+CC_FILE_PATH = 1
+CC_FILE_OFFSET = 2
+CC_META_DATA = 3
+CC_OFFSET_INDEX_OFFSET = 4
+CC_COLUMN_INDEX_OFFSET = 6
+CC_CRYPTO_METADATA = 8
+
+# ColumnMetaData field ids
+CMD_CODEC = 4
+CMD_DATA_PAGE_OFFSET = 9
+CMD_INDEX_PAGE_OFFSET = 10
+CMD_DICTIONARY_PAGE_OFFSET = 11
+CMD_BLOOM_FILTER_OFFSET = 14
+
+# Absolute file offsets that move when a column chunk is relocated
+COLUMN_CHUNK_OFFSET_FIELDS = (CC_FILE_OFFSET, CC_OFFSET_INDEX_OFFSET, CC_COLUMN_INDEX_OFFSET)
+COLUMN_METADATA_OFFSET_FIELDS = (CMD_DATA_PAGE_OFFSET, CMD_INDEX_PAGE_OFFSET,
+                                 CMD_DICTIONARY_PAGE_OFFSET, CMD_BLOOM_FILTER_OFFSET)
+
+
+def byte_view(data) -> memoryview:
+    """
+    Unsigned byte view of any buffer
+
+    pa.Buffer (what the combiner fetches sources into) exposes signed chars, so a
+    plain memoryview of one would index to negative ints.
+    """
+    return memoryview(data).cast('B')
+
+
+class ThriftCompactReader:
+    """Decoder for the subset of the Thrift compact protocol used by Parquet footers"""
+
+    def __init__(self, data, pos: int = 0):
+        self.data = byte_view(data)
+        self.pos = pos
+
+    def read_byte(self) -> int:
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def read_varint(self) -> int:
+        result = 0
+        shift = 0
+        while True:
+            byte = self.read_byte()
+            result |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def read_zigzag(self) -> int:
+        n = self.read_varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def read_value(self, ttype: int):
+        if ttype == CT_BOOLEAN_TRUE:
+            return True
+        if ttype == CT_BOOLEAN_FALSE:
+            return False
+        if ttype == CT_BYTE:
+            return self.read_byte()
+        if ttype in (CT_I16, CT_I32, CT_I64):
+            return self.read_zigzag()
+        if ttype == CT_DOUBLE:
+            value = struct.unpack_from('<d', self.data, self.pos)[0]
+            self.pos += 8
+            return value
+        if ttype == CT_BINARY:
+            length = self.read_varint()
+            value = bytes(self.data[self.pos:self.pos + length])
+            self.pos += length
+            return value
+        if ttype in (CT_LIST, CT_SET):
+            header = self.read_byte()
+            size = header >> 4
+            elem_type = header & 0x0F
+            if size == 15:
+                size = self.read_varint()
+            return (elem_type, [self.read_element(elem_type) for _ in range(size)])
+        if ttype == CT_MAP:
+            size = self.read_varint()
+            if size == 0:
+                return (0, 0, [])
+            header = self.read_byte()
+            key_type, value_type = header >> 4, header & 0x0F
+            entries = [(self.read_element(key_type), self.read_element(value_type)) for _ in range(size)]
+            return (key_type, value_type, entries)
+        if ttype == CT_STRUCT:
+            return self.read_struct()
+        raise ValueError(f"Unsupported thrift compact type {ttype}")
+
+    def read_element(self, ttype: int):
+        # Booleans inside containers are a full byte rather than part of a field header
+        if ttype in (CT_BOOLEAN_TRUE, CT_BOOLEAN_FALSE):
+            return self.read_byte() == CT_BOOLEAN_TRUE
+        return self.read_value(ttype)
+
+    def read_struct(self) -> list:
+        fields = []
+        last_id = 0
+        while True:
+            header = self.read_byte()
+            if header == CT_STOP:
+                return fields
+            ttype = header & 0x0F
+            delta = header >> 4
+            field_id = last_id + delta if delta else self.read_zigzag()
+            fields.append([field_id, ttype, self.read_value(ttype)])
+            last_id = field_id
+
+
+class ThriftCompactWriter:
+    """Encoder matching ThriftCompactReader"""
+
+    def __init__(self):
+        self.out = bytearray()
+
+    def write_varint(self, n: int):
+        while True:
+            if n < 0x80:
+                self.out.append(n)
+                return
+            self.out.append((n & 0x7F) | 0x80)
+            n >>= 7
+
+    def write_zigzag(self, n: int):
+        self.write_varint((n << 1) ^ (n >> 63))
+
+    def write_value(self, ttype: int, value):
+        if ttype in (CT_BOOLEAN_TRUE, CT_BOOLEAN_FALSE):
+            return
+        if ttype == CT_BYTE:
+            self.out.append(value & 0xFF)
+        elif ttype in (CT_I16, CT_I32, CT_I64):
+            self.write_zigzag(value)
+        elif ttype == CT_DOUBLE:
+            self.out += struct.pack('<d', value)
+        elif ttype == CT_BINARY:
+            self.write_varint(len(value))
+            self.out += value
+        elif ttype in (CT_LIST, CT_SET):
+            elem_type, items = value
+            if len(items) < 15:
+                self.out.append((len(items) << 4) | elem_type)
+            else:
+                self.out.append(0xF0 | elem_type)
+                self.write_varint(len(items))
+            for item in items:
+                self.write_element(elem_type, item)
+        elif ttype == CT_MAP:
+            key_type, value_type, entries = value
+            self.write_varint(len(entries))
+            if entries:
+                self.out.append((key_type << 4) | value_type)
+                for key, item in entries:
+                    self.write_element(key_type, key)
+                    self.write_element(value_type, item)
+        elif ttype == CT_STRUCT:
+            self.write_struct(value)
+        else:
+            raise ValueError(f"Unsupported thrift compact type {ttype}")
+
+    def write_element(self, ttype: int, value):
+        if ttype in (CT_BOOLEAN_TRUE, CT_BOOLEAN_FALSE):
+            self.out.append(CT_BOOLEAN_TRUE if value else CT_BOOLEAN_FALSE)
+        else:
+            self.write_value(ttype, value)
+
+    def write_struct(self, fields: list):
+        last_id = 0
+        for field_id, ttype, value in fields:
+            if ttype in (CT_BOOLEAN_TRUE, CT_BOOLEAN_FALSE):
+                ttype = CT_BOOLEAN_TRUE if value else CT_BOOLEAN_FALSE
+            delta = field_id - last_id
+            if 0 < delta <= 15:
+                self.out.append((delta << 4) | ttype)
+            else:
+                self.out.append(ttype)
+                self.write_zigzag(field_id)
+            self.write_value(ttype, value)
+            last_id = field_id
+        self.out.append(CT_STOP)
+
+
+def get_field(fields: list, field_id: int, default=None):
+    """Return the value of a decoded struct field, or default if it isn't set"""
+    for fid, _, value in fields:
+        if fid == field_id:
+            return value
+    return default
+
+
+def set_field(fields: list, field_id: int, ttype: int, value):
+    """Set a decoded struct field, keeping fields ordered by id"""
+    for field in fields:
+        if field[0] == field_id:
+            field[1], field[2] = ttype, value
+            return
+    fields.append([field_id, ttype, value])
+    fields.sort(key=lambda field: field[0])
+
+
+def remove_field(fields: list, field_id: int):
+    """Drop a decoded struct field if it is set"""
+    fields[:] = [field for field in fields if field[0] != field_id]
+
+
+def footer_length(data) -> int:
+    """Return the length of the Thrift footer of a complete Parquet file (or file tail)"""
+    view = byte_view(data)
+    if len(view) < 12:
+        raise ValueError("Data is too short to be a Parquet file")
+    if bytes(view[-4:]) == ENCRYPTED_MAGIC:
+        raise ValueError("Parquet files with encrypted footers are not supported")
+    if bytes(view[-4:]) != MAGIC:
+        raise ValueError("Data does not end with the Parquet magic bytes")
+    return struct.unpack('<I', view[-8:-4])[0]
+
+
+def decode_file_metadata(data) -> list:
+    """Decode the FileMetaData footer of a complete Parquet file (or file tail)"""
+    length = footer_length(data)
+    view = byte_view(data)
+    start = len(view) - 8 - length
+    if start < 0:
+        raise ValueError("Data does not contain the whole Parquet footer")
+    return ThriftCompactReader(view[start:len(view) - 8]).read_struct()
+
+
+def encode_file_metadata(metadata: list) -> bytes:
+    """Encode a FileMetaData struct followed by its length and the closing magic bytes"""
+    writer = ThriftCompactWriter()
+    writer.write_struct(metadata)
+    return bytes(writer.out) + struct.pack('<I', len(writer.out)) + MAGIC
+
+
+def column_codecs(metadata: list) -> set:
+    """Return the set of compression codec ids used by the column chunks of a file"""
+    codecs = set()
+    for row_group in get_field(metadata, FMD_ROW_GROUPS, (CT_STRUCT, []))[1]:
+        for column in get_field(row_group, RG_COLUMNS, (CT_STRUCT, []))[1]:
+            column_meta = get_field(column, CC_META_DATA)
+            if column_meta is not None:
+                codecs.add(get_field(column_meta, CMD_CODEC))
+    return codecs
+
+
+def is_encrypted(metadata: list) -> bool:
+    """True if the file uses Parquet modular encryption for its footer or any column"""
+    if get_field(metadata, FMD_ENCRYPTION_ALGORITHM) is not None:
+        return True
+    for row_group in get_field(metadata, FMD_ROW_GROUPS, (CT_STRUCT, []))[1]:
+        for column in get_field(row_group, RG_COLUMNS, (CT_STRUCT, []))[1]:
+            if get_field(column, CC_CRYPTO_METADATA) is not None:
+                return True
+    return False
+
+
+def has_page_index(metadata: list) -> bool:
+    """
+    True if any column chunk has a column index or offset index
+
+    The offset index records absolute page offsets inside the file body, which a
+    verbatim copy of the body can't move, so such files aren't concatenated.
+    """
+    for row_group in get_field(metadata, FMD_ROW_GROUPS, (CT_STRUCT, []))[1]:
+        for column in get_field(row_group, RG_COLUMNS, (CT_STRUCT, []))[1]:
+            if (get_field(column, CC_OFFSET_INDEX_OFFSET) is not None
+                    or get_field(column, CC_COLUMN_INDEX_OFFSET) is not None):
+                return True
+    return False
+
+
+def shift_row_group_offsets(row_group: list, shift: int):
+    """Move every absolute file offset recorded in a RowGroup by shift bytes"""
+    offset = get_field(row_group, RG_FILE_OFFSET)
+    if offset:
+        set_field(row_group, RG_FILE_OFFSET, CT_I64, offset + shift)
+
+    for column in get_field(row_group, RG_COLUMNS, (CT_STRUCT, []))[1]:
+        if get_field(column, CC_FILE_PATH) is not None:
+            raise ValueError("Column chunks stored in external files are not supported")
+        for field_id in COLUMN_CHUNK_OFFSET_FIELDS:
+            offset = get_field(column, field_id)
+            if offset:
+                set_field(column, field_id, CT_I64, offset + shift)
+
+        column_meta = get_field(column, CC_META_DATA)
+        if column_meta is not None:
+            for field_id in COLUMN_METADATA_OFFSET_FIELDS:
+                offset = get_field(column_meta, field_id)
+                if offset:
+                    set_field(column_meta, field_id, CT_I64, offset + shift)
+
+
+def fetch_footer(s3_client, bucket: str, key: str) -> bytes:
+    """
+    Fetch the tail of a Parquet object from S3 that holds its complete footer
+
+    Uses a suffix-range GET sized for typical footers, plus a second ranged GET only
+    when the footer is larger than that. The returned tail can be passed to
+    decode_file_metadata() or to pq.read_metadata(pa.BufferReader(tail)).
+    """
+    response = s3_client.get_object(Bucket=bucket, Key=key, Range=f'bytes=-{FOOTER_READ_SIZE}')
+    tail = response['Body'].read()
+    needed = footer_length(tail) + 8
+    if needed > len(tail):
+        response = s3_client.get_object(Bucket=bucket, Key=key, Range=f'bytes=-{needed}')
+        tail = response['Body'].read()
+    return tail
+
+
+class ParquetConcatenator:
+    """
+    Concatenate Parquet files into a single file without decoding their pages
+
+    Everything between the leading magic bytes and the footer of each source (data
+    pages, dictionary pages and bloom filters) is copied verbatim. Only the footer is
+    rewritten, with every absolute offset moved to the position the bytes now occupy
+    in the output.
+
+    Sources are accepted only when they match the first one checked: identical
+    Parquet schema, Arrow schema, column orders, writer and compression codecs, no
+    encryption, and no page indexes (their page locations would still point at the
+    source's offsets).
+    """
+
+    def __init__(self, sink=None):
+        self.sink = sink
+        self.position = 0
+        self.reference = None
+        self.row_groups = []
+        self.num_rows = 0
+
+    def _write(self, data):
+        self.sink.write(data)
+        self.position += len(data)
+
+    def check(self, data) -> Optional[list]:
+        """
+        Check whether a file can be appended after the files checked so far
+
+        Args:
+            data: Complete Parquet file, or a tail of it holding the whole footer
+
+        Returns:
+            The decoded footer, or None if the file is not compatible
+        """
+        metadata = decode_file_metadata(data)
+        if is_encrypted(metadata) or has_page_index(metadata):
+            return None
+
+        arrow_schema = pq.read_metadata(pa.BufferReader(data)).schema.to_arrow_schema()
+        if self.reference is None:
+            self.reference = (metadata, arrow_schema, column_codecs(metadata))
+            return metadata
+
+        reference, reference_schema, reference_codecs = self.reference
+        compatible = (
+            get_field(metadata, FMD_SCHEMA) == get_field(reference, FMD_SCHEMA)
+            and get_field(metadata, FMD_COLUMN_ORDERS) == get_field(reference, FMD_COLUMN_ORDERS)
+            and get_field(metadata, FMD_CREATED_BY) == get_field(reference, FMD_CREATED_BY)
+            and column_codecs(metadata) <= reference_codecs
+            and arrow_schema.equals(reference_schema, check_metadata=False)
+        )
+        return metadata if compatible else None
+
+    def append(self, data):
+        """
+        Append a complete Parquet file held in memory
+
+        Raises:
+            ValueError: if the file is not compatible with the files already appended
+        """
+        view = byte_view(data)
+        if bytes(view[:4]) != MAGIC:
+            raise ValueError("Data does not start with the Parquet magic bytes")
+        metadata = self.check(view)
+        if metadata is None:
+            raise ValueError("Parquet file does not share the schema and compression of the files before it")
+
+        if self.position == 0:
+            self._write(MAGIC)
+
+        # The body keeps its layout, so every offset moves by the same amount
+        body_end = len(view) - 8 - footer_length(view)
+        shift = self.position - 4
+        for row_group in get_field(metadata, FMD_ROW_GROUPS, (CT_STRUCT, []))[1]:
+            shift_row_group_offsets(row_group, shift)
+            self.row_groups.append(row_group)
+        self.num_rows += get_field(metadata, FMD_NUM_ROWS, 0)
+        self._write(view[4:body_end])
+
+    def close(self) -> int:
+        """
+        Write the merged footer
+
+        Returns:
+            Total number of rows in the output
+        """
+        if self.position == 0:
+            raise ValueError("No Parquet files were appended")
+
+        for ordinal, row_group in enumerate(self.row_groups):
+            if len(self.row_groups) <= 0x7FFF:
+                set_field(row_group, RG_ORDINAL, CT_I16, ordinal)
+            else:
+                remove_field(row_group, RG_ORDINAL)
+
+        metadata = [list(field) for field in self.reference[0]]
+        set_field(metadata, FMD_NUM_ROWS, CT_I64, self.num_rows)
+        set_field(metadata, FMD_ROW_GROUPS, CT_LIST, (CT_STRUCT, self.row_groups))
+        self._write(encode_file_metadata(metadata))
+        return self.num_rows
+
+
+def can_concatenate(footers: List) -> bool:
+    """True if the Parquet files whose footer tails are given can be concatenated verbatim"""
+    checker = ParquetConcatenator()
+    return all(checker.check(tail) is not None for tail in footers)
+
+
+def detect_column_codecs(footers: List) -> Dict[str, str]:
+    """
+    Map every leaf column path to the codec holding most of its compressed bytes
+
+    Args:
+        footers: Footer tails (or complete files) of the sources
+
+    Returns:
+        Dictionary of column path -> pyarrow writer codec name
+    """
+    weights = defaultdict(lambda: defaultdict(int))
+    for tail in footers:
+        metadata = pq.read_metadata(pa.BufferReader(tail))
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            for j in range(row_group.num_columns):
+                column = row_group.column(j)
+                codec = WRITER_CODECS.get(column.compression, DEFAULT_CODEC)
+                weights[column.path_in_schema][codec] += column.total_compressed_size
+    return {path: max(codecs, key=codecs.get) for path, codecs in weights.items()}
+
+
+def resolve_compression(column_paths: List[str], detected: Dict[str, str], compression: str = 'auto',
+                        column_overrides: Optional[Dict[str, str]] = None,
+                        compression_level: Optional[int] = None) -> dict:
+    """
+    Work out the compression options to hand to pq.ParquetWriter / pq.write_table
+
+    Args:
+        column_paths: Leaf column paths of the output schema
+        detected: Codecs detected from the sources (see detect_column_codecs)
+        compression: 'auto' to keep each column's source codec, or a codec for all columns
+        column_overrides: Codec per column; a top-level name also covers its nested leaves
+        compression_level: Level applied to every column whose codec supports one
+
+    Returns:
+        Dictionary with 'compression' and 'compression_level' writer arguments
+    """
+    codecs = {}
+    for path in column_paths:
+        codecs[path] = detected.get(path, DEFAULT_CODEC) if compression == 'auto' else compression
+        for column, codec in (column_overrides or {}).items():
+            if path == column or path.startswith(column + '.'):
+                codecs[path] = codec
+
+    # A per-column dict leaves unlisted columns uncompressed, so only collapse it when uniform
+    distinct = set(codecs.values())
+    resolved = {'compression': distinct.pop() if len(distinct) == 1 else codecs, 'compression_level': None}
+    if len(codecs) == 0:
+        resolved['compression'] = DEFAULT_CODEC if compression == 'auto' else compression
+
+    if compression_level is not None:
+        if isinstance(resolved['compression'], str):
+            codec = resolved['compression']
+            if codec != 'none' and pa.Codec.supports_compression_level(codec):
+                resolved['compression_level'] = compression_level
+        else:
+            resolved['compression_level'] = {
+                path: compression_level for path, codec in codecs.items()
+                if codec != 'none' and pa.Codec.supports_compression_level(codec)
+            }
+    return resolved
+
+
+def summarize_footers(footers: List) -> dict:
+    """
+    Aggregate the row counts and column statistics recorded in a set of footers
+
+    Args:
+        footers: Footer tails (or complete files)
+
+    Returns:
+        Dictionary with 'rows' and 'columns', mapping each leaf column path to its
+        total 'null_count' and overall 'min' and 'max'. A statistic is None when some
+        row group doesn't record it, since the aggregate would then be incomplete.
+    """
+    rows = 0
+    columns = {}
+    for tail in footers:
+        metadata = pq.read_metadata(pa.BufferReader(tail))
+        rows += metadata.num_rows
+        for i in range(metadata.num_row_groups):
+            row_group = metadata.row_group(i)
+            if row_group.num_rows == 0:
+                continue
+            for j in range(row_group.num_columns):
+                column = row_group.column(j)
+                summary = columns.setdefault(column.path_in_schema, {'null_count': 0, 'min': None, 'max': None,
+                                                                     'has_min_max': True})
+                stats = column.statistics
+                if stats is None or not stats.has_null_count:
+                    summary['null_count'] = None
+                elif summary['null_count'] is not None:
+                    summary['null_count'] += stats.null_count
+
+                # A chunk holding only nulls has no min/max and doesn't need one
+                if stats is not None and stats.has_min_max:
+                    if summary['min'] is None or stats.min < summary['min']:
+                        summary['min'] = stats.min
+                    if summary['max'] is None or stats.max > summary['max']:
+                        summary['max'] = stats.max
+                elif stats is None or stats.num_values > 0:
+                    summary['has_min_max'] = False
+
+    for summary in columns.values():
+        if not summary.pop('has_min_max'):
+            summary['min'] = summary['max'] = None
+    return {'rows': rows, 'columns': columns}
+
+
+def row_group_bounds(metadata: pq.FileMetaData, column_path: str) -> List[tuple]:
+    """
+    Per-row-group (num_rows, min, max) of one column, from already decoded metadata
+
+    min and max are None for a row group whose statistics don't record them (or that
+    holds only nulls in the column), so callers must treat it as possibly holding any
+    value.
+    """
+    bounds = []
+    for i in range(metadata.num_row_groups):
+        row_group = metadata.row_group(i)
+        stats = None
+        for j in range(row_group.num_columns):
+            column = row_group.column(j)
+            if column.path_in_schema == column_path:
+                stats = column.statistics
+                break
+        if stats is not None and stats.has_min_max:
+            bounds.append((row_group.num_rows, stats.min, stats.max))
+        else:
+            bounds.append((row_group.num_rows, None, None))
+    return bounds
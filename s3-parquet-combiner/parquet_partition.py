@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Hive Partitioning
+
+Splits rows into Hive-style `name=value/` partitions, either on a column's own
+values (e.g. course_id=42) or on the year, month or day of a date or timestamp
+column (e.g. created_at_year=2021), so query engines can prune partitions instead
+of scanning every file of a table.
+
+As Hive expects, a column partitioned on its own values is not stored in the data
+files - it comes back from the directory names - while a date-derived partition
+keeps its source column.
+
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+PARTITION_TRANSFORMS = ('identity', 'year', 'month', 'day')
+NULL_PARTITION = '__HIVE_DEFAULT_PARTITION__'  # Directory value Hive uses for null keys
+PARTITION_KEY_PREFIX = '__partition_'  # Prefix of the sort key columns keyed() adds for derived partitions
+
+
+def is_path_type(field_type: pa.DataType) -> bool:
+    """
+    True if a column of this type can be partitioned on its own values
+
+    Only integers, strings, booleans, dates and decimals are written to a path in a
+    form that casts back to the same value. Timestamps, times and durations don't
+    parse back from their text, binary comes back as its repr, and floats make poor
+    partition keys, so those are refused.
+    """
+    if pa.types.is_dictionary(field_type):
+        field_type = field_type.value_type
+    return (pa.types.is_integer(field_type) or pa.types.is_string(field_type) or pa.types.is_large_string(field_type)
+            or pa.types.is_boolean(field_type) or pa.types.is_date(field_type) or pa.types.is_decimal(field_type))
+
+
+def parse_partition_spec(spec: str) -> Tuple[str, str]:
+    """
+    Parse 'column' or 'column:transform' into (column, transform)
+
+    Raises:
+        ValueError: if the transform isn't one of PARTITION_TRANSFORMS
+    """
+    column, _, transform = spec.partition(':')
+    transform = transform or 'identity'
+    if not column or transform not in PARTITION_TRANSFORMS:
+        raise ValueError(f"Partition spec '{spec}' must be COLUMN or COLUMN:TRANSFORM "
+                         f"with TRANSFORM one of {list(PARTITION_TRANSFORMS[1:])}")
+    return column, transform
+
+
+def hive_partitions(key: str) -> Dict[str, Optional[str]]:
+    """name -> value of every `name=value` directory in an object key; None for the null partition"""
+    partitions = {}
+    for segment in key.split('/')[:-1]:
+        name, separator, value = segment.partition('=')
+        if separator and name:
+            partitions[name] = None if value == NULL_PARTITION else unquote(value)
+    return partitions
+
+
+def restore_partition_columns(data, partitions: Dict[str, Optional[str]], schema: pa.Schema):
+    """
+    Add back to a pa.Table or pa.RecordBatch the partition columns its file doesn't store
+
+    Every column of schema that the data lacks but partitions names is filled with the
+    directory's value, cast to its type in schema. Columns are put in schema order,
+    followed by any the data has that schema doesn't.
+    """
+    names = set(data.schema.names)
+    if not any(field.name in partitions and field.name not in names for field in schema):
+        return data
+
+    columns, fields = [], []
+    for field in schema:
+        if field.name in names:
+            columns.append(data.column(field.name))
+            fields.append(data.schema.field(field.name))
+        elif field.name in partitions:
+            value = partitions[field.name]
+            if value is None:
+                column = pa.nulls(data.num_rows, field.type)
+            else:
+                column = pa.repeat(pa.scalar(value).cast(field.type), data.num_rows)
+            columns.append(column if isinstance(data, pa.RecordBatch) else pa.chunked_array([column], field.type))
+            fields.append(field)
+    for field in data.schema:
+        if schema.get_field_index(field.name) < 0:
+            columns.append(data.column(field.name))
+            fields.append(field)
+    return type(data).from_arrays(columns, schema=pa.schema(fields, metadata=data.schema.metadata))
+
+
+class Partitioner:
+    """Map the rows of tables with a given schema to Hive partition paths"""
+
+    def __init__(self, specs: List[Tuple[str, str]], schema: pa.Schema):
+        """
+        Args:
+            specs: (column, transform) pairs, outermost partition first
+            schema: Schema of the tables to split
+
+        Raises:
+            ValueError: if a column isn't in the schema, a date transform is applied to a non-temporal
+                        column, or a column whose values can't be restored from a path is partitioned on them
+        """
+        self.specs = specs
+        self.names = []
+        for column, transform in specs:
+            if schema.get_field_index(column) < 0:
+                raise ValueError(f"Partition column '{column}' is not in the schema")
+            field_type = schema.field(column).type
+            if transform != 'identity' and not (pa.types.is_date(field_type) or pa.types.is_timestamp(field_type)):
+                raise ValueError(f"Can't partition '{column}' of type {field_type} by {transform}")
+            if transform == 'identity' and not is_path_type(field_type):
+                hint = " (partition it by year, month or day instead)" if pa.types.is_timestamp(field_type) else ""
+                raise ValueError(f"Can't partition '{column}' of type {field_type} on its own values, "
+                                 f"which don't round-trip through a partition path{hint}")
+            self.names.append(column if transform == 'identity' else f"{column}_{transform}")
+        self.path_columns = [column for column, transform in specs if transform == 'identity']
+        # Ordering rows by sort_keys brings every partition's rows together, in path order;
+        # a derived partition is ordered by a key column of its values that keyed() adds
+        sort_columns = [column if transform == 'identity' else f"{PARTITION_KEY_PREFIX}{name}"
+                        for (column, transform), name in zip(specs, self.names)]
+        self.key_columns = [column for column in sort_columns if column.startswith(PARTITION_KEY_PREFIX)]
+        self.sort_keys = [(column, 'ascending') for column in sort_columns]
+        self.file_schema = schema  # Schema of the rows split() yields, without the path columns
+        if self.path_columns:
+            self.file_schema = pa.schema([field for field in schema if field.name not in self.path_columns])
+
+    def partition_values(self, table: pa.Table) -> List[pa.Array]:
+        """Partition value of every row, one array per partition level"""
+        values = []
+        for column, transform in self.specs:
+            array = table.column(column).combine_chunks()
+            if transform == 'year':
+                array = pc.year(array)
+            elif transform == 'month':
+                array = pc.strftime(array, format='%Y-%m')
+            elif transform == 'day':
+                array = pc.strftime(array, format='%Y-%m-%d')
+            values.append(array)
+        return values
+
+    def keyed(self, table: pa.Table) -> pa.Table:
+        """The table with a column of every derived partition value added, to sort by"""
+        for (_, transform), name, values in zip(self.specs, self.names, self.partition_values(table)):
+            if transform != 'identity':
+                table = table.append_column(f"{PARTITION_KEY_PREFIX}{name}", values)
+        return table
+
+    def strip(self, table: pa.Table) -> pa.Table:
+        """The table without the columns added by keyed()"""
+        return table.drop_columns(self.key_columns) if self.key_columns else table
+
+    def render(self, value: pa.Scalar) -> str:
+        """Directory form of a partition value, escaped so it stays a single path segment"""
+        if not value.is_valid:
+            return NULL_PARTITION
+        value = value.as_py()
+        if isinstance(value, bool):
+            value = str(value).lower()
+        elif hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        return quote(str(value), safe='')
+
+    def split(self, table: pa.Table) -> Iterator[Tuple[str, pa.Table]]:
+        """
+        Yield (partition path, rows) for every partition present in the table
+
+        Rows keep their relative order within each partition, and come without the
+        columns their path holds, matching file_schema.
+        """
+        if table.num_rows == 0:
+            return
+
+        codes = np.zeros(table.num_rows, dtype=np.int64)
+        levels = []
+        for values in self.partition_values(table):
+            encoded = pc.dictionary_encode(values, null_encoding='encode')
+            indices = encoded.indices.to_numpy(zero_copy_only=False).astype(np.int64)
+            codes = codes * len(encoded.dictionary) + indices
+            levels.append((indices, encoded.dictionary))
+
+        _, first, inverse, counts = np.unique(codes, return_index=True, return_inverse=True, return_counts=True)
+        order = np.argsort(inverse, kind='stable')
+        start = 0
+        for partition, count in enumerate(counts):
+            row = first[partition]
+            path = '/'.join(f"{name}={self.render(dictionary[int(indices[row])])}"
+                            for name, (indices, dictionary) in zip(self.names, levels))
+            yield path, table.take(pa.array(order[start:start + count])).drop_columns(self.path_columns)
+            start += count
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Schema Unification
+
+Resolves the schema drift that builds up across the part files of a long-running
+export - a column added part way through, int32 in some parts and int64 in others,
+a null-typed column in a part that happened to be empty - into one target schema,
+worked out from the footers alone. Tables and row groups are then cast to it as
+they stream through, so mixed parts combine in one pass without a pandas round trip
+and without silently turning integers into floats.
+
+"""
+
+from typing import List
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+def footer_schema(footer) -> pa.Schema:
+    """Arrow schema recorded in a footer tail (or complete file)"""
+    return pq.read_metadata(pa.BufferReader(footer)).schema.to_arrow_schema()
+
+
+def unify_schemas(schemas: List[pa.Schema]) -> pa.Schema:
+    """
+    Work out the schema every one of a set of schemas can be cast to
+
+    Fields are taken in order of first appearance. Types are promoted the way Arrow's
+    permissive unification does (null to anything, narrower to wider integers and
+    floats, integers to floats or decimals, string to large_string, coarser to finer
+    timestamp units), and a column that is dictionary-encoded in only some schemas
+    is decoded. A field missing from some schemas becomes nullable.
+
+    Identical schemas are returned unchanged. Otherwise the schema-level metadata is
+    dropped, since pandas metadata written for one part would misdescribe the union.
+
+    Raises:
+        ValueError: if some column has types that can't be reconciled, e.g. string and int64
+    """
+    if all(schema.equals(schemas[0]) for schema in schemas[1:]):
+        return schemas[0]
+
+    # Decode a column that only some parts dictionary-encode
+    encodings = {}
+    for schema in schemas:
+        for field in schema:
+            encodings.setdefault(field.name, set()).add(pa.types.is_dictionary(field.type))
+    mixed = {name for name, encoded in encodings.items() if len(encoded) > 1}
+    if mixed:
+        schemas = [pa.schema([field.with_type(field.type.value_type)
+                              if field.name in mixed and pa.types.is_dictionary(field.type) else field
+                              for field in schema]) for schema in schemas]
+
+    try:
+        unified = pa.unify_schemas([schema.remove_metadata() for schema in schemas], promote_options='permissive')
+    except (pa.ArrowTypeError, pa.ArrowInvalid) as e:
+        raise ValueError(f"Schemas can't be unified: {e}") from e
+
+    everywhere = set.intersection(*(set(schema.names) for schema in schemas))
+    return pa.schema([field if field.name in everywhere else field.with_nullable(True) for field in unified])
+
+
+def conform(table, schema: pa.Schema):
+    """
+    Cast a pa.Table or pa.RecordBatch to a unified schema
+
+    Columns are reordered to match, missing ones are filled with nulls and the rest
+    are cast with Arrow's safe cast, so a value that doesn't fit its new type (say a
+    large int64 becoming a float64) raises instead of being silently changed.
+
+    Raises:
+        ValueError: if the table has a column the schema doesn't
+    """
+    if table.schema.equals(schema):
+        return table
+
+    extra = set(table.schema.names) - set(schema.names)
+    if extra:
+        raise ValueError(f"Columns {sorted(extra)} are not in the target schema")
+
+    columns = []
+    for field in schema:
+        index = table.schema.get_field_index(field.name)
+        if index < 0:
+            columns.append(pa.nulls(table.num_rows, field.type))
+        else:
+            column = table.column(index)
+            columns.append(column if column.type.equals(field.type) else column.cast(field.type))
+    return type(table).from_arrays(columns, schema=schema)
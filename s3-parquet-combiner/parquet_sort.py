@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Row Ordering
+
+Orders the rows of a combined output so its row-group min/max statistics become
+selective: either sorted on a list of columns, or clustered on a Z-order curve over
+several columns so that filters on any one of them can skip row groups. Groups too
+large to sort in memory are sorted externally - sorted runs are spilled to local
+disk as Arrow IPC files and merged back batch by batch.
+
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+ZORDER_COLUMN = '__zorder'  # Sort key added while clustering, dropped before writing
+ZORDER_BITS = 32  # Most bits of any one column interleaved into the Z-order key
+SPILL_BATCH_ROWS = 65536  # Rows per batch in spilled runs, and so per run held while merging
+SORTED_CHUNK_ROWS = 131072  # Rows per table handed on from a merge
+
+
+def zorder_keys(columns: List[np.ndarray], bits: int) -> np.ndarray:
+    """Interleave the low bits of each uint64 array, first column in the lowest bit"""
+    keys = np.zeros(len(columns[0]), dtype=np.uint64)
+    for bit in range(bits):
+        for i, codes in enumerate(columns):
+            keys |= ((codes >> np.uint64(bit)) & np.uint64(1)) << np.uint64(bit * len(columns) + i)
+    return keys
+
+
+class RowOrder:
+    """
+    How rows are ordered within an output: sorted by columns, or clustered by Z-order
+
+    Clustering scales each column onto a fixed number of bits using bounds known up
+    front (the min/max statistics of the sources), so that every row of a group gets
+    its key on the same scale however the group is read.
+    """
+
+    def __init__(self, schema: pa.Schema, sort_by: List[str] = None, cluster_by: List[str] = None,
+                 bounds: Dict[str, tuple] = None):
+        """
+        Args:
+            schema: Schema of the rows being ordered
+            sort_by: Columns to sort by, ascending, in priority order
+            cluster_by: Numeric or temporal columns to cluster by
+            bounds: (min, max) of each cluster column, as plain numbers; a column without
+                    bounds falls back to sorting by the cluster columns
+
+        Raises:
+            ValueError: if a column isn't in the schema, or can't be clustered by
+        """
+        columns = sort_by or cluster_by
+        missing = [name for name in columns if schema.get_field_index(name) < 0]
+        if missing:
+            raise ValueError(f"Columns {missing} are not in the schema")
+
+        self.cluster_by = []
+        self.bounds = {}
+        if cluster_by:
+            for name in cluster_by:
+                field_type = schema.field(name).type
+                if not (pa.types.is_integer(field_type) or pa.types.is_floating(field_type)
+                        or pa.types.is_boolean(field_type) or pa.types.is_temporal(field_type)):
+                    raise ValueError(f"Can't cluster by '{name}' of type {field_type}; use sort_by")
+            if bounds is not None and all(bounds.get(name) is not None for name in cluster_by):
+                self.cluster_by = list(cluster_by)
+                self.bounds = bounds
+
+        if self.cluster_by:
+            self.sort_keys = [(ZORDER_COLUMN, 'ascending')]
+        else:
+            self.sort_keys = [(name, 'ascending') for name in columns]
+
+    def _codes(self, column: pa.ChunkedArray, name: str, bits: int) -> np.ndarray:
+        """Scale a column onto [0, 2^bits) by its bounds; nulls and NaN map to 0"""
+        values = column.combine_chunks()
+        if pa.types.is_temporal(values.type):
+            values = values.view(pa.int32() if values.type.bit_width == 32 else pa.int64())
+        values = values.cast(pa.float64()).to_numpy(zero_copy_only=False)
+
+        low, high = self.bounds[name]
+        span = float(high) - float(low)
+        if span <= 0:
+            return np.zeros(len(values), dtype=np.uint64)
+        scaled = np.clip((values - float(low)) / span, 0.0, 1.0) * ((1 << bits) - 1)
+        return np.nan_to_num(scaled, nan=0.0).astype(np.uint64)
+
+    def keyed(self, table: pa.Table) -> pa.Table:
+        """The table with whatever key column the order needs added"""
+        if not self.cluster_by:
+            return table
+        bits = min(ZORDER_BITS, 64 // len(self.cluster_by))
+        codes = [self._codes(table.column(name), name, bits) for name in self.cluster_by]
+        return table.append_column(ZORDER_COLUMN, pa.array(zorder_keys(codes, bits)))
+
+    def strip(self, table: pa.Table) -> pa.Table:
+        """The table without the key column added by keyed()"""
+        if not self.cluster_by:
+            return table
+        return table.drop_columns([ZORDER_COLUMN])
+
+    def sort(self, table: pa.Table) -> pa.Table:
+        """Order a table held in memory"""
+        return self.strip(self.keyed(table).sort_by(self.sort_keys))
+
+
+class ExternalSorter:
+    """
+    Sort a stream of tables too large to hold in memory
+
+    Tables are buffered up to buffer_bytes (of decoded Arrow data), then sorted and
+    spilled to a temporary directory as one run. sorted() merges the runs back,
+    holding only one batch of each run at a time. A stream that fits in the buffer
+    is sorted in memory without touching disk. Use as a context manager so spilled
+    runs are always removed.
+    """
+
+    def __init__(self, sort_keys: List[tuple], buffer_bytes: int, spill_dir: str = None):
+        """
+        Args:
+            sort_keys: (column, 'ascending' | 'descending') pairs, as for pa.Table.sort_by
+            buffer_bytes: Decoded bytes buffered before a run is spilled
+            spill_dir: Directory the runs are spilled under (default: the system temp dir)
+        """
+        self.sort_keys = sort_keys
+        self.buffer_bytes = buffer_bytes
+        self.spill_dir = spill_dir
+        self.runs = []  # Paths of spilled runs
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        """Remove the spilled runs"""
+        if self._dir is not None:
+            shutil.rmtree(self._dir, ignore_errors=True)
+            self._dir = None
+
+    def add(self, table: pa.Table):
+        """Buffer a table, spilling a sorted run once the buffer is full"""
+        self._buffer.append(table)
+        self._buffered_bytes += table.nbytes
+        if self._buffered_bytes >= self.buffer_bytes:
+            self._spill()
+
+    def _spill(self):
+        if self._dir is None:
+            self._dir = tempfile.mkdtemp(prefix='parquet-sort-', dir=self.spill_dir)
+        table = pa.concat_tables(self._buffer).sort_by(self.sort_keys)
+        self._buffer, self._buffered_bytes = [], 0
+
+        path = os.path.join(self._dir, f"run_{len(self.runs):05d}.arrow")
+        options = pa.ipc.IpcWriteOptions(compression='lz4')
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table, max_chunksize=SPILL_BATCH_ROWS)
+        self.runs.append(path)
+
+    def sorted(self) -> Iterator[pa.Table]:
+        """Yield every row added, in order, as tables of about SORTED_CHUNK_ROWS rows"""
+        if not self.runs:
+            if self._buffer:
+                table = pa.concat_tables(self._buffer).sort_by(self.sort_keys)
+                self._buffer, self._buffered_bytes = [], 0
+                for offset in range(0, table.num_rows, SORTED_CHUNK_ROWS):
+                    yield table.slice(offset, SORTED_CHUNK_ROWS)
+            return
+
+        if self._buffer:
+            self._spill()
+
+        chunk, chunk_rows = [], 0
+        for table in self._merge():
+            chunk.append(table)
+            chunk_rows += table.num_rows
+            if chunk_rows >= SORTED_CHUNK_ROWS:
+                yield pa.concat_tables(chunk)
+                chunk, chunk_rows = [], 0
+        if chunk:
+            yield pa.concat_tables(chunk)
+
+    def _merge(self) -> Iterator[pa.Table]:
+        """
+        k-way merge of the spilled runs, a batch of each at a time
+
+        The current batches of all runs are sorted together. No row still unread can
+        sort before the smallest of the last rows of the runs with batches left, so
+        everything up to that row is emitted; the rest waits for the next round, in
+        which every run whose rows were all emitted reads its next batch.
+        """
+        readers = [pa.ipc.open_file(pa.memory_map(path, 'r')) for path in self.runs]
+        positions = [0] * len(readers)
+        pending = [None] * len(readers)  # Unemitted rows of each run's current batch
+
+        while True:
+            for run, reader in enumerate(readers):
+                while (pending[run] is None or pending[run].num_rows == 0) and positions[run] < reader.num_record_batches:
+                    pending[run] = pa.Table.from_batches([reader.get_batch(positions[run])])
+                    positions[run] += 1
+
+            live = [run for run in range(len(readers)) if pending[run] is not None and pending[run].num_rows]
+            if not live:
+                return
+
+            table = pa.concat_tables([pending[run] for run in live])
+            indices = pc.sort_indices(table, sort_keys=self.sort_keys).to_numpy()
+            rank = np.empty_like(indices)
+            rank[indices] = np.arange(len(indices))
+            offsets = np.cumsum([0] + [pending[run].num_rows for run in live])
+
+            bounded = [rank[offsets[i + 1] - 1] for i, run in enumerate(live)
+                       if positions[run] < readers[run].num_record_batches]
+            cut = int(min(bounded)) + 1 if bounded else len(indices)
+            yield table.take(pa.array(indices[:cut]))
+
+            for i, run in enumerate(live):
+                keep = np.nonzero(rank[offsets[i]:offsets[i + 1]] >= cut)[0]
+                pending[run] = pending[run].take(pa.array(keep, type=pa.int64()))
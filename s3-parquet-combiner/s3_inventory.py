@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""
+S3 Object Inventory
+
+A single listing of a bucket prefix shared by the combiners and the verifier. Every
+object's key, size, ETag and last-modified time is kept in key order in compact
+parallel arrays, so the scripts plan from one walk of the prefix instead of each
+paginating list_objects_v2 (and calling head_object) on its own.
+
+The inventory can be saved to a local Parquet file and loaded again by a later run
+while it is younger than a maximum age, and it can be seeded from an S3 Inventory
+report (CSV or Parquet) instead of listing at all. Listing itself can be sharded by
+table: the table-level common prefixes are found first and then listed concurrently.
+Objects a run writes or deletes itself are recorded as it goes, so a saved inventory
+stays current for the next run.
+
+"""
+
+import bisect
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+from urllib.parse import unquote_plus
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LIST_WORKERS = 1  # Table prefixes listed concurrently; 1 walks the whole prefix with one paginator
+DEFAULT_CACHE_MAX_AGE = 3600  # Seconds a saved inventory is reused before the prefix is listed again
+INVENTORY_FETCH_WORKERS = 8  # S3 Inventory report files fetched concurrently
+INVENTORY_FORMATS = ('CSV', 'Parquet')  # S3 Inventory report formats that can seed an inventory
+
+# S3 Inventory field names in CSV reports (the Parquet schema uses snake_case)
+INVENTORY_FIELDS = {
+    'key': ('Key', 'key'),
+    'size': ('Size', 'size'),
+    'etag': ('ETag', 'e_tag'),
+    'last_modified': ('LastModifiedDate', 'last_modified_date'),
+    'is_latest': ('IsLatest', 'is_latest'),
+    'is_delete_marker': ('IsDeleteMarker', 'is_delete_marker'),
+}
+
+
+def parse_s3_uri(uri: str) -> Tuple[str, str]:
+    """Split s3://bucket/key into (bucket, key)"""
+    if not uri.startswith('s3://'):
+        raise ValueError(f"Expected an s3:// URI, got {uri}")
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    return bucket, key
+
+
+class S3Inventory:
+    """
+    Key-ordered listing of the objects under one bucket prefix
+
+    Entries are (key, size, etag, last_modified) tuples, last_modified being seconds
+    since the epoch. Lookups are binary searches over the sorted keys. record() and
+    forget() keep the inventory in step with objects the caller writes and deletes,
+    and are safe to call from worker threads.
+    """
+
+    def __init__(self, s3_client, bucket: str, prefix: str = ''):
+        """
+        Args:
+            s3_client: boto3 S3 client
+            bucket: Bucket whose objects are listed
+            prefix: Only objects under this prefix are kept
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.source = None  # 'list', 'cache' or the S3 Inventory manifest the entries came from
+        self.listed_at = None  # When the entries were listed, as seconds since the epoch
+        self.cache_path = None
+        self._keys = []
+        self._sizes = array('q')
+        self._etags = []
+        self._modified = array('q')
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: str) -> bool:
+        return self._index(key) is not None
+
+    def _index(self, key: str) -> Optional[int]:
+        index = bisect.bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            return index
+        return None
+
+    def _replace(self, entries: Iterable[Tuple[str, int, str, int]]):
+        """Replace the contents with the given entries, keeping only those under the prefix"""
+        entries = sorted(entry for entry in entries if entry[0].startswith(self.prefix))
+        with self._lock:
+            self._keys = [key for key, _, _, _ in entries]
+            self._sizes = array('q', (size for _, size, _, _ in entries))
+            self._etags = [etag for _, _, etag, _ in entries]
+            self._modified = array('q', (modified for _, _, _, modified in entries))
+
+    def get(self, key: str) -> Optional[Tuple[str, int, str, int]]:
+        """The (key, size, etag, last_modified) entry of an object, or None if it isn't listed"""
+        with self._lock:
+            index = self._index(key)
+            if index is None:
+                return None
+            return key, self._sizes[index], self._etags[index], self._modified[index]
+
+    def etag(self, key: str) -> Optional[str]:
+        """ETag of an object (without quotes), or None if it isn't listed"""
+        entry = self.get(key)
+        return entry[2] if entry else None
+
+    def objects(self, prefix: str = None) -> List[Tuple[str, int, str, int]]:
+        """Entries of every object under prefix (default: the whole inventory), in key order"""
+        prefix = prefix or self.prefix
+        with self._lock:
+            start = bisect.bisect_left(self._keys, prefix)
+            end = start
+            while end < len(self._keys) and self._keys[end].startswith(prefix):
+                end += 1
+            return [(self._keys[i], self._sizes[i], self._etags[i], self._modified[i]) for i in range(start, end)]
+
+    def record(self, key: str, size: int, etag: str = None, last_modified: int = None):
+        """Add or update an object the caller has just written"""
+        if not key.startswith(self.prefix):
+            return
+        etag = (etag or '').strip('"')
+        last_modified = int(time.time()) if last_modified is None else last_modified
+        with self._lock:
+            index = bisect.bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                self._sizes[index], self._etags[index], self._modified[index] = size, etag, last_modified
+            else:
+                self._keys.insert(index, key)
+                self._sizes.insert(index, size)
+                self._etags.insert(index, etag)
+                self._modified.insert(index, last_modified)
+
+    def forget(self, key: str):
+        """Drop an object the caller has just deleted"""
+        with self._lock:
+            index = self._index(key)
+            if index is not None:
+                del self._keys[index], self._sizes[index], self._etags[index], self._modified[index]
+
+    def _list_prefix(self, prefix: str, delimiter: str = None) -> Tuple[List[Tuple[str, int, str, int]], List[str]]:
+        """
+        Walk one prefix with paginated list_objects_v2
+
+        Returns:
+            (entries, common prefixes); common prefixes are only returned with a delimiter
+        """
+        entries, common_prefixes = [], []
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        options = {'Delimiter': delimiter} if delimiter else {}
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, **options):
+            for obj in page.get('Contents', []):
+                entries.append((obj['Key'], obj['Size'], obj.get('ETag', '').strip('"'),
+                                int(obj['LastModified'].timestamp())))
+            common_prefixes.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+        return entries, common_prefixes
+
+    def list_objects(self, workers: int = DEFAULT_LIST_WORKERS):
+        """
+        List the prefix, replacing the current entries
+
+        With one worker the prefix is walked by a single paginator. With more, the
+        table-level common prefixes (and any objects directly under the prefix) are
+        found with a '/' delimiter first, and then up to workers tables are listed at
+        once, so a prefix with thousands of tables isn't limited to one request at a time.
+        """
+        logger.info(f"Listing s3://{self.bucket}/{self.prefix}" + (f" with {workers} workers" if workers > 1 else ""))
+        started = time.time()
+        if workers > 1:
+            entries, table_prefixes = self._list_prefix(self.prefix, delimiter='/')
+            logger.info(f"Listing {len(table_prefixes)} table prefixes concurrently")
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for table_entries, _ in pool.map(self._list_prefix, table_prefixes):
+                    entries.extend(table_entries)
+        else:
+            entries, _ = self._list_prefix(self.prefix)
+        self._replace(entries)
+        self.source = 'list'
+        self.listed_at = started
+        logger.info(f"Listed {len(self)} objects in {time.time() - started:.1f}s")
+
+    def load_inventory_report(self, manifest_uri: str):
+        """
+        Seed the entries from an S3 Inventory report instead of listing
+
+        manifest_uri points at the manifest.json of one delivered report. Its data files
+        are fetched concurrently; only current versions that aren't delete markers are
+        kept. The report is a snapshot, so objects written after it was taken are
+        missing until the prefix is listed again.
+        """
+        manifest_bucket, manifest_key = parse_s3_uri(manifest_uri)
+        response = self.s3_client.get_object(Bucket=manifest_bucket, Key=manifest_key)
+        manifest = json.loads(response['Body'].read())
+
+        if manifest.get('sourceBucket') != self.bucket:
+            raise ValueError(f"Inventory report {manifest_uri} is for bucket {manifest.get('sourceBucket')}, "
+                             f"not {self.bucket}")
+        file_format = manifest.get('fileFormat')
+        if file_format not in INVENTORY_FORMATS:
+            raise ValueError(f"Unsupported inventory format {file_format}; expected one of {INVENTORY_FORMATS}")
+
+        data_bucket = manifest['destinationBucket'].split(':::')[-1]
+        fields = [field.strip() for field in manifest.get('fileSchema', '').split(',')]
+
+        def read_file(entry):
+            body = self.s3_client.get_object(Bucket=data_bucket, Key=entry['key'])['Body'].read()
+            if file_format == 'CSV':
+                return self._csv_entries(body, fields)
+            return self._parquet_entries(body)
+
+        logger.info(f"Seeding the listing from {len(manifest['files'])} {file_format} inventory files")
+        entries = []
+        with ThreadPoolExecutor(max_workers=INVENTORY_FETCH_WORKERS) as pool:
+            for file_entries in pool.map(read_file, manifest['files']):
+                entries.extend(file_entries)
+
+        self._replace(entries)
+        self.source = manifest_uri
+        self.listed_at = int(manifest.get('creationTimestamp', time.time() * 1000)) / 1000
+        logger.info(f"Loaded {len(self)} objects from inventory report taken "
+                    f"{datetime.fromtimestamp(self.listed_at).isoformat()}")
+
+    def _csv_entries(self, body: bytes, fields: List[str]) -> List[Tuple[str, int, str, int]]:
+        """Entries of a gzipped CSV inventory file whose columns are fields"""
+        column = {name: fields.index(field) for name, (field, _) in INVENTORY_FIELDS.items() if field in fields}
+        entries = []
+        for row in csv.reader(io.TextIOWrapper(gzip.GzipFile(fileobj=io.BytesIO(body)), encoding='utf-8')):
+            if 'is_latest' in column and row[column['is_latest']].lower() != 'true':
+                continue
+            if 'is_delete_marker' in column and row[column['is_delete_marker']].lower() == 'true':
+                continue
+            modified = row[column['last_modified']] if 'last_modified' in column else ''
+            entries.append((
+                unquote_plus(row[column['key']]),  # Keys are URL-encoded in CSV reports
+                int(row[column['size']] or 0),
+                row[column['etag']] if 'etag' in column else '',
+                int(datetime.fromisoformat(modified.replace('Z', '+00:00')).timestamp()) if modified else 0,
+            ))
+        return entries
+
+    def _parquet_entries(self, body: bytes) -> List[Tuple[str, int, str, int]]:
+        """Entries of a Parquet inventory file"""
+        table = pq.read_table(pa.BufferReader(body))
+        names = set(table.schema.names)
+        columns = {name: table.column(field).to_pylist() for name, (_, field) in INVENTORY_FIELDS.items()
+                   if field in names}
+        entries = []
+        for i, key in enumerate(columns['key']):
+            if 'is_latest' in columns and columns['is_latest'][i] is False:
+                continue
+            if 'is_delete_marker' in columns and columns['is_delete_marker'][i]:
+                continue
+            modified = columns['last_modified'][i] if 'last_modified' in columns else None
+            entries.append((
+                key,
+                (columns['size'][i] or 0) if 'size' in columns else 0,
+                (columns['etag'][i] or '') if 'etag' in columns else '',
+                int(modified.timestamp()) if modified else 0,
+            ))
+        return entries
+
+    def load(self, path: str) -> bool:
+        """
+        Load entries saved by save()
+
+        Returns:
+            False (leaving the inventory unchanged) if the file is for another bucket or prefix
+        """
+        table = pq.read_table(path)
+        metadata = {key.decode(): value.decode() for key, value in (table.schema.metadata or {}).items()}
+        if metadata.get('bucket') != self.bucket or metadata.get('prefix') != self.prefix:
+            logger.info(f"Listing cache {path} is for s3://{metadata.get('bucket')}/{metadata.get('prefix')} - ignoring it")
+            return False
+
+        with self._lock:
+            self._keys = table.column('key').to_pylist()
+            self._sizes = array('q', table.column('size').to_pylist())
+            self._etags = table.column('etag').to_pylist()
+            self._modified = array('q', table.column('last_modified').to_pylist())
+        self.source = metadata.get('source', 'cache')
+        self.listed_at = float(metadata['listed_at'])
+        return True
+
+    def save(self, path: str = None):
+        """Write the entries to a local Parquet file (atomically, via a temporary file)"""
+        path = path or self.cache_path
+        with self._lock:
+            table = pa.table({
+                'key': pa.array(self._keys, pa.string()),
+                'size': pa.array(self._sizes, pa.int64()),
+                'etag': pa.array(self._etags, pa.string()),
+                'last_modified': pa.array(self._modified, pa.int64()),
+            })
+        table = table.replace_schema_metadata({
+            'bucket': self.bucket,
+            'prefix': self.prefix,
+            'source': self.source or 'list',
+            'listed_at': str(self.listed_at),
+        })
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        pq.write_table(table, temporary_path, compression='zstd')
+        os.replace(temporary_path, path)
+        logger.debug(f"Saved {len(table)} objects to listing cache {path}")
+
+    def populate(self, cache_path: str = None, max_age: float = DEFAULT_CACHE_MAX_AGE,
+                 inventory_report: str = None, list_workers: int = DEFAULT_LIST_WORKERS) -> 'S3Inventory':
+        """
+        Fill the inventory from the cheapest source available
+
+        A saved inventory at cache_path listed less than max_age seconds ago is loaded
+        as is. Otherwise the entries come from inventory_report when given, or from
+        listing the prefix with list_workers concurrent table listings, and are saved
+        to cache_path for the next run.
+
+        Returns:
+            The inventory itself
+        """
+        self.cache_path = cache_path
+        if cache_path and os.path.exists(cache_path) and self.load(cache_path):
+            # Age counts from the listing itself; objects recorded since don't make it fresher
+            age = time.time() - self.listed_at
+            if age <= max_age:
+                logger.info(f"Loaded {len(self)} objects from listing cache {cache_path} "
+                            f"({age:.0f}s old, listed from {self.source})")
+                return self
+            logger.info(f"Listing cache {cache_path} is {age:.0f}s old (max {max_age:.0f}s) - refreshing it")
+
+        if inventory_report:
+            self.load_inventory_report(inventory_report)
+        else:
+            self.list_objects(list_workers)
+
+        if cache_path:
+            self.save(cache_path)
+        return self
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+S3 Multipart Writer
+
+Writable file object that uploads to S3 as it is written. Data is cut into
+multipart upload parts that are sent on a small thread pool while the caller keeps
+writing, so encoding the next row groups overlaps with uploading the previous ones
+instead of waiting for the whole file before the first byte is uploaded.
+
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 rejects non-final parts smaller than 5 MiB
+MAX_PARTS = 10000  # S3 limit on parts per upload
+DEFAULT_PART_SIZE_MB = 64
+DEFAULT_UPLOAD_CONCURRENCY = 4
+
+
+class S3MultipartWriter:
+    """
+    Write-only file object backed by an S3 multipart upload
+
+    The multipart upload is only started once a full part has been written; an object
+    smaller than one part is sent with a single put_object on close(). At most
+    upload_concurrency parts are uploading at once and write() blocks when a further
+    part is ready, so memory stays around (upload_concurrency + 1) * part_size.
+
+    Nothing is visible at the key until close() completes the upload. abort() (or an
+    exception inside a with block) discards the parts already uploaded.
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str, part_size: int = DEFAULT_PART_SIZE_MB * 1024 * 1024,
+                 upload_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY,
+                 on_complete: Callable[[str, int, str], None] = None):
+        """
+        Args:
+            s3_client: boto3 S3 client
+            bucket: Destination bucket
+            key: Destination key
+            part_size: Size of each uploaded part in bytes (at least 5 MiB)
+            upload_concurrency: Number of parts uploaded concurrently
+            on_complete: Called with (key, size, ETag) once the object is visible at its key
+        """
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(MIN_PART_SIZE, int(part_size))
+        self.upload_concurrency = max(1, upload_concurrency)
+        self.on_complete = on_complete
+        self.etag = None  # ETag of the completed object
+        self.closed = False
+        self._buffer = bytearray()
+        self._position = 0
+        self._upload_id = None
+        self._parts = []  # (part_number, future) in part order
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(self.upload_concurrency)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def writable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return False
+
+    def seekable(self) -> bool:
+        return False
+
+    def tell(self) -> int:
+        """Number of bytes written so far, uploaded or not"""
+        return self._position
+
+    def flush(self):
+        """No-op: parts are uploaded as soon as they fill up"""
+
+    def write(self, data) -> int:
+        """Buffer data, handing every full part to the upload pool"""
+        if self.closed:
+            raise ValueError(f"write to closed S3 object {self.key}")
+
+        data = memoryview(data).cast('B')
+        self._buffer += data
+        self._position += len(data)
+
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            self._upload_part(part)
+        return len(data)
+
+    def rename(self, key: str) -> bool:
+        """
+        Send the object to another key, if no part has been uploaded yet
+
+        Returns:
+            True if the object will be created at key; False once the multipart upload
+            has started, since its parts belong to the key it was started for
+        """
+        if self._upload_id is not None or self.closed:
+            return False
+        self.key = key
+        return True
+
+    def _upload_part(self, body: bytes):
+        if self._upload_id is None:
+            response = self.s3_client.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self._upload_id = response['UploadId']
+            self._pool = ThreadPoolExecutor(max_workers=self.upload_concurrency)
+
+        part_number = len(self._parts) + 1
+        if part_number > MAX_PARTS:
+            raise ValueError(f"{self.key} needs more than {MAX_PARTS} parts; increase the part size")
+
+        # Wait for a free upload slot, surfacing any failed part straight away
+        self._slots.acquire()
+        for _, future in self._parts:
+            if future.done() and future.exception() is not None:
+                self._slots.release()
+                raise future.exception()
+
+        future = self._pool.submit(self._send_part, part_number, body)
+        self._parts.append((part_number, future))
+        logger.debug(f"Queued part {part_number} of {self.key} ({len(body)} bytes)")
+
+    def _send_part(self, part_number: int, body: bytes) -> str:
+        try:
+            response = self.s3_client.upload_part(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=body
+            )
+            return response['ETag']
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Upload whatever is buffered and make the object visible at its key"""
+        if self.closed:
+            return
+
+        try:
+            if self._upload_id is None:
+                response = self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+            else:
+                if self._buffer:
+                    self._upload_part(bytes(self._buffer))
+                parts = [{'PartNumber': number, 'ETag': future.result()} for number, future in self._parts]
+                response = self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket,
+                    Key=self.key,
+                    UploadId=self._upload_id,
+                    MultipartUpload={'Parts': parts}
+                )
+                logger.debug(f"Completed {self.key} in {len(parts)} parts")
+        except Exception:
+            self.abort()
+            raise
+
+        self.etag = response.get('ETag', '').strip('"')
+        self._finish()
+        if self.on_complete is not None:
+            self.on_complete(self.key, self._position, self.etag)
+
+    def abort(self):
+        """Discard the object: cancel queued parts and abort the multipart upload"""
+        if self.closed:
+            return
+
+        if self._upload_id is not None:
+            for _, future in self._parts:
+                future.cancel()
+            self._pool.shutdown(wait=True)
+            try:
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id)
+            except Exception as e:
+                logger.warning(f"Could not abort multipart upload of {self.key}: {e}")
+
+        self._finish()
+
+    def _finish(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+        self._buffer = bytearray()
+        self._parts = []
+        self.closed = True
@@ -9,17 +9,41 @@ including row counts, column schemas, data types, and content verification.
 """
 
 import argparse
+import bisect
+import math
+import random
 import boto3
+import numpy as np
 import pyarrow as pa
+import pyarrow.compute as pc
 import pyarrow.parquet as pq
-import pandas as pd
 import s3fs
 from botocore.exceptions import ClientError
 import logging
-from typing import Dict, List, Tuple, Set
-from collections import defaultdict
-import hashlib
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Set
+from collections import Counter, defaultdict
 import json
+from concurrent.futures import ThreadPoolExecutor
+
+from combine_common import MANIFEST_DIR, ByteBudget
+from parquet_fingerprint import TableFingerprint, row_buckets, row_hashes
+from parquet_footer import fetch_footer, row_group_bounds, summarize_footers
+from parquet_partition import hive_partitions, restore_partition_columns
+from parquet_schema import conform, footer_schema, unify_schemas
+from s3_inventory import DEFAULT_CACHE_MAX_AGE, DEFAULT_LIST_WORKERS, S3Inventory
+
+# Configuration
+BATCH_ROWS = 65536  # Rows read and fingerprinted at a time when streaming a file
+DIFF_MAX_ROWS = 1000000  # Rows (both sides together) held in memory when locating the rows behind a mismatch
+DIFF_REPORT_ROWS = 20  # Differing rows of each kind (changed, missing, extra) listed in the issues
+FOOTER_FETCH_WORKERS = 16  # Concurrent ranged footer reads in footer-level verification
+VERIFICATION_LEVELS = ['footer', 'sample', 'full']  # footer: metadata only; sample: seeded key ranges; full: every row
+DEFAULT_SAMPLE_FRACTION = 0.01  # Share of source row groups whose key ranges are compared at the sample level
+MIN_SAMPLE_ROW_GROUPS = 30  # Floor on the row groups sampled per table, so small tables still get a useful bound
+DEFAULT_CONFIDENCE = 0.95  # Confidence of the reported bound on how much data a passing sample could have missed
+DEFAULT_WORKERS = 1  # Tables (or lineage groups) verified concurrently
+DEFAULT_FILE_WORKERS = 4  # Files streamed concurrently within one table or group
+DEFAULT_MAX_INFLIGHT_MB = 2048  # Cap on the combined source size of the tables being verified at once
 
 # Setup logging
 logging.basicConfig(
@@ -36,7 +60,13 @@ logger = logging.getLogger(__name__)
 
 class S3ParquetVerifier:
     def __init__(self, bucket_name: str, prefix: str = "", aws_access_key_id: str = None,
-                 aws_secret_access_key: str = None):
+                 aws_secret_access_key: str = None, level: str = 'full', lineage: bool = False,
+                 groups: List[str] = None, workers: int = DEFAULT_WORKERS,
+                 file_workers: int = DEFAULT_FILE_WORKERS, max_inflight_mb: int = DEFAULT_MAX_INFLIGHT_MB,
+                 sample_fraction: float = DEFAULT_SAMPLE_FRACTION, sample_seed: int = 0, sample_column: str = None,
+                 confidence: float = DEFAULT_CONFIDENCE, listing_cache: str = None,
+                 listing_cache_max_age: float = DEFAULT_CACHE_MAX_AGE, inventory_report: str = None,
+                 list_workers: int = DEFAULT_LIST_WORKERS):
         """
         Initialize the S3 Parquet Verifier
 
@@ -45,14 +75,45 @@ class S3ParquetVerifier:
             prefix: Prefix path in S3 (e.g., 'database-export/')
             aws_access_key_id: AWS access key (optional, uses default credentials if None)
             aws_secret_access_key: AWS secret key (optional, uses default credentials if None)
+            level: 'full' to compare every row, 'sample' to compare a seeded sample of key ranges,
+                   or 'footer' to compare footer metadata only
+            lineage: Check each combined group against the inputs its manifest records, instead
+                     of all combined files of a table against all originals
+            groups: With lineage, only verify the groups producing these output keys
+            workers: Number of tables (or lineage groups) verified concurrently
+            file_workers: Number of files streamed concurrently within one table or group
+            max_inflight_mb: Maximum total size (MB) of the tables being verified at once
+            sample_fraction: At the sample level, share of source row groups whose key ranges are compared
+            sample_seed: Seed choosing the sampled row groups; the same seed re-checks the same ranges
+            sample_column: Column the sampled key ranges are defined on (default: picked from the footers)
+            confidence: Confidence level of the bound reported for a passing sample
+            listing_cache: Local file the listing is saved to and reused from (e.g. the combiner's)
+            listing_cache_max_age: Seconds after which a saved listing is refreshed
+            inventory_report: s3:// URI of an S3 Inventory manifest.json to seed the listing from
+            list_workers: Number of table prefixes listed concurrently (1 lists the prefix sequentially)
         """
         self.bucket_name = bucket_name
+        self.level = level
+        self.lineage = lineage
+        self.groups = set(groups or [])
+        self.workers = max(1, workers)
+        self.file_workers = max(1, file_workers)
+        self.max_inflight_bytes = max_inflight_mb * 1024 * 1024
+        self.sample_fraction = sample_fraction
+        self.sample_seed = sample_seed
+        self.sample_column = sample_column
+        self.confidence = confidence
+        self.listing_cache = listing_cache
+        self.listing_cache_max_age = listing_cache_max_age
+        self.inventory_report = inventory_report
+        self.list_workers = max(1, list_workers)
         self.prefix = prefix.rstrip('/') + '/' if prefix else ''
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
         )
+        self.inventory = S3Inventory(self.s3_client, bucket_name, self.prefix)  # Filled in while listing
 
         # Initialize s3fs for PyArrow
         self.s3fs = s3fs.S3FileSystem(
@@ -84,41 +145,32 @@ class S3ParquetVerifier:
         logger.info(f"Scanning S3 bucket: {self.bucket_name} with prefix: '{self.prefix}'")
 
         try:
-            paginator = self.s3_client.get_paginator('list_objects_v2')
-            page_iterator = paginator.paginate(
-                Bucket=self.bucket_name,
-                Prefix=self.prefix
-            )
+            self.inventory.populate(self.listing_cache, self.listing_cache_max_age, self.inventory_report,
+                                    self.list_workers)
 
             total_files = 0
-            for page in page_iterator:
-                if 'Contents' not in page:
-                    continue
-
-                for obj in page['Contents']:
-                    key = obj['Key']
-                    size = obj['Size']
-                    total_files += 1
+            for key, size, _, _ in self.inventory.objects():
+                total_files += 1
 
-                    # Skip if not a parquet file
-                    if not key.lower().endswith('.parquet'):
-                        continue
+                # Skip if not a parquet file
+                if not key.lower().endswith('.parquet'):
+                    continue
 
-                    # Extract table name (first subdirectory after prefix)
-                    relative_path = key[len(self.prefix):] if self.prefix else key
-                    path_parts = relative_path.split('/')
+                # Extract table name (first subdirectory after prefix)
+                relative_path = key[len(self.prefix):] if self.prefix else key
+                path_parts = relative_path.split('/')
 
-                    if len(path_parts) >= 2:
-                        table_name = path_parts[0]
-                        filename = path_parts[-1]
+                if len(path_parts) >= 2:
+                    table_name = path_parts[0]
+                    filename = path_parts[-1]
 
-                        # Classify as combined or original based on filename pattern
-                        if filename.startswith('combined_') and 'MB.parquet' in filename:
-                            tables[table_name]['combined'].append((key, size))
-                        else:
-                            tables[table_name]['original'].append((key, size))
+                    # Classify as combined or original based on filename pattern
+                    if filename.startswith('combined_') and 'MB.parquet' in filename:
+                        tables[table_name]['combined'].append((key, size))
+                    else:
+                        tables[table_name]['original'].append((key, size))
 
-                        logger.debug(f"Classified {key} as {'combined' if filename.startswith('combined_') else 'original'}")
+                    logger.debug(f"Classified {key} as {'combined' if filename.startswith('combined_') else 'original'}")
 
             logger.info(f"Found {total_files} total files")
 
@@ -145,21 +197,84 @@ class S3ParquetVerifier:
             logger.error(f"Error reading parquet file {s3_key}: {e}")
             raise
 
-    def get_table_hash(self, table: pa.Table) -> str:
+    def iter_parquet_batches(self, s3_key: str) -> Iterator[pa.RecordBatch]:
         """
-        Generate a hash of the table data for comparison
-        Converts to pandas and sorts to ensure consistent ordering
+        Stream a parquet file from S3 as record batches
+
+        Column chunks are read one row group at a time through a seekable S3 file, so
+        only one row group of the file is ever held in memory.
         """
+        s3_path = f"s3://{self.bucket_name}/{s3_key}"
+        logger.debug(f"Streaming parquet file: {s3_path}")
         try:
-            # Convert to pandas for consistent sorting
-            df = table.to_pandas()
+            with self.s3fs.open(s3_path, 'rb') as f:
+                parquet_file = pq.ParquetFile(f)
+                yield from parquet_file.iter_batches(batch_size=BATCH_ROWS)
+        except Exception as e:
+            logger.error(f"Error reading parquet file {s3_key}: {e}")
+            raise
+
+    def fingerprint_file(self, s3_key: str, target: pa.Schema = None,
+                         reference: pa.Schema = None) -> Tuple[TableFingerprint, pa.Schema]:
+        """
+        Stream one file into its own fingerprint; returns (fingerprint, Arrow schema)
+
+        With reference, partition columns the file only holds in its path are restored
+        (see restore_partitions()). With target, every batch is then cast to that schema
+        and it is the schema returned.
+        """
+        fingerprint = TableFingerprint(bucketed=True)
+        schema = target
+        for batch in self.iter_parquet_batches(s3_key):
+            batch = self.restore_partitions(s3_key, batch, reference)
+            schema = schema or batch.schema
+            fingerprint.update(batch if target is None else conform(batch, target))
+        if schema is None:
+            # No rows to stream; the footer still has the schema
+            schema = pq.read_schema(f"s3://{self.bucket_name}/{s3_key}", filesystem=self.s3fs)
+            schema = self.restore_partitions(s3_key, schema.empty_table(), reference).schema
+        return fingerprint, schema
+
+    def fingerprint_files(self, files: List[Tuple[str, int]], target: pa.Schema = None,
+                          reference: pa.Schema = None) -> Dict:
+        """
+        Fold a set of files into a row count and order-independent fingerprint
+
+        Up to file_workers files are streamed at once, each batch by batch into its own
+        fingerprint, and the per-file fingerprints are merged. Peak memory is about one
+        row group per file in flight, whatever the number or size of the files. With
+        target, every file is read as that schema (see unified_schema()), and with
+        reference any partition columns held only in file paths are restored.
 
-            # Sort by all columns to ensure consistent row ordering
-            df_sorted = df.sort_values(by=list(df.columns)).reset_index(drop=True)
+        Returns:
+            Dictionary with 'fingerprint', 'schema' (of the first file), 'size_mb' and
+            'schema_issues' for files whose schema differs from the first
+        """
+        fingerprint = TableFingerprint(bucketed=True)
+        schema = None
+        schema_issues = []
+
+        with ThreadPoolExecutor(max_workers=self.file_workers) as pool:
+            per_file = pool.map(lambda file_key: self.fingerprint_file(file_key, target, reference),
+                                [file_key for file_key, _ in files])
+            for (file_key, _), (file_fingerprint, file_schema) in zip(files, per_file):
+                if schema is None:
+                    schema = file_schema
+                elif not file_schema.equals(schema):
+                    schema_issues.extend(f"{file_key}: {issue}" for issue in self.compare_schemas(schema, file_schema))
+                fingerprint.merge(file_fingerprint)
+
+        size_mb = sum(size for _, size in files) / (1024 * 1024)
+        return {'fingerprint': fingerprint, 'schema': schema, 'size_mb': size_mb, 'schema_issues': schema_issues}
 
-            # Create hash of the sorted data
-            df_string = df_sorted.to_csv(index=False, header=True)
-            return hashlib.md5(df_string.encode()).hexdigest()
+    def get_table_hash(self, table: pa.Table) -> str:
+        """
+        Generate an order-independent fingerprint of the table data for comparison
+        Rows are hashed column by column in Arrow batches, so no sorting or pandas
+        conversion is needed for row order not to matter
+        """
+        try:
+            return TableFingerprint().update(table).hexdigest()
         except Exception as e:
             logger.error(f"Error generating table hash: {e}")
             raise
@@ -195,6 +310,538 @@ class S3ParquetVerifier:
 
         return issues
 
+    def fetch_footers(self, files: List[Tuple[str, int]]) -> List[bytes]:
+        """Fetch the footer of every file with concurrent ranged GETs"""
+        with ThreadPoolExecutor(max_workers=FOOTER_FETCH_WORKERS) as pool:
+            return list(pool.map(lambda file_info: fetch_footer(self.s3_client, self.bucket_name, file_info[0]),
+                                 files))
+
+    def restore_partitions(self, s3_key: str, data, reference: pa.Schema = None):
+        """
+        Data read from a file with the partition columns its Hive path holds added back
+
+        Repartitioned outputs don't store a column they are partitioned on by value; it
+        comes back from their `name=value/` directories, typed as in reference.
+        """
+        if reference is None:
+            return data
+        partitions = hive_partitions(s3_key[len(self.prefix):])
+        return restore_partition_columns(data, partitions, reference) if partitions else data
+
+    def partitioned_schemas(self, files: List[Tuple[str, int]], schemas: List[pa.Schema],
+                            reference: pa.Schema) -> List[pa.Schema]:
+        """Footer schemas of files with the partition columns in their paths restored"""
+        return [self.restore_partitions(file_key, schema.empty_table(), reference).schema
+                for (file_key, _), schema in zip(files, schemas)]
+
+    def reference_schema(self, original_schemas: List[pa.Schema]) -> Optional[pa.Schema]:
+        """Schema restored partition columns take their types from: the originals', unified if they drift"""
+        if not original_schemas:
+            return None
+        try:
+            return unify_schemas(original_schemas)
+        except ValueError:
+            return original_schemas[0]
+
+    def unified_schema(self, original_schemas: List[pa.Schema],
+                       combined_schemas: List[pa.Schema]) -> Optional[pa.Schema]:
+        """
+        Schema to compare both sides in when the original files' schemas have drifted
+
+        The combiners cast drifting sources to the schema unified from their footers,
+        so when the original and the combined files unify to the same schema, every
+        file is read as that schema and the drift itself isn't reported. Returns None
+        when all files already share a schema, or when the two sides don't unify to
+        the same one, leaving compare_schemas() to report the differences.
+        """
+        if not original_schemas or not combined_schemas:
+            return None
+        schemas = original_schemas + combined_schemas
+        if all(schema.equals(schemas[0]) for schema in schemas[1:]):
+            return None
+        try:
+            original, combined = unify_schemas(original_schemas), unify_schemas(combined_schemas)
+        except ValueError:
+            return None
+        if not original.equals(combined):
+            return None
+        logger.info("Files differ in schema but unify to the combined schema - comparing them as that schema")
+        return original
+
+    def verify_table_footers(self, table_name: str, original_files: List[Tuple[str, int]],
+                             combined_files: List[Tuple[str, int]]) -> Dict:
+        """
+        Verify a table from footer metadata alone, without reading any data pages
+
+        Compares total row counts, schemas, and per-column null counts and min/max
+        statistics aggregated over all row groups. Statistics missing on either side
+        are skipped rather than reported.
+
+        Returns:
+            Dictionary with verification results
+        """
+        logger.info(f"Verifying table '{table_name}' from footers...")
+
+        result = {
+            'table_name': table_name,
+            'passed': False,
+            'issues': [],
+            'original_files_count': len(original_files),
+            'combined_files_count': len(combined_files),
+            'original_total_rows': 0,
+            'combined_total_rows': 0,
+            'original_total_size_mb': sum(size for _, size in original_files) / (1024 * 1024),
+            'combined_total_size_mb': sum(size for _, size in combined_files) / (1024 * 1024)
+        }
+
+        try:
+            footers = {side: self.fetch_footers(files)
+                       for side, files in (('original', original_files), ('combined', combined_files))}
+            schemas = {side: [footer_schema(tail) for tail in footers[side]] for side in footers}
+            schemas['combined'] = self.partitioned_schemas(combined_files, schemas['combined'],
+                                                           self.reference_schema(schemas['original']))
+            target = self.unified_schema(schemas['original'], schemas['combined'])
+
+            sides = {}
+            for side, files in (('original', original_files), ('combined', combined_files)):
+                if target is None:
+                    for (file_key, _), schema in zip(files[1:], schemas[side][1:]):
+                        result['issues'].extend(f"{file_key}: {issue}"
+                                                for issue in self.compare_schemas(schemas[side][0], schema))
+                sides[side] = dict(summarize_footers(footers[side]), schema=target or schemas[side][0])
+                result[f'{side}_total_rows'] = sides[side]['rows']
+
+            original, combined = sides['original'], sides['combined']
+
+            if target is not None:
+                # A column some originals lack holds a null for each of their rows once combined
+                for tail in footers['original']:
+                    metadata = pq.read_metadata(pa.BufferReader(tail))
+                    paths = {metadata.schema.column(i).path for i in range(len(metadata.schema))}
+                    for path, stats in original['columns'].items():
+                        if path not in paths and stats['null_count'] is not None:
+                            stats['null_count'] += metadata.num_rows
+
+            # Verify row counts
+            if original['rows'] != combined['rows']:
+                result['issues'].append(f"Row count mismatch: original={original['rows']}, combined={combined['rows']}")
+
+            # Verify schemas
+            result['issues'].extend(self.compare_schemas(original['schema'], combined['schema']))
+
+            # Verify column statistics wherever both sides have them
+            compared, skipped = 0, 0
+            for path, original_stats in original['columns'].items():
+                combined_stats = combined['columns'].get(path)
+                if combined_stats is None:
+                    continue
+                for stat in ('null_count', 'min', 'max'):
+                    if original_stats[stat] is None or combined_stats[stat] is None:
+                        skipped += 1
+                    elif original_stats[stat] != combined_stats[stat]:
+                        result['issues'].append(f"Column '{path}' {stat} mismatch: "
+                                                f"original={original_stats[stat]!r}, combined={combined_stats[stat]!r}")
+                    else:
+                        compared += 1
+            logger.info(f"Compared {compared} column statistics ({skipped} not recorded on both sides)")
+
+            result['passed'] = len(result['issues']) == 0
+
+            if result['passed']:
+                logger.info(f"✓ Table '{table_name}' footer verification PASSED")
+            else:
+                logger.error(f"✗ Table '{table_name}' footer verification FAILED: {len(result['issues'])} issues found")
+                for issue in result['issues']:
+                    logger.error(f"  - {issue}")
+
+            return result
+
+        except Exception as e:
+            result['issues'].append(f"Verification error: {str(e)}")
+            logger.error(f"Error verifying table '{table_name}': {e}")
+            return result
+
+    def sample_key_type(self, key_type: pa.DataType):
+        """
+        Type that keys of key_type are compared as, or None if it can't key a sample
+
+        Temporal keys are compared as their integer storage so that statistics and
+        Arrow values land in the same Python type.
+        """
+        if pa.types.is_temporal(key_type) and key_type.bit_width in (32, 64):
+            return pa.int32() if key_type.bit_width == 32 else pa.int64()
+        if (pa.types.is_integer(key_type) or pa.types.is_decimal(key_type)
+                or pa.types.is_string(key_type) or pa.types.is_large_string(key_type)
+                or pa.types.is_binary(key_type) or pa.types.is_large_binary(key_type)):
+            return key_type
+        return None
+
+    def choose_sample_column(self, schema: pa.Schema, metadatas: List[pq.FileMetaData]) -> str:
+        """
+        Pick the column the sampled key ranges are defined on
+
+        Uses sample_column when given, otherwise the orderable top-level column whose
+        min/max statistics are recorded in the most row groups (the first on a tie).
+        Returns None when no column has usable statistics.
+        """
+        if self.sample_column:
+            if schema.get_field_index(self.sample_column) < 0:
+                raise ValueError(f"Sample column '{self.sample_column}' is not in the schema")
+            return self.sample_column
+
+        best, best_coverage = None, 0
+        for field in schema:
+            if self.sample_key_type(field.type) is None:
+                continue
+            coverage = sum(1 for metadata in metadatas
+                           for _, low, _ in row_group_bounds(metadata, field.name) if low is not None)
+            if coverage > best_coverage:
+                best, best_coverage = field.name, coverage
+        return best
+
+    def key_bounds(self, metadata: pq.FileMetaData, column: str, key_type: pa.DataType) -> List[Tuple]:
+        """row_group_bounds() with the bounds converted to the key's comparison type"""
+        compare_type = self.sample_key_type(key_type)
+        if compare_type == key_type:
+            return row_group_bounds(metadata, column)
+        return [(rows, None, None) if low is None else
+                (rows, pa.scalar(low, key_type).cast(compare_type).as_py(),
+                 pa.scalar(high, key_type).cast(compare_type).as_py())
+                for rows, low, high in row_group_bounds(metadata, column)]
+
+    def overlapping_ranges(self, ranges: List[Tuple], low, high) -> List[Tuple]:
+        """The sorted, disjoint ranges that overlap [low, high]"""
+        start = bisect.bisect_left([range_high for _, range_high in ranges], low)
+        end = bisect.bisect_right([range_low for range_low, _ in ranges], high)
+        return ranges[start:end]
+
+    def filter_key_ranges(self, table: pa.Table, column: str, ranges: List[Tuple]) -> pa.Table:
+        """Rows of table whose key falls inside one of the ranges; null keys never do"""
+        keys = table.column(column).combine_chunks()
+        compare_type = self.sample_key_type(keys.type)
+        if compare_type != keys.type:
+            keys = keys.view(compare_type)
+
+        bounds = pc.min_max(keys)
+        if not bounds['min'].is_valid:
+            return table.slice(0, 0)
+
+        mask = None
+        for range_low, range_high in self.overlapping_ranges(ranges, bounds['min'].as_py(), bounds['max'].as_py()):
+            in_range = pc.and_(pc.greater_equal(keys, pa.scalar(range_low, compare_type)),
+                               pc.less_equal(keys, pa.scalar(range_high, compare_type)))
+            mask = in_range if mask is None else pc.or_(mask, in_range)
+        return table.filter(mask) if mask is not None else table.slice(0, 0)
+
+    def sample_file(self, s3_key: str, metadata: pq.FileMetaData, column: str, key_type: pa.DataType,
+                    ranges: List[Tuple], target: pa.Schema = None,
+                    reference: pa.Schema = None) -> Tuple[TableFingerprint, int, int]:
+        """
+        Fingerprint the rows of one file whose key falls inside the sampled ranges
+
+        Only row groups whose statistics overlap a range (or that have no statistics)
+        are read, one at a time, with partition columns restored from the path as in
+        fingerprint_file() and cast to target when one is given.
+
+        Returns:
+            (fingerprint, rows read, row groups read)
+        """
+        selected = [index for index, (rows, low, high) in enumerate(self.key_bounds(metadata, column, key_type))
+                    if rows and (low is None or self.overlapping_ranges(ranges, low, high))]
+        fingerprint = TableFingerprint()
+        rows_read = 0
+        if not selected:
+            return fingerprint, rows_read, 0
+
+        s3_path = f"s3://{self.bucket_name}/{s3_key}"
+        logger.debug(f"Sampling {len(selected)} row groups of {s3_path}")
+        try:
+            with self.s3fs.open(s3_path, 'rb') as f:
+                parquet_file = pq.ParquetFile(f, metadata=metadata)
+                for index in selected:
+                    table = self.restore_partitions(s3_key, parquet_file.read_row_group(index), reference)
+                    if target is not None:
+                        table = conform(table, target)
+                    rows_read += table.num_rows
+                    fingerprint.update(self.filter_key_ranges(table, column, ranges))
+        except Exception as e:
+            logger.error(f"Error reading parquet file {s3_key}: {e}")
+            raise
+        return fingerprint, rows_read, len(selected)
+
+    def sample_files(self, files: List[Tuple[str, int]], metadatas: List[pq.FileMetaData], column: str,
+                     key_type: pa.DataType, ranges: List[Tuple], target: pa.Schema = None,
+                     reference: pa.Schema = None) -> Tuple[TableFingerprint, int, int]:
+        """sample_file() over a set of files, file_workers at a time, with the results merged"""
+        fingerprint = TableFingerprint()
+        rows_read, row_groups_read = 0, 0
+        with ThreadPoolExecutor(max_workers=self.file_workers) as pool:
+            for file_fingerprint, file_rows, file_row_groups in pool.map(
+                    lambda file_index: self.sample_file(files[file_index][0], metadatas[file_index], column,
+                                                        key_type, ranges, target, reference),
+                    range(len(files))):
+                fingerprint.merge(file_fingerprint)
+                rows_read += file_rows
+                row_groups_read += file_row_groups
+        return fingerprint, rows_read, row_groups_read
+
+    def verify_table_sample(self, table_name: str, original_files: List[Tuple[str, int]],
+                            combined_files: List[Tuple[str, int]]) -> Dict:
+        """
+        Verify a table from a deterministic sample of key ranges
+
+        Row counts and schemas are checked from the footers. Then a seeded subset of
+        the original row groups is drawn, the key range (min/max of the sample column)
+        of each becomes a sampled range, and on both sides only the row groups whose
+        statistics overlap a range are read. Rows with a key in the sampled ranges are
+        fingerprinted and the two fingerprints compared, which holds however the rows
+        were regrouped or reordered by combining.
+
+        When the sample matches, the result carries an upper bound, at the configured
+        confidence, on the share of original row groups whose rows could differ without
+        the sample catching it. The same seed always draws the same ranges.
+
+        Returns:
+            Dictionary with verification results
+        """
+        logger.info(f"Verifying table '{table_name}' from a sample...")
+
+        result = {
+            'table_name': table_name,
+            'passed': False,
+            'issues': [],
+            'original_files_count': len(original_files),
+            'combined_files_count': len(combined_files),
+            'original_total_rows': 0,
+            'combined_total_rows': 0,
+            'original_total_size_mb': sum(size for _, size in original_files) / (1024 * 1024),
+            'combined_total_size_mb': sum(size for _, size in combined_files) / (1024 * 1024)
+        }
+
+        try:
+            metadatas = {side: [pq.read_metadata(pa.BufferReader(tail)) for tail in self.fetch_footers(files)]
+                         for side, files in (('original', original_files), ('combined', combined_files))}
+            schemas = {side: [metadata.schema.to_arrow_schema() for metadata in metadatas[side]]
+                       for side in metadatas}
+            reference = self.reference_schema(schemas['original'])
+            schemas['combined'] = self.partitioned_schemas(combined_files, schemas['combined'], reference)
+            target = self.unified_schema(schemas['original'], schemas['combined'])
+
+            sides = {}
+            for side, files in (('original', original_files), ('combined', combined_files)):
+                if target is None:
+                    for (file_key, _), schema in zip(files[1:], schemas[side][1:]):
+                        result['issues'].extend(f"{file_key}: {issue}"
+                                                for issue in self.compare_schemas(schemas[side][0], schema))
+                sides[side] = {'metadatas': metadatas[side], 'schema': target or schemas[side][0]}
+                result[f'{side}_total_rows'] = sum(metadata.num_rows for metadata in metadatas[side])
+
+            original, combined = sides['original'], sides['combined']
+
+            # Verify row counts
+            if result['original_total_rows'] != result['combined_total_rows']:
+                result['issues'].append(f"Row count mismatch: original={result['original_total_rows']}, "
+                                        f"combined={result['combined_total_rows']}")
+
+            # Verify schemas
+            result['issues'].extend(self.compare_schemas(original['schema'], combined['schema']))
+
+            column = None
+            if not result['issues']:
+                column = self.choose_sample_column(original['schema'], original['metadatas'])
+                if column is None:
+                    result['issues'].append("No column with min/max statistics to sample by - use the full level")
+
+            if column is not None:
+                key_type = original['schema'].field(column).type
+
+                # Draw the sampled row groups among those with known key bounds
+                candidates = [bounds for metadata in original['metadatas']
+                              for bounds in self.key_bounds(metadata, column, key_type)
+                              if bounds[0] and bounds[1] is not None]
+                sample_size = min(len(candidates),
+                                  max(MIN_SAMPLE_ROW_GROUPS, math.ceil(self.sample_fraction * len(candidates))))
+                chosen = random.Random(f"{self.sample_seed}:{table_name}").sample(candidates, sample_size)
+
+                # Merge overlapping key ranges into sorted, disjoint ones
+                ranges = []
+                for _, low, high in sorted(chosen, key=lambda bounds: (bounds[1], bounds[2])):
+                    if ranges and low <= ranges[-1][1]:
+                        ranges[-1] = (ranges[-1][0], max(ranges[-1][1], high))
+                    else:
+                        ranges.append((low, high))
+                logger.info(f"Sampling {sample_size} of {len(candidates)} row groups on '{column}' "
+                            f"({len(ranges)} key ranges, seed {self.sample_seed})")
+
+                original_fingerprint, original_read, original_groups = self.sample_files(
+                    original_files, original['metadatas'], column, key_type, ranges, target)
+                combined_fingerprint, combined_read, combined_groups = self.sample_files(
+                    combined_files, combined['metadatas'], column, key_type, ranges, target, reference)
+
+                # With no differing row group among n drawn at random, the share of differing
+                # row groups is below 1 - (1 - confidence)^(1/n) at the given confidence
+                bound = 0.0 if sample_size == len(candidates) else 1 - (1 - self.confidence) ** (1 / sample_size)
+                result['sample'] = {
+                    'column': column,
+                    'row_groups_sampled': sample_size,
+                    'row_groups_total': len(candidates),
+                    'rows_compared': original_fingerprint.num_rows,
+                    'rows_read': original_read + combined_read,
+                    'row_groups_read': original_groups + combined_groups,
+                    'confidence': self.confidence,
+                    'max_differing_fraction': bound
+                }
+
+                if original_fingerprint != combined_fingerprint:
+                    result['issues'].append(
+                        f"Sampled data mismatch on '{column}': original {original_fingerprint.num_rows} rows "
+                        f"({original_fingerprint.hexdigest()}), combined {combined_fingerprint.num_rows} rows "
+                        f"({combined_fingerprint.hexdigest()})")
+                else:
+                    logger.info(f"✓ Sampled data matches: {original_fingerprint.num_rows:,} rows compared, "
+                                f"< {bound:.2%} of row groups could differ at {self.confidence:.0%} confidence")
+
+            result['passed'] = len(result['issues']) == 0
+
+            if result['passed']:
+                logger.info(f"✓ Table '{table_name}' sample verification PASSED")
+            else:
+                logger.error(f"✗ Table '{table_name}' sample verification FAILED: {len(result['issues'])} issues found")
+                for issue in result['issues']:
+                    logger.error(f"  - {issue}")
+
+            return result
+
+        except Exception as e:
+            result['issues'].append(f"Verification error: {str(e)}")
+            logger.error(f"Error verifying table '{table_name}': {e}")
+            return result
+
+    def collect_bucket_rows(self, s3_key: str, buckets: np.ndarray,
+                            schema: pa.Schema) -> Tuple[List[pa.Table], List[np.ndarray]]:
+        """Stream a file as schema, keeping only the rows that fall in the given buckets along with their row hashes"""
+        tables, hashes = [], []
+        for batch in self.iter_parquet_batches(s3_key):
+            batch = conform(self.restore_partitions(s3_key, batch, schema), schema)
+            batch_hashes = row_hashes(batch)
+            mask = np.isin(row_buckets(batch_hashes), buckets)
+            if mask.any():
+                tables.append(pa.Table.from_batches([batch.filter(pa.array(mask))]).replace_schema_metadata(None))
+                hashes.append(batch_hashes[mask])
+        return tables, hashes
+
+    def collect_rows(self, files: List[Tuple[str, int]], buckets: np.ndarray,
+                     schema: pa.Schema) -> Tuple[pa.Table, np.ndarray]:
+        """collect_bucket_rows() over a set of files, file_workers at a time, as one table and hash array"""
+        tables, hashes = [], []
+        with ThreadPoolExecutor(max_workers=self.file_workers) as pool:
+            for file_tables, file_hashes in pool.map(lambda file_key: self.collect_bucket_rows(file_key, buckets, schema),
+                                                     [file_key for file_key, _ in files]):
+                tables.extend(file_tables)
+                hashes.extend(file_hashes)
+        if not tables:
+            return schema.remove_metadata().empty_table(), np.empty(0, dtype=np.uint64)
+        return pa.concat_tables(tables), np.concatenate(hashes)
+
+    def unmatched_rows(self, hashes: np.ndarray, other_hashes: np.ndarray) -> List[int]:
+        """Indices of the rows in hashes left over once every row hash in other_hashes is matched off"""
+        remaining = Counter(other_hashes.tolist())
+        unmatched = []
+        for index, row_hash in enumerate(hashes.tolist()):
+            if remaining[row_hash]:
+                remaining[row_hash] -= 1
+            else:
+                unmatched.append(index)
+        return unmatched
+
+    def locate_differences(self, original_files: List[Tuple[str, int]], combined_files: List[Tuple[str, int]],
+                           original: TableFingerprint, combined: TableFingerprint, schema: pa.Schema) -> Dict:
+        """
+        Find the exact rows behind a fingerprint mismatch
+
+        The bucketed fingerprints already show which row buckets disagree. Both sides
+        are streamed once more, keeping only the rows in those buckets (as many buckets
+        as fit in DIFF_MAX_ROWS, smallest first), and the kept rows are matched off by
+        row hash. What is left over is missing from or extra in the combined files; a
+        missing and an extra row sharing a key (sample_column, or else the first
+        column) are reported as one changed row.
+
+        Returns:
+            Dictionary with 'missing', 'extra' (row dicts), 'changed' ({'key', 'original',
+            'combined', 'columns'} dicts), 'key', 'buckets_differing' and 'buckets_compared'
+        """
+        differing = original.differing_buckets(combined)
+        counts = original.bucket_rows[differing] + combined.bucket_rows[differing]
+        selected, rows = [], 0
+        for bucket in differing[np.argsort(counts, kind='stable')]:
+            bucket_rows = int(original.bucket_rows[bucket] + combined.bucket_rows[bucket])
+            if selected and rows + bucket_rows > DIFF_MAX_ROWS:
+                break
+            selected.append(bucket)
+            rows += bucket_rows
+        selected = np.sort(np.array(selected, dtype=np.int64))
+        logger.info(f"Locating differing rows in {len(selected)} of {len(differing)} differing buckets "
+                    f"({rows:,} rows)...")
+
+        original_rows, original_hashes = self.collect_rows(original_files, selected, schema)
+        combined_rows, combined_hashes = self.collect_rows(combined_files, selected, schema)
+        missing = original_rows.take(pa.array(self.unmatched_rows(original_hashes, combined_hashes),
+                                              type=pa.int64())).to_pylist()
+        extra = combined_rows.take(pa.array(self.unmatched_rows(combined_hashes, original_hashes),
+                                            type=pa.int64())).to_pylist()
+
+        # Pair up a missing and an extra row with the same key as one changed row
+        key = self.sample_column if self.sample_column in schema.names else schema.names[0]
+        extra_by_key = defaultdict(list)
+        for row in extra:
+            extra_by_key[repr(row[key])].append(row)
+        changed, unpaired = [], []
+        for row in missing:
+            candidates = extra_by_key.get(repr(row[key]))
+            if not candidates:
+                unpaired.append(row)
+                continue
+            other = candidates.pop(0)
+            columns = [name for name in schema.names if not self.same_value(row[name], other[name])]
+            changed.append({'key': row[key], 'original': row, 'combined': other, 'columns': columns})
+        paired = {id(entry['combined']) for entry in changed}
+
+        return {
+            'key': key,
+            'missing': unpaired,
+            'extra': [row for row in extra if id(row) not in paired],
+            'changed': changed,
+            'buckets_differing': len(differing),
+            'buckets_compared': len(selected)
+        }
+
+    def same_value(self, a, b) -> bool:
+        """Equality as the fingerprint sees it: NaN equals NaN"""
+        if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+            return True
+        return a == b
+
+    def diff_issues(self, diff: Dict) -> List[str]:
+        """Describe a located diff: totals first, then up to DIFF_REPORT_ROWS rows of each kind"""
+        issues = [f"Row diff on key '{diff['key']}': {len(diff['missing'])} rows missing from combined, "
+                  f"{len(diff['extra'])} extra rows in combined, {len(diff['changed'])} rows changed"]
+        if diff['buckets_compared'] < diff['buckets_differing']:
+            issues.append(f"Row diff covers {diff['buckets_compared']} of {diff['buckets_differing']} differing "
+                          f"buckets (the rest exceed the {DIFF_MAX_ROWS:,} row limit), so a changed row whose "
+                          f"other version is in an uncompared bucket shows as missing or extra")
+
+        for entry in diff['changed'][:DIFF_REPORT_ROWS]:
+            changes = ', '.join(f"{name}: {entry['original'][name]!r} -> {entry['combined'][name]!r}"
+                                for name in entry['columns'])
+            issues.append(f"Changed row {diff['key']}={entry['key']!r}: {changes}")
+        issues.extend(f"Missing row: {row!r}" for row in diff['missing'][:DIFF_REPORT_ROWS])
+        issues.extend(f"Extra row: {row!r}" for row in diff['extra'][:DIFF_REPORT_ROWS])
+
+        unlisted = sum(max(0, len(diff[kind]) - DIFF_REPORT_ROWS) for kind in ('changed', 'missing', 'extra'))
+        if unlisted:
+            issues.append(f"... {unlisted} more differing rows not listed")
+        return issues
+
     def verify_table_data(self, table_name: str, original_files: List[Tuple[str, int]], 
                          combined_files: List[Tuple[str, int]]) -> Dict:
         """
@@ -218,37 +865,29 @@ class S3ParquetVerifier:
         }
 
         try:
-            # Read all original files
-            logger.info(f"Reading {len(original_files)} original files...")
-            original_tables = []
-            for file_key, size in original_files:
-                table = self.read_parquet_table(file_key)
-                original_tables.append(table)
-                result['original_total_size_mb'] += size / (1024 * 1024)
-
-            # Combine original tables
-            if original_tables:
-                original_combined = pa.concat_tables(original_tables)
-                result['original_total_rows'] = len(original_combined)
-                original_schema = original_combined.schema
-            else:
+            # Read drifting schemas as the one the combiner unified them to, and repartitioned
+            # outputs with the partition columns their paths hold
+            original_schemas = [footer_schema(tail) for tail in self.fetch_footers(original_files)]
+            reference = self.reference_schema(original_schemas)
+            combined_schemas = self.partitioned_schemas(
+                combined_files, [footer_schema(tail) for tail in self.fetch_footers(combined_files)], reference)
+            target = self.unified_schema(original_schemas, combined_schemas)
+
+            # Stream all original files
+            logger.info(f"Fingerprinting {len(original_files)} original files...")
+            original = self.fingerprint_files(original_files, target)
+            result['original_total_size_mb'] = original['size_mb']
+            result['original_total_rows'] = original['fingerprint'].num_rows
+            if original['schema'] is None:
                 result['issues'].append("No original files found")
                 return result
 
-            # Read all combined files
-            logger.info(f"Reading {len(combined_files)} combined files...")
-            combined_tables = []
-            for file_key, size in combined_files:
-                table = self.read_parquet_table(file_key)
-                combined_tables.append(table)
-                result['combined_total_size_mb'] += size / (1024 * 1024)
-
-            # Combine combined tables
-            if combined_tables:
-                combined_combined = pa.concat_tables(combined_tables)
-                result['combined_total_rows'] = len(combined_combined)
-                combined_schema = combined_combined.schema
-            else:
+            # Stream all combined files
+            logger.info(f"Fingerprinting {len(combined_files)} combined files...")
+            combined = self.fingerprint_files(combined_files, target, reference)
+            result['combined_total_size_mb'] = combined['size_mb']
+            result['combined_total_rows'] = combined['fingerprint'].num_rows
+            if combined['schema'] is None:
                 result['issues'].append("No combined files found")
                 return result
 
@@ -260,31 +899,26 @@ class S3ParquetVerifier:
                 )
 
             # Verify schemas
-            schema_issues = self.compare_schemas(original_schema, combined_schema)
+            schema_issues = original['schema_issues'] + combined['schema_issues']
+            schema_issues.extend(self.compare_schemas(original['schema'], combined['schema']))
             if schema_issues:
                 result['issues'].extend(schema_issues)
 
-            # Verify data content (if schemas match and row counts match)
-            if not schema_issues and result['original_total_rows'] == result['combined_total_rows']:
+            # Verify data content (if schemas match)
+            if not schema_issues:
                 logger.info("Comparing data content...")
 
-                # Generate hashes for comparison
-                original_hash = self.get_table_hash(original_combined)
-                combined_hash = self.get_table_hash(combined_combined)
+                # Compare the fingerprints built while streaming
+                original_hash = original['fingerprint'].hexdigest()
+                combined_hash = combined['fingerprint'].hexdigest()
 
                 if original_hash != combined_hash:
                     result['issues'].append("Data content mismatch - hash comparison failed")
 
-                    # Additional detailed comparison for small datasets
-                    if result['original_total_rows'] < 100000:  # Only for smaller datasets
-                        logger.info("Performing detailed row-by-row comparison...")
-                        orig_df = original_combined.to_pandas().sort_values(by=list(original_combined.schema.names)).reset_index(drop=True)
-                        comb_df = combined_combined.to_pandas().sort_values(by=list(combined_combined.schema.names)).reset_index(drop=True)
-
-                        try:
-                            pd.testing.assert_frame_equal(orig_df, comb_df, check_dtype=True, check_index_type=False)
-                        except AssertionError as e:
-                            result['issues'].append(f"Detailed comparison failed: {str(e)[:200]}...")
+                    # Pin the mismatch down to rows, reading only the buckets that disagree
+                    result['diff'] = self.locate_differences(original_files, combined_files, original['fingerprint'],
+                                                             combined['fingerprint'], original['schema'])
+                    result['issues'].extend(self.diff_issues(result['diff']))
                 else:
                     logger.info("✓ Data content verification passed")
 
@@ -305,6 +939,184 @@ class S3ParquetVerifier:
             logger.error(f"Error verifying table '{table_name}': {e}")
             return result
 
+    def load_manifests(self) -> List[Dict]:
+        """Read every manifest the combiner wrote under the prefix"""
+        manifest_keys = [key for key, _, _, _ in self.inventory.objects(f"{self.prefix}{MANIFEST_DIR}/")
+                         if key.endswith('.json')]
+
+        def load(manifest_key):
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=manifest_key)
+            return json.loads(response['Body'].read())
+
+        with ThreadPoolExecutor(max_workers=FOOTER_FETCH_WORKERS) as pool:
+            return list(pool.map(load, manifest_keys))
+
+    def lineage_units(self, manifests: List[Dict]) -> List[Dict]:
+        """
+        Turn the combiner's manifests into independently verifiable units
+
+        A unit is normally one group: the combined files it wrote and the inputs it read.
+        When a group recombined an earlier output (an incremental top-up), the two groups
+        are merged into one unit whose inputs are the original source files of both.
+
+        Returns:
+            List of dictionaries with 'table', 'label', 'inputs' ({'key', 'size', 'etag'}
+            dicts) and 'outputs' ((file_key, size) tuples)
+        """
+        finished = [manifest for manifest in manifests if manifest['status'] in ('complete', 'superseded')]
+        producer = {output['key']: manifest['output_key'] for manifest in finished for output in manifest['outputs']}
+
+        # Union the groups linked by a recombined output
+        parent = {manifest['output_key']: manifest['output_key'] for manifest in finished}
+
+        def find(key):
+            while parent[key] != key:
+                parent[key] = parent[parent[key]]
+                key = parent[key]
+            return key
+
+        for manifest in finished:
+            for source in manifest['inputs']:
+                if source['key'] in producer:
+                    parent[find(producer[source['key']])] = find(manifest['output_key'])
+
+        units = {}
+        for manifest in sorted(finished, key=lambda manifest: manifest['output_key']):
+            root = find(manifest['output_key'])
+            unit = units.setdefault(root, {'table': manifest['table'], 'label': root, 'group_keys': set(),
+                                           'inputs': [], 'outputs': []})
+            superseded = {entry['key'] for entry in manifest.get('superseded_outputs', [])}
+            unit['group_keys'].add(manifest['output_key'])
+            unit['group_keys'].update(output['key'] for output in manifest['outputs'])
+            unit['outputs'].extend((output['key'], output['size']) for output in manifest['outputs']
+                                   if output['key'] not in superseded)
+            unit['inputs'].extend(source for source in manifest['inputs'] if source['key'] not in producer)
+
+        selected = [unit for unit in units.values()
+                    if unit['outputs'] and (not self.groups or unit['group_keys'] & self.groups)]
+        for unit in selected:
+            unit['label'] = f"{unit['table']} [{unit['label'].rsplit('/', 1)[-1]}]"
+            del unit['group_keys']
+        return selected
+
+    def check_lineage(self, unit: Dict) -> List[str]:
+        """Check that a unit's inputs are unchanged since they were combined and its outputs still exist"""
+        issues = []
+        for source in unit['inputs']:
+            etag = self.inventory.etag(source['key'])
+            if etag is None:
+                issues.append(f"Input missing: {source['key']}")
+            elif source['etag'] and etag != source['etag']:
+                issues.append(f"Input changed since it was combined: {source['key']}")
+        for file_key, _ in unit['outputs']:
+            if file_key not in self.inventory:
+                issues.append(f"Combined file missing: {file_key}")
+        return issues
+
+    def verify_unit(self, unit: Dict) -> Dict:
+        """Verify one lineage unit: its outputs against exactly the inputs recorded for it"""
+        issues = self.check_lineage(unit)
+        if issues:
+            logger.error(f"✗ Group '{unit['label']}' lineage check FAILED")
+            return {
+                'table_name': unit['label'], 'passed': False, 'issues': issues,
+                'original_files_count': len(unit['inputs']), 'combined_files_count': len(unit['outputs']),
+                'original_total_rows': 0, 'combined_total_rows': 0,
+                'original_total_size_mb': sum(source['size'] for source in unit['inputs']) / (1024 * 1024),
+                'combined_total_size_mb': sum(size for _, size in unit['outputs']) / (1024 * 1024)
+            }
+        return self.verify_files(unit['label'], [(source['key'], source['size']) for source in unit['inputs']],
+                                 unit['outputs'])
+
+    def verify_files(self, label: str, original_files: List[Tuple[str, int]],
+                     combined_files: List[Tuple[str, int]]) -> Dict:
+        """Verify combined files against original files at the configured level"""
+        if self.level == 'footer':
+            return self.verify_table_footers(label, original_files, combined_files)
+        if self.level == 'sample':
+            return self.verify_table_sample(label, original_files, combined_files)
+        return self.verify_table_data(label, original_files, combined_files)
+
+    def record_result(self, result: Dict):
+        """Add one table's or group's result to the overall counts"""
+        self.verification_results['tables_verified'] += 1
+        self.verification_results['total_original_files'] += result['original_files_count']
+        self.verification_results['total_combined_files'] += result['combined_files_count']
+
+        if result['passed']:
+            self.verification_results['tables_passed'] += 1
+        else:
+            self.verification_results['tables_failed'] += 1
+            self.verification_results['issues_found'].extend(f"{result['table_name']}: {issue}"
+                                                             for issue in result['issues'])
+
+    def execute_tasks(self, tasks: List[Tuple[int, Callable[[], Dict]]]) -> List[Dict]:
+        """
+        Run verification tasks, concurrently when more than one worker is configured
+
+        Each task is (source size in bytes, callable returning a result). Tasks start
+        largest first, and each one reserves its size against max_inflight_bytes before
+        it starts, so tables that together exceed the budget never run side by side (one
+        larger than the whole budget runs alone) and the small ones fill in around them.
+        Footer-level tasks read no data and reserve nothing.
+
+        Returns:
+            Results in task order
+        """
+        if self.workers == 1:
+            return [task() for _, task in tasks]
+
+        budget = ByteBudget(self.max_inflight_bytes)
+        results = [None] * len(tasks)
+
+        def run_and_release(index, reserved):
+            try:
+                results[index] = tasks[index][1]()
+            finally:
+                budget.release(reserved)
+
+        logger.info(f"Verifying {len(tasks)} units with {self.workers} workers "
+                    f"(max {self.max_inflight_bytes / (1024 * 1024):.0f} MB in flight)")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = []
+            for index in sorted(range(len(tasks)), key=lambda index: -tasks[index][0]):
+                reserved = budget.acquire(0 if self.level == 'footer' else tasks[index][0])
+                futures.append(pool.submit(run_and_release, index, reserved))
+            for future in futures:
+                future.result()
+
+        return results
+
+    def run_lineage_verification(self, tables: Dict) -> List[Dict]:
+        """
+        Verify every combined group against its own inputs
+
+        Tables with combined files that no manifest accounts for (combined before the
+        combiner wrote manifests) fall back to whole-table verification.
+        """
+        units = self.lineage_units(self.load_manifests())
+        logger.info(f"Verifying {len(units)} combined groups from their manifests")
+
+        covered = {file_key for unit in units for file_key, _ in unit['outputs']}
+        fallback = []
+        if not self.groups:
+            for table_name, files in tables.items():
+                unrecorded = [file_key for file_key, _ in files['combined'] if file_key not in covered]
+                if unrecorded and files['original']:
+                    logger.warning(f"Table '{table_name}' has {len(unrecorded)} combined files without a manifest "
+                                   f"- verifying the whole table")
+                    fallback.append(table_name)
+
+        tasks = [(sum(source['size'] for source in unit['inputs']) + sum(size for _, size in unit['outputs']),
+                  lambda unit=unit: self.verify_unit(unit)) for unit in units]
+        tasks.extend(self.table_task(table_name, tables[table_name]) for table_name in fallback)
+        return self.execute_tasks(tasks)
+
+    def table_task(self, table_name: str, files: Dict) -> Tuple[int, Callable[[], Dict]]:
+        """Whole-table verification of original against combined files, as a task for execute_tasks"""
+        size = sum(size for _, size in files['original']) + sum(size for _, size in files['combined'])
+        return size, lambda: self.verify_files(table_name, files['original'], files['combined'])
+
     def run_verification(self) -> Dict:
         """
         Run complete verification of all tables
@@ -329,34 +1141,26 @@ class S3ParquetVerifier:
             logger.warning("No tables found for verification")
             return {'error': "No tables found"}
 
-        # Verify each table
-        table_results = []
-        for table_name, files in tables.items():
-            original_files = files['original']
-            combined_files = files['combined']
-
-            if not original_files:
-                logger.warning(f"No original files found for table '{table_name}' - skipping")
-                continue
-
-            if not combined_files:
-                logger.warning(f"No combined files found for table '{table_name}' - skipping")
-                continue
+        if self.lineage:
+            table_results = self.run_lineage_verification(tables)
+        else:
+            # Verify each table
+            tasks = []
+            for table_name, files in tables.items():
+                if not files['original']:
+                    logger.warning(f"No original files found for table '{table_name}' - skipping")
+                    continue
 
-            # Verify this table
-            result = self.verify_table_data(table_name, original_files, combined_files)
-            table_results.append(result)
+                if not files['combined']:
+                    logger.warning(f"No combined files found for table '{table_name}' - skipping")
+                    continue
 
-            # Update overall results
-            self.verification_results['tables_verified'] += 1
-            self.verification_results['total_original_files'] += len(original_files)
-            self.verification_results['total_combined_files'] += len(combined_files)
+                tasks.append(self.table_task(table_name, files))
+            table_results = self.execute_tasks(tasks)
 
-            if result['passed']:
-                self.verification_results['tables_passed'] += 1
-            else:
-                self.verification_results['tables_failed'] += 1
-                self.verification_results['issues_found'].extend(result['issues'])
+        # Update overall results
+        for result in table_results:
+            self.record_result(result)
 
         # Generate final report
         self.verification_results['table_details'] = table_results
@@ -375,14 +1179,16 @@ class S3ParquetVerifier:
         results = self.verification_results
 
         print(f"Overall Status: {'✓ PASSED' if results['overall_passed'] else '✗ FAILED'}")
-        print(f"Tables Verified: {results['tables_verified']}")
-        print(f"Tables Passed: {results['tables_passed']}")
-        print(f"Tables Failed: {results['tables_failed']}")
+        print(f"Verification Level: {self.level}")
+        unit = 'Groups' if self.lineage else 'Tables'
+        print(f"{unit} Verified: {results['tables_verified']}")
+        print(f"{unit} Passed: {results['tables_passed']}")
+        print(f"{unit} Failed: {results['tables_failed']}")
         print(f"Original Files: {results['total_original_files']}")
         print(f"Combined Files: {results['total_combined_files']}")
 
         if results['table_details']:
-            print("\nDetailed Results by Table:")
+            print(f"\nDetailed Results by {unit[:-1]}:")
             print("-" * 40)
 
             for table_result in results['table_details']:
@@ -394,6 +1200,12 @@ class S3ParquetVerifier:
                 print(f"  Combined: {table_result['combined_files_count']} files, "
                       f"{table_result['combined_total_rows']:,} rows, "
                       f"{table_result['combined_total_size_mb']:.2f} MB")
+                if 'sample' in table_result:
+                    sample = table_result['sample']
+                    print(f"  Sample: {sample['row_groups_sampled']} of {sample['row_groups_total']} row groups "
+                          f"on '{sample['column']}', {sample['rows_compared']:,} rows compared "
+                          f"({sample['rows_read']:,} read); < {sample['max_differing_fraction']:.2%} of row groups "
+                          f"could differ at {sample['confidence']:.0%} confidence")
 
                 if table_result['issues']:
                     print(f"  Issues: {len(table_result['issues'])}")
@@ -415,15 +1227,74 @@ def main():
     parser = argparse.ArgumentParser(description='Verify S3 Parquet data integrity')
     parser.add_argument('--bucket', required=True, help='S3 bucket name')
     parser.add_argument('--prefix', required=True, help='Source data prefix (do not pass a leading /)')
+    parser.add_argument('--lineage', action='store_true',
+                        help="Verify each combined group against exactly the inputs recorded in the combiner's "
+                             "manifests, instead of whole tables")
+    parser.add_argument('--group', action='append', default=[], metavar='OUTPUT_KEY',
+                        help='With --lineage, only verify the group that wrote this combined file (repeatable)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='Number of tables (or lineage groups) verified concurrently')
+    parser.add_argument('--file-workers', type=int, default=DEFAULT_FILE_WORKERS,
+                        help='Number of files streamed concurrently within one table or group')
+    parser.add_argument('--max-inflight-mb', type=int, default=DEFAULT_MAX_INFLIGHT_MB,
+                        help='Maximum total size (MB) of the tables being verified at once; the largest '
+                             'tables start first and tables that together exceed it never run side by side')
+    parser.add_argument('--listing-cache', default=None, metavar='PATH',
+                        help="Local file the S3 listing is saved to and reused from (the combiner's "
+                             "--listing-cache file can be passed straight on)")
+    parser.add_argument('--listing-cache-max-age', type=float, default=DEFAULT_CACHE_MAX_AGE, metavar='SECONDS',
+                        help='Age after which a saved listing is refreshed (0 always lists again)')
+    parser.add_argument('--list-workers', type=int, default=DEFAULT_LIST_WORKERS,
+                        help='List the table prefixes concurrently with this many workers after discovering them '
+                             'with a delimiter (1 walks the whole prefix sequentially)')
+    parser.add_argument('--inventory-report', default=None, metavar='S3_URI',
+                        help='manifest.json of an S3 Inventory report (CSV or Parquet) to seed the listing from '
+                             'instead of listing the prefix')
+    parser.add_argument('--level', choices=VERIFICATION_LEVELS, default='full',
+                        help='footer: compare row counts, schemas and column statistics from footers only; '
+                             'sample: compare the rows in a seeded sample of key ranges; '
+                             'full: fingerprint every row')
+    parser.add_argument('--sample-fraction', type=float, default=DEFAULT_SAMPLE_FRACTION,
+                        help='With --level sample, share of source row groups whose key ranges are compared '
+                             f'(at least {MIN_SAMPLE_ROW_GROUPS} per table)')
+    parser.add_argument('--sample-seed', type=int, default=0,
+                        help='With --level sample, seed choosing the sampled ranges; rerun with another seed '
+                             'to check different data')
+    parser.add_argument('--sample-column', default=None,
+                        help='With --level sample, column the key ranges are defined on '
+                             '(default: the orderable column with the most min/max statistics)')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE,
+                        help='With --level sample, confidence level of the reported bound')
 
     args = parser.parse_args()
 
+    if args.group and not args.lineage:
+        parser.error("--group requires --lineage")
+    if not 0 < args.sample_fraction <= 1:
+        parser.error("--sample-fraction must be in (0, 1]")
+    if not 0 < args.confidence < 1:
+        parser.error("--confidence must be in (0, 1)")
+
     logger.info(f"Configuration:")
     logger.info(f"  Bucket: {args.bucket}")
     logger.info(f"  Prefix: {args.prefix}")
+    logger.info(f"  Level: {args.level}")
+    if args.level == 'sample':
+        logger.info(f"  Sample: {args.sample_fraction:.1%} of row groups (seed {args.sample_seed}, "
+                    f"column {args.sample_column or 'auto'}, {args.confidence:.0%} confidence)")
+    logger.info(f"  Lineage: {args.lineage} (groups: {args.group or 'all'})")
+    logger.info(f"  Workers: {args.workers} ({args.file_workers} files each, max {args.max_inflight_mb} MB in flight)")
+    logger.info(f"  Listing: {args.inventory_report or f'list prefix with {args.list_workers} workers'} "
+                f"(cache {args.listing_cache}, max age {args.listing_cache_max_age:.0f}s)")
     
     # Initialize and run verifier
-    verifier = S3ParquetVerifier(args.bucket, args.prefix)
+    verifier = S3ParquetVerifier(args.bucket, args.prefix, level=args.level, lineage=args.lineage,
+                                 groups=args.group, workers=args.workers, file_workers=args.file_workers,
+                                 max_inflight_mb=args.max_inflight_mb, sample_fraction=args.sample_fraction,
+                                 sample_seed=args.sample_seed, sample_column=args.sample_column,
+                                 confidence=args.confidence, listing_cache=args.listing_cache,
+                                 listing_cache_max_age=args.listing_cache_max_age,
+                                 inventory_report=args.inventory_report, list_workers=args.list_workers)
     results = verifier.run_verification()
     
     # Exit with appropriate code
@@ -8,37 +8,78 @@ while maintaining the table subdirectory structure.
 """
 import argparse
 import boto3
-import pandas as pd
 import pyarrow as pa
 import pyarrow.parquet as pq
 from botocore.exceptions import ClientError
 import os
 import tempfile
 import logging
-from typing import List, Tuple
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Tuple
+from collections import defaultdict, deque
+
+from parquet_footer import detect_column_codecs, fetch_footer, resolve_compression
+from parquet_schema import conform, footer_schema, unify_schemas
+from s3_inventory import DEFAULT_CACHE_MAX_AGE, DEFAULT_LIST_WORKERS, S3Inventory
+from s3_multipart import DEFAULT_PART_SIZE_MB, DEFAULT_UPLOAD_CONCURRENCY, S3MultipartWriter
 
 # Configuration
 TARGET_SIZE_MB = 512
 TARGET_SIZE_BYTES = TARGET_SIZE_MB * 1024 * 1024
 MIN_FILES_TO_COMBINE = 2  # Only combine if there are at least 2 files
+DEFAULT_FETCH_WORKERS = 8  # Concurrent source downloads within a group
+DEFAULT_FETCH_BUDGET_MB = 256  # Cap on downloaded-but-unread source bytes within a group
+COMPRESSION_CHOICES = ['auto', 'snappy', 'zstd', 'gzip', 'brotli', 'lz4', 'none']  # 'auto' keeps the source codecs
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 class S3ParquetCombiner:
-    def __init__(self, bucket_name: str, prefix: str = ""):
+    def __init__(self, bucket_name: str, prefix: str = "", fetch_workers: int = DEFAULT_FETCH_WORKERS,
+                 fetch_budget_mb: int = DEFAULT_FETCH_BUDGET_MB, streaming: bool = False,
+                 compression: str = 'auto', compression_level: int = None, use_dictionary: bool = True,
+                 column_compression: dict = None, part_size_mb: int = DEFAULT_PART_SIZE_MB,
+                 upload_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY, listing_cache: str = None,
+                 listing_cache_max_age: float = DEFAULT_CACHE_MAX_AGE, inventory_report: str = None,
+                 list_workers: int = DEFAULT_LIST_WORKERS):
         """
         Initialize the S3 Parquet Combiner
 
         Args:
             bucket_name: Name of the S3 bucket
             prefix: Prefix path in S3 (e.g., 'database-export/')
+            fetch_workers: Number of source files downloaded concurrently within a group
+            fetch_budget_mb: Maximum size (MB) of source files downloaded ahead of the reader within a group
+            streaming: Write row group by row group instead of concatenating each group in memory
+            compression: Output codec, or 'auto' to keep the codec each column has in the source footers
+            compression_level: Compression level for codecs that support one (e.g. zstd, gzip)
+            use_dictionary: Dictionary-encode output columns
+            column_compression: Codec overrides per column name, e.g. {'payload': 'zstd'}
+            part_size_mb: Size (MB) of each multipart upload part of an output (minimum 5)
+            upload_concurrency: Number of parts of one output uploaded concurrently while it is being written
+            listing_cache: Local file the listing is saved to and reused from by later runs
+            listing_cache_max_age: Seconds after which a saved listing is refreshed
+            inventory_report: s3:// URI of an S3 Inventory manifest.json to seed the listing from
+            list_workers: Number of table prefixes listed concurrently (1 lists the prefix sequentially)
         """
         self.bucket_name = bucket_name
         self.prefix = prefix.rstrip('/') + '/' if prefix else ''
+        self.fetch_workers = max(1, fetch_workers)
+        self.fetch_budget_bytes = fetch_budget_mb * 1024 * 1024
+        self.streaming = streaming
+        self.compression = compression
+        self.compression_level = compression_level
+        self.use_dictionary = use_dictionary
+        self.column_compression = column_compression or {}
+        self.part_size_bytes = part_size_mb * 1024 * 1024
+        self.upload_concurrency = max(1, upload_concurrency)
+        self.listing_cache = listing_cache
+        self.listing_cache_max_age = listing_cache_max_age
+        self.inventory_report = inventory_report
+        self.list_workers = max(1, list_workers)
         self.s3_client = boto3.client('s3')
+        self.inventory = S3Inventory(self.s3_client, bucket_name, self.prefix)  # Filled in while listing
 
     def list_parquet_files_by_table(self) -> dict:
         """
@@ -56,51 +97,41 @@ class S3ParquetCombiner:
         logger.info(f"Using prefix: '{self.prefix}'")
 
         try:
-            paginator = self.s3_client.get_paginator('list_objects_v2')
-            page_iterator = paginator.paginate(
-                Bucket=self.bucket_name,
-                Prefix=self.prefix
-            )
+            self.inventory.populate(self.listing_cache, self.listing_cache_max_age, self.inventory_report,
+                                    self.list_workers)
 
             total_objects = 0
-            for page in page_iterator:
-                if 'Contents' not in page:
-                    logger.warning(f"No 'Contents' found in page - bucket may be empty or prefix may not exist")
-                    continue
-
-                for obj in page['Contents']:
-                    key = obj['Key']
-                    size = obj['Size']
-                    total_objects += 1
+            for key, size, _, _ in self.inventory.objects():
+                total_objects += 1
 
-                    all_files_found.append(key)
+                all_files_found.append(key)
 
-                    # Log first few files for debugging
-                    if len(all_files_found) <= 10:
-                        logger.debug(f"Found file: {key} ({size} bytes)")
+                # Log first few files for debugging
+                if len(all_files_found) <= 10:
+                    logger.debug(f"Found file: {key} ({size} bytes)")
 
-                    # Skip if not a parquet file
-                    if not key.lower().endswith('.parquet'):
-                        continue
+                # Skip if not a parquet file
+                if not key.lower().endswith('.parquet'):
+                    continue
 
-                    parquet_files_found.append(key)
+                parquet_files_found.append(key)
 
-                    # Extract table name (first subdirectory after prefix)
-                    relative_path = key[len(self.prefix):] if self.prefix else key
-                    path_parts = relative_path.split('/')
+                # Extract table name (first subdirectory after prefix)
+                relative_path = key[len(self.prefix):] if self.prefix else key
+                path_parts = relative_path.split('/')
 
-                    logger.debug(f"Processing parquet file: {key}")
-                    logger.debug(f"  Relative path: {relative_path}")
-                    logger.debug(f"  Path parts: {path_parts}")
+                logger.debug(f"Processing parquet file: {key}")
+                logger.debug(f"  Relative path: {relative_path}")
+                logger.debug(f"  Path parts: {path_parts}")
 
-                    if len(path_parts) >= 2:  # At least table/...file.parquet
-                        table_name = path_parts[0]
-                        # Store the relative path within the table for organizing combined files
-                        file_relative_path = '/'.join(path_parts[1:-1]) if len(path_parts) > 2 else ''
-                        tables[table_name].append((key, size, file_relative_path))
-                        logger.debug(f"  Added to table '{table_name}', subdir: '{file_relative_path}'")
-                    else:
-                        logger.warning(f"Skipping parquet file with insufficient path depth: {key}")
+                if len(path_parts) >= 2:  # At least table/...file.parquet
+                    table_name = path_parts[0]
+                    # Store the relative path within the table for organizing combined files
+                    file_relative_path = '/'.join(path_parts[1:-1]) if len(path_parts) > 2 else ''
+                    tables[table_name].append((key, size, file_relative_path))
+                    logger.debug(f"  Added to table '{table_name}', subdir: '{file_relative_path}'")
+                else:
+                    logger.warning(f"Skipping parquet file with insufficient path depth: {key}")
 
             # Summary logging
             logger.info(f"Search completed:")
@@ -214,13 +245,39 @@ class S3ParquetCombiner:
             logger.error(f"Error downloading {s3_key}: {e}")
             raise
 
-    def upload_parquet_file(self, local_path: str, s3_key: str):
-        """Upload a parquet file from local storage to S3"""
-        try:
-            self.s3_client.upload_file(local_path, self.bucket_name, s3_key)
-        except ClientError as e:
-            logger.error(f"Error uploading {s3_key}: {e}")
-            raise
+    def prefetch_sources(self, file_group: List[Tuple[str, int, str]], temp_dir: str) -> Iterator[str]:
+        """
+        Download every file in the group into temp_dir and yield the local paths in group order
+
+        Up to fetch_workers downloads run ahead of the consumer, as long as the files
+        downloaded but not yet handed out stay within fetch_budget_bytes. The first
+        outstanding file is always downloaded, even when it alone is larger than the budget.
+        """
+        pending = deque()
+        pending_bytes = 0
+        next_index = 0
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+            try:
+                while next_index < len(file_group) or pending:
+                    # Top up the read-ahead window
+                    while next_index < len(file_group) and len(pending) < self.fetch_workers:
+                        s3_key, size, _ = file_group[next_index]
+                        if pending and pending_bytes + size > self.fetch_budget_bytes:
+                            break
+                        local_file = os.path.join(temp_dir, f"input_{next_index}.parquet")
+                        future = pool.submit(self.download_parquet_file, s3_key, local_file)
+                        pending.append((local_file, size, future))
+                        pending_bytes += size
+                        next_index += 1
+
+                    local_file, size, future = pending.popleft()
+                    future.result()
+                    pending_bytes -= size
+                    yield local_file
+            finally:
+                for _, _, future in pending:
+                    future.cancel()
 
     def delete_s3_files(self, s3_keys: List[str]):
         """Delete multiple files from S3"""
@@ -233,44 +290,101 @@ class S3ParquetCombiner:
                 Bucket=self.bucket_name,
                 Delete={'Objects': objects_to_delete}
             )
+            for key in s3_keys:
+                self.inventory.forget(key)
             logger.info(f"Deleted {len(s3_keys)} files from S3")
         except ClientError as e:
             logger.error(f"Error deleting files: {e}")
             raise
 
+    def fetch_footers(self, file_group: List[Tuple[str, int, str]]) -> List[bytes]:
+        """Fetch the footer of every file in the group with ranged GETs, so this doesn't wait for the downloads"""
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+            return list(pool.map(
+                lambda file_info: fetch_footer(self.s3_client, self.bucket_name, file_info[0]),
+                file_group
+            ))
+
+    def writer_options(self, footers: List[bytes]) -> dict:
+        """
+        Resolve the compression and encoding options for a group's output from the source footers
+
+        Returns:
+            Keyword arguments for pq.write_table / pq.ParquetWriter
+        """
+        column_paths = []
+        for tail in footers:
+            schema = pq.read_metadata(pa.BufferReader(tail)).schema
+            for i in range(len(schema)):
+                if schema.column(i).path not in column_paths:
+                    column_paths.append(schema.column(i).path)
+
+        options = resolve_compression(
+            column_paths,
+            detect_column_codecs(footers),
+            compression=self.compression,
+            column_overrides=self.column_compression,
+            compression_level=self.compression_level
+        )
+        options['use_dictionary'] = self.use_dictionary
+        return options
+
+    def stream_parquet_files(self, file_group: List[Tuple[str, int, str]], temp_dir: str, output,
+                             schema: pa.Schema, write_options: dict):
+        """
+        Combine files row group by row group into a single ParquetWriter
+
+        Each downloaded file is appended to the output and deleted straight away, so
+        neither memory nor the temp dir has to hold the whole group at once.
+        """
+        with pq.ParquetWriter(output, schema, **write_options) as writer:
+            for local_file in self.prefetch_sources(file_group, temp_dir):
+                parquet_file = pq.ParquetFile(local_file)
+                for i in range(parquet_file.metadata.num_row_groups):
+                    writer.write_table(conform(parquet_file.read_row_group(i), schema))
+
+                parquet_file.close()
+                os.remove(local_file)
+
     def combine_parquet_files(self, file_group: List[Tuple[str, int, str]], output_key: str):
         """
         Combine multiple parquet files into a single file
 
+        The output is written straight to an S3 multipart upload, so its parts upload
+        while later row groups are still being encoded instead of after the whole file
+        has been written to the temp dir. Only the inputs go through the temp dir.
+
+        Sources whose schemas have drifted apart (an added column, int32 in some parts and
+        int64 in others) are cast to one schema unified from their footers as they are read.
+
         Args:
             file_group: List of (file_key, size, relative_path) tuples to combine
             output_key: S3 key for the combined output file
         """
         with tempfile.TemporaryDirectory() as temp_dir:
-            # Download all files
-            local_files = []
-            for i, (s3_key, _, _) in enumerate(file_group):
-                local_file = os.path.join(temp_dir, f"input_{i}.parquet")
-                self.download_parquet_file(s3_key, local_file)
-                local_files.append(local_file)
-
             # Read and combine parquet files
             try:
-                # Read all parquet files and concatenate
-                dfs = []
-                for local_file in local_files:
-                    df = pd.read_parquet(local_file)
-                    dfs.append(df)
-
-                # Combine all dataframes
-                combined_df = pd.concat(dfs, ignore_index=True)
+                footers = self.fetch_footers(file_group)
+                schema = unify_schemas([footer_schema(tail) for tail in footers])
+                write_options = self.writer_options(footers)
+
+                # Upload the combined file as it is written; an error aborts the upload
+                with S3MultipartWriter(self.s3_client, self.bucket_name, output_key, part_size=self.part_size_bytes,
+                                       upload_concurrency=self.upload_concurrency,
+                                       on_complete=self.inventory.record) as output:
+                    if self.streaming:
+                        self.stream_parquet_files(file_group, temp_dir, output, schema, write_options)
+                    else:
+                        # Download several files at a time and read each one as it arrives
+                        tables = []
+                        for local_file in self.prefetch_sources(file_group, temp_dir):
+                            tables.append(conform(pq.read_table(local_file), schema))
 
-                # Write combined file
-                output_file = os.path.join(temp_dir, "combined.parquet")
-                combined_df.to_parquet(output_file, index=False)
+                        # Combine all tables
+                        combined_table = pa.concat_tables(tables)
 
-                # Upload combined file
-                self.upload_parquet_file(output_file, output_key)
+                        # Write combined file
+                        pq.write_table(combined_table, output, **write_options)
 
                 # Maybe in the future - Delete original files
                 # original_keys = [key for key, _, _ in file_group]
@@ -364,6 +478,10 @@ class S3ParquetCombiner:
                 logger.error(f"Error processing table {table_name}: {e}")
                 continue
 
+        # Keep the saved listing in step with what this run wrote
+        if self.listing_cache:
+            self.inventory.save()
+
         logger.info("Parquet file combination completed")
 
 
@@ -373,17 +491,64 @@ def main():
     parser = argparse.ArgumentParser(description='Combine small Parquet files in S3 into larger files')
     parser.add_argument('--bucket', required=True, help='S3 bucket name')
     parser.add_argument('--prefix', required=True, help='Source data prefix')
+    parser.add_argument('--fetch-workers', type=int, default=DEFAULT_FETCH_WORKERS,
+                        help='Number of source files downloaded concurrently within a group')
+    parser.add_argument('--fetch-budget-mb', type=int, default=DEFAULT_FETCH_BUDGET_MB,
+                        help='Maximum size (MB) of source files downloaded ahead of the reader within a group')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Write each group row group by row group instead of concatenating it in memory')
+    parser.add_argument('--part-size-mb', type=int, default=DEFAULT_PART_SIZE_MB,
+                        help='Size (MB) of each multipart upload part of an output (minimum 5)')
+    parser.add_argument('--upload-concurrency', type=int, default=DEFAULT_UPLOAD_CONCURRENCY,
+                        help='Number of parts of one output uploaded concurrently while it is being written')
+    parser.add_argument('--listing-cache', default=None, metavar='PATH',
+                        help='Local file the S3 listing is saved to and reused from by later runs')
+    parser.add_argument('--listing-cache-max-age', type=float, default=DEFAULT_CACHE_MAX_AGE, metavar='SECONDS',
+                        help='Age after which a saved listing is refreshed (0 always lists again)')
+    parser.add_argument('--list-workers', type=int, default=DEFAULT_LIST_WORKERS,
+                        help='List the table prefixes concurrently with this many workers after discovering them '
+                             'with a delimiter (1 walks the whole prefix sequentially)')
+    parser.add_argument('--inventory-report', default=None, metavar='S3_URI',
+                        help='manifest.json of an S3 Inventory report (CSV or Parquet) to seed the listing from '
+                             'instead of listing the prefix')
+    parser.add_argument('--compression', choices=COMPRESSION_CHOICES, default='auto',
+                        help="Output codec; 'auto' keeps the codec each column has in the source files")
+    parser.add_argument('--compression-level', type=int, default=None,
+                        help='Compression level for codecs that support one (zstd, gzip, brotli)')
+    parser.add_argument('--no-dictionary', action='store_true', help='Disable dictionary encoding in outputs')
+    parser.add_argument('--column-compression', action='append', default=[], metavar='COLUMN=CODEC',
+                        help='Codec override for one column (repeatable), e.g. --column-compression payload=zstd')
 
     args = parser.parse_args()
 
+    column_compression = {}
+    for override in args.column_compression:
+        column, _, codec = override.partition('=')
+        if not column or codec not in COMPRESSION_CHOICES[1:]:
+            parser.error(f"--column-compression expects COLUMN=CODEC with CODEC one of {COMPRESSION_CHOICES[1:]}")
+        column_compression[column] = codec
+
     logger.info(f"Configuration:")
     logger.info(f"  Bucket: {args.bucket}")
     logger.info(f"  Prefix: {args.prefix}")
     logger.info(f"  Target file size: {TARGET_SIZE_MB} MB")
     logger.info(f"  Minimum files to combine: {MIN_FILES_TO_COMBINE}")
+    logger.info(f"  Fetch workers: {args.fetch_workers} (budget {args.fetch_budget_mb} MB)")
+    logger.info(f"  Streaming: {args.streaming}")
+    logger.info(f"  Upload: {args.part_size_mb} MB parts, {args.upload_concurrency} concurrent")
+    logger.info(f"  Listing: {args.inventory_report or f'list prefix with {args.list_workers} workers'} "
+                f"(cache {args.listing_cache}, max age {args.listing_cache_max_age:.0f}s)")
+    logger.info(f"  Compression: {args.compression} (level {args.compression_level}, "
+                f"dictionary {not args.no_dictionary}, overrides {column_compression})")
 
     # Initialize and run combiner
-    combiner = S3ParquetCombiner(args.bucket, args.prefix)
+    combiner = S3ParquetCombiner(args.bucket, args.prefix, fetch_workers=args.fetch_workers,
+                                 fetch_budget_mb=args.fetch_budget_mb, streaming=args.streaming,
+                                 compression=args.compression, compression_level=args.compression_level,
+                                 use_dictionary=not args.no_dictionary, column_compression=column_compression,
+                                 part_size_mb=args.part_size_mb, upload_concurrency=args.upload_concurrency,
+                                 listing_cache=args.listing_cache, listing_cache_max_age=args.listing_cache_max_age,
+                                 inventory_report=args.inventory_report, list_workers=args.list_workers)
     combiner.run()
 
 
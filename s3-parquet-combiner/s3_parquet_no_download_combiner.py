@@ -14,14 +14,46 @@ import pyarrow as pa
 import pyarrow.parquet as pq
 import s3fs
 from botocore.exceptions import ClientError
+import heapq
+import json
 import logging
-from typing import List, Tuple
-from collections import defaultdict
+import math
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Tuple
+from collections import OrderedDict, defaultdict, deque
+from datetime import datetime, timezone
+
+from combine_common import MANIFEST_DIR, ByteBudget
+from parquet_bloom import DEFAULT_BLOOM_FILTER_FPP, bloom_filter_options, parse_bloom_filter_spec
+from parquet_fingerprint import TableFingerprint
+from parquet_schema import conform, footer_schema, unify_schemas
+from parquet_partition import Partitioner, hive_partitions, parse_partition_spec, restore_partition_columns
+from parquet_sort import ExternalSorter, RowOrder
+from parquet_footer import (ParquetConcatenator, can_concatenate, detect_column_codecs, fetch_footer,
+                            resolve_compression, summarize_footers)
+from s3_inventory import DEFAULT_CACHE_MAX_AGE, DEFAULT_LIST_WORKERS, S3Inventory
+from s3_multipart import DEFAULT_PART_SIZE_MB, DEFAULT_UPLOAD_CONCURRENCY, S3MultipartWriter
 
 # Configuration
 TARGET_SIZE_MB = 512
 TARGET_SIZE_BYTES = TARGET_SIZE_MB * 1024 * 1024
+ROLL_THRESHOLD = 0.98  # A rolling output is closed once it reaches this fraction of the target size
 MIN_FILES_TO_COMBINE = 2  # Only combine if there are at least 2 files
+DEFAULT_WORKERS = 1  # Number of groups combined concurrently
+DEFAULT_MAX_INFLIGHT_MB = 2048  # Cap on source bytes held by groups being combined at once
+DEFAULT_FETCH_WORKERS = 8  # Concurrent source downloads within a group
+DEFAULT_FETCH_BUDGET_MB = 256  # Cap on fetched-but-unread source bytes within a group
+DEFAULT_PACKING = 'sequential'  # How files are packed into groups (see PACKING_STRATEGIES)
+SCHEMA_SCOPES = ['group', 'table']  # What a unified output schema is worked out over
+DEFAULT_SCHEMA_SCOPE = 'group'
+DEFAULT_SORT_BUFFER_MB = 512  # Decoded rows held in memory per group before a sorted run is spilled to disk
+DEFAULT_MAX_OPEN_PARTITIONS = 32  # Partitions of a job with an output open at once when repartitioning
+LAYOUT_OPTIONS = ('row_group_mb', 'row_group_rows', 'data_page_kb', 'page_index', 'bloom_filters')  # Settable per table
+DEFAULT_ROW_GROUP_ROWS = 1024 * 1024  # Most rows PyArrow puts in a row group unless told otherwise
+COMPRESSION_CHOICES = ['auto', 'snappy', 'zstd', 'gzip', 'brotli', 'lz4', 'none']  # 'auto' keeps the source codecs
+COMBINED_FILE_PATTERN = re.compile(r'combined_\d+_.*\.parquet$')  # Filenames of outputs written by this script
 
 # Setup logging
 logging.basicConfig(
@@ -36,9 +68,371 @@ logger = logging.getLogger(__name__)
 # Uncomment the line below for more detailed debugging
 # logger.setLevel(logging.DEBUG)
 
+
+def pack_sequential(files: List[Tuple[str, int, str]], target_bytes: int) -> List[list]:
+    """
+    Pack files smallest first, closing a group as soon as the next file would overflow it
+
+    Files at or above the target go in a group of their own.
+    """
+    # Sort files by size (smallest first for better packing)
+    files_sorted = sorted(files, key=lambda x: x[1])
+
+    groups = []
+    current_group = []
+    current_size = 0
+
+    for file_key, file_size, rel_path in files_sorted:
+        # If file is already larger than target, it goes in its own group
+        if file_size >= target_bytes:
+            if current_group:
+                groups.append(current_group)
+                current_group = []
+                current_size = 0
+            groups.append([(file_key, file_size, rel_path)])
+            continue
+
+        # If adding this file would exceed target size, start new group
+        if current_size + file_size > target_bytes and current_group:
+            groups.append(current_group)
+            current_group = [(file_key, file_size, rel_path)]
+            current_size = file_size
+        else:
+            current_group.append((file_key, file_size, rel_path))
+            current_size += file_size
+
+    # Add the last group if it exists
+    if current_group:
+        groups.append(current_group)
+
+    return groups
+
+
+def pack_first_fit_decreasing(files: List[Tuple[str, int, str]], target_bytes: int) -> List[list]:
+    """
+    Pack files largest first, each into the first group that still has room for it
+
+    Small files fill the gaps left by large ones, so fewer groups are needed than with
+    a single sequential pass. Files at or above the target go in a group of their own.
+    """
+    groups = []
+    group_sizes = []
+
+    for file_info in sorted(files, key=lambda x: x[1], reverse=True):
+        file_size = file_info[1]
+        if file_size >= target_bytes:
+            groups.append([file_info])
+            group_sizes.append(file_size)
+            continue
+
+        for i, group_size in enumerate(group_sizes):
+            if group_size + file_size <= target_bytes:
+                groups[i].append(file_info)
+                group_sizes[i] += file_size
+                break
+        else:
+            groups.append([file_info])
+            group_sizes.append(file_size)
+
+    return groups
+
+
+def pack_balanced(files: List[Tuple[str, int, str]], target_bytes: int) -> List[list]:
+    """
+    Pack files into the fewest groups that fit the target, with sizes as even as possible
+
+    Starts from the lower bound ceil(total / target) groups and assigns files largest
+    first to the currently smallest group. If a group overflows, it retries with one
+    more group. Files at or above the target go in a group of their own.
+    """
+    oversized = [[file_info] for file_info in files if file_info[1] >= target_bytes]
+    remaining = sorted((file_info for file_info in files if file_info[1] < target_bytes),
+                       key=lambda x: x[1], reverse=True)
+    if not remaining:
+        return oversized
+
+    group_count = max(1, math.ceil(sum(size for _, size, _ in remaining) / target_bytes))
+    while True:
+        groups = [[] for _ in range(group_count)]
+        heap = [(0, i) for i in range(group_count)]
+        overflow = False
+        for file_info in remaining:
+            group_size, i = heapq.heappop(heap)
+            groups[i].append(file_info)
+            group_size += file_info[1]
+            overflow = overflow or group_size > target_bytes
+            heapq.heappush(heap, (group_size, i))
+
+        if not overflow:
+            return [group for group in groups if group] + oversized
+        group_count += 1
+
+
+# Strategies selectable with --packing
+PACKING_STRATEGIES = {
+    'sequential': pack_sequential,
+    'ffd': pack_first_fit_decreasing,
+    'balanced': pack_balanced,
+}
+
+
+class RollingParquetWriter:
+    """
+    ParquetWriter that starts a new output file whenever the current one reaches a target size
+
+    Size is measured from the bytes actually flushed to the output, so it reflects the
+    output codec rather than the size of the inputs. A row group never spans two
+    outputs: once the observed bytes per row say the next row group won't fit in the
+    current file, the file is closed and the row group starts the next one, so every
+    file ends within a row group of the target without a sliver of a row group at
+    its end.
+
+    Without row group sizing every table written becomes its own row group(s), except
+    that a table bigger than a whole output is cut to output-sized row groups. With
+    row_group_rows or row_group_bytes, tables are buffered and written as row groups of
+    that size however they arrive; a byte target is turned into rows using the observed
+    bytes per row, or the bytes_per_row estimate until a row group has been written.
+    Either way the rows left over from cutting a table are carried into the next row
+    group rather than written on their own.
+    """
+
+    def __init__(self, open_output: Callable[[int], Tuple[str, object]], schema: pa.Schema,
+                 write_options: dict, target_bytes: int = None, row_group_rows: int = None,
+                 row_group_bytes: int = None, bytes_per_row: float = None,
+                 name_output: Callable[[str, object, int], str] = None,
+                 on_output: Callable[[dict], None] = None):
+        """
+        Args:
+            open_output: Called with the 0-based output number, returns (key, writable file object)
+            schema: Arrow schema of every table written
+            write_options: Keyword arguments for pq.ParquetWriter
+            target_bytes: Size at which to start a new output; None writes a single output
+            row_group_rows: Rows per row group
+            row_group_bytes: Written bytes per row group (the smaller wins if both are given)
+            bytes_per_row: Estimated written bytes per row, used for row_group_bytes until measured
+            name_output: Called with (key, file object, size) once an output's footer is written;
+                         returns the key the file is closed at (default: keeps key)
+            on_output: Called with the {'key', 'size', 'rows'} dict of every output just before its
+                       file is closed, so the key can be recorded before anything appears there
+        """
+        self.open_output = open_output
+        self.schema = schema
+        self.write_options = write_options
+        self.target_bytes = target_bytes
+        self.row_group_rows = row_group_rows
+        self.row_group_bytes = row_group_bytes
+        self.name_output = name_output
+        self.on_output = on_output
+        self.outputs = []  # One {'key', 'size', 'rows'} dict per closed output
+        self.rows = 0
+        self._key = None
+        self._sink = None
+        self._writer = None
+        self._file_rows = 0
+        self._bytes_per_row = bytes_per_row
+        self._pending = []  # Tables buffered towards the next row group
+        self._pending_rows = 0
+
+    def _open(self):
+        self._key, self._sink = self.open_output(len(self.outputs))
+        self._writer = pq.ParquetWriter(self._sink, self.schema, **self.write_options)
+        self._file_rows = 0
+
+    def _close_current(self):
+        self._writer.close()
+        size = self._sink.tell()
+        if self.name_output is not None:
+            self._key = self.name_output(self._key, self._sink, size)
+        output = {'key': self._key, 'size': size, 'rows': self._file_rows}
+        if self.on_output is not None:
+            self.on_output(output)
+        self._sink.close()
+        self.outputs.append(output)
+        self._key, self._sink, self._writer = None, None, None
+
+    def _row_group_target(self) -> int:
+        """Rows in the next row group, or None to write tables as they come"""
+        targets = []
+        if self.row_group_rows:
+            targets.append(self.row_group_rows)
+        if self._bytes_per_row:
+            if self.row_group_bytes:
+                targets.append(max(1, int(self.row_group_bytes / self._bytes_per_row)))
+            if self.target_bytes:
+                targets.append(max(1, int(self.target_bytes * ROLL_THRESHOLD / self._bytes_per_row)))
+        return min(targets) if targets else None
+
+    def write(self, table: pa.Table):
+        """Write a table, rolling over to new outputs as each one fills up"""
+        self._pending.append(table)
+        self._pending_rows += table.num_rows
+        cut = False
+        rows = self._row_group_target()
+        while rows is not None and self._pending_rows >= rows:
+            pending = pa.concat_tables(self._pending)
+            self._write(pending.slice(0, rows))
+            self._pending = [pending.slice(rows)]
+            self._pending_rows -= rows
+            cut = True
+            rows = self._row_group_target()
+
+        # Without row group sizing, a table is written as it comes unless it was cut
+        # above, in which case its last rows wait to open the next row group
+        if not (self.row_group_rows or self.row_group_bytes) and not cut and self._pending_rows:
+            self._write(pa.concat_tables(self._pending))
+            self._pending, self._pending_rows = [], 0
+
+    def _write(self, table: pa.Table):
+        """Write one row group, closing the current output first if it can't take it"""
+        if (self._writer is not None and self.target_bytes and self._bytes_per_row and self._file_rows
+                and self._sink.tell() + table.num_rows * self._bytes_per_row > self.target_bytes):
+            self._close_current()
+        if self._writer is None:
+            self._open()
+
+        sized = self.row_group_rows or self.row_group_bytes
+        self._writer.write_table(table, row_group_size=max(1, table.num_rows) if sized else None)
+        self._file_rows += table.num_rows
+        self.rows += table.num_rows
+
+        written = self._sink.tell()
+        if self._file_rows:
+            self._bytes_per_row = written / self._file_rows
+        if self.target_bytes and written >= self.target_bytes * ROLL_THRESHOLD:
+            self._close_current()
+
+    def close(self) -> List[dict]:
+        """
+        Finish the current output; writes an empty file if nothing was written at all
+
+        Returns:
+            The outputs written, as {'key', 'size', 'rows'} dicts
+        """
+        if self._pending_rows:
+            self._write(pa.concat_tables(self._pending))
+            self._pending, self._pending_rows = [], 0
+        if self._writer is None and not self.outputs:
+            self._open()
+        if self._writer is not None:
+            self._close_current()
+        return self.outputs
+
+    def abort(self) -> List[str]:
+        """
+        Stop writing after a failure
+
+        Returns:
+            Keys of every output touched, complete or not, so the caller can remove them
+        """
+        keys = [output['key'] for output in self.outputs]
+        if self._writer is not None:
+            keys.append(self._key)
+            try:
+                self._writer.close()
+                if hasattr(self._sink, 'abort'):
+                    self._sink.abort()
+                else:
+                    self._sink.close()
+            except Exception as e:
+                logger.debug(f"Ignoring error while aborting {self._key}: {e}")
+        return keys
+
+
+class PartitionedWriter:
+    """
+    Route rows into one RollingParquetWriter per Hive partition
+
+    At most max_open partitions have an output open at once, since each holds a
+    multipart upload part and a row group in memory. Writing to another partition
+    first closes the least recently written one; rows that arrive for it later go
+    to a new output. Rows ordered by the partition columns never come back to a
+    closed partition; otherwise the first partition that does is logged as a warning.
+    """
+
+    def __init__(self, partitioner: Partitioner, open_writer: Callable[[str], RollingParquetWriter],
+                 max_open: int = DEFAULT_MAX_OPEN_PARTITIONS):
+        """
+        Args:
+            partitioner: Splits each table written into its partitions
+            open_writer: Called with a partition path, returns the writer for its next outputs
+            max_open: Most partitions with a writer open at once
+        """
+        self.partitioner = partitioner
+        self.open_writer = open_writer
+        self.max_open = max(1, max_open)
+        self.outputs = []  # One {'key', 'size', 'rows'} dict per closed output
+        self.rows = 0
+        self.reopened = 0  # Times rows arrived for a partition already closed to make room
+        self._writers = OrderedDict()  # Partition path -> open writer, least recently written first
+        self._evicted = set()
+
+    def write(self, table: pa.Table):
+        """Write each partition's rows of a table to that partition's writer"""
+        for path, rows in self.partitioner.split(table):
+            writer = self._writers.pop(path, None)
+            if writer is None:
+                if len(self._writers) >= self.max_open:
+                    evicted_path, evicted = self._writers.popitem(last=False)
+                    self.outputs.extend(evicted.close())
+                    self._evicted.add(evicted_path)
+                if path in self._evicted:
+                    if not self.reopened:
+                        logger.warning(f"Partition {path} was closed to keep {self.max_open} partitions open "
+                                       f"and is written to again, in a new output; order the rows by the "
+                                       f"partition columns or raise max_open_partitions")
+                    self.reopened += 1
+                writer = self.open_writer(path)
+            self._writers[path] = writer
+            writer.write(rows)
+            self.rows += rows.num_rows
+
+    def close(self) -> List[dict]:
+        """
+        Finish every open partition
+
+        Returns:
+            The outputs written, as {'key', 'size', 'rows'} dicts
+        """
+        while self._writers:
+            _, writer = self._writers.popitem(last=False)
+            self.outputs.extend(writer.close())
+        if self.reopened:
+            logger.warning(f"Closed partitions were reopened {self.reopened} times, "
+                           f"adding as many extra outputs ({len(self.outputs)} in all)")
+        return self.outputs
+
+    def abort(self) -> List[str]:
+        """
+        Stop writing after a failure
+
+        Returns:
+            Keys of every output touched, complete or not, so the caller can remove them
+        """
+        keys = [output['key'] for output in self.outputs]
+        while self._writers:
+            _, writer = self._writers.popitem(last=False)
+            keys.extend(writer.abort())
+        return keys
+
+
 class S3ParquetCombiner:
     def __init__(self, bucket_name: str, prefix: str = "", aws_access_key_id: str = None, 
-                 aws_secret_access_key: str = None):
+                 aws_secret_access_key: str = None, workers: int = DEFAULT_WORKERS,
+                 max_inflight_mb: int = DEFAULT_MAX_INFLIGHT_MB, fetch_workers: int = DEFAULT_FETCH_WORKERS,
+                 fetch_budget_mb: int = DEFAULT_FETCH_BUDGET_MB, streaming: bool = False,
+                 binary_merge: bool = False, compression: str = 'auto', compression_level: int = None,
+                 use_dictionary: bool = True, column_compression: dict = None, rolling: bool = False,
+                 packing: str = DEFAULT_PACKING, part_size_mb: int = DEFAULT_PART_SIZE_MB,
+                 upload_concurrency: int = DEFAULT_UPLOAD_CONCURRENCY, resume: bool = False,
+                 incremental: bool = False, top_up: bool = False, verify: bool = False,
+                 listing_cache: str = None, listing_cache_max_age: float = DEFAULT_CACHE_MAX_AGE,
+                 inventory_report: str = None, list_workers: int = DEFAULT_LIST_WORKERS,
+                 schema_scope: str = DEFAULT_SCHEMA_SCOPE, sort_by: List[str] = None,
+                 cluster_by: List[str] = None, sort_buffer_mb: int = DEFAULT_SORT_BUFFER_MB,
+                 spill_dir: str = None, row_group_mb: float = None, row_group_rows: int = None,
+                 data_page_kb: int = None, page_index: bool = False, bloom_filters: List[str] = None,
+                 table_layouts: dict = None, partition_by: List[str] = None,
+                 max_open_partitions: int = DEFAULT_MAX_OPEN_PARTITIONS):
         """
         Initialize the S3 Parquet Combiner
 
@@ -47,14 +441,118 @@ class S3ParquetCombiner:
             prefix: Prefix path in S3 (e.g., 'database-export/')
             aws_access_key_id: AWS access key (optional, uses default credentials if None)
             aws_secret_access_key: AWS secret key (optional, uses default credentials if None)
+            workers: Number of groups to combine concurrently across all tables
+            max_inflight_mb: Maximum total source size (MB) of the groups being combined at once
+            fetch_workers: Number of source files fetched concurrently within a group
+            fetch_budget_mb: Maximum size (MB) of source files fetched ahead of the reader within a group
+            streaming: Write row group by row group instead of concatenating each group in memory
+            binary_merge: Copy column chunks verbatim when every file in a group shares its schema and compression
+            compression: Output codec, or 'auto' to keep the codec each column has in the source footers
+            compression_level: Compression level for codecs that support one (e.g. zstd, gzip)
+            use_dictionary: Dictionary-encode output columns
+            column_compression: Codec overrides per column name, e.g. {'payload': 'zstd'}
+            rolling: Stream each subdirectory into outputs closed at TARGET_SIZE_MB of written bytes,
+                     split across up to `workers` concurrent jobs
+            packing: Strategy used to pack files into groups, one of PACKING_STRATEGIES
+            part_size_mb: Size (MB) of each multipart upload part of an output (minimum 5)
+            upload_concurrency: Number of parts of one output uploaded concurrently while it is being written
+            resume: Skip groups whose manifest shows they were completed from the same inputs
+            incremental: Only combine source files no manifest records as already combined
+            top_up: In incremental mode, recombine the last under-target output of a subdirectory
+                    together with the new files
+            verify: Fingerprint the sources while combining them and check the outputs against it
+            listing_cache: Local file the listing is saved to and reused from by later runs
+            listing_cache_max_age: Seconds after which a saved listing is refreshed
+            inventory_report: s3:// URI of an S3 Inventory manifest.json to seed the listing from
+            list_workers: Number of table prefixes listed concurrently (1 lists the prefix sequentially)
+            schema_scope: Unify differing source schemas over each 'group' or over the whole 'table',
+                          so every output of a table shares one schema
+            sort_by: Columns to sort the rows of each output by, ascending, in priority order
+            cluster_by: Numeric or temporal columns to cluster the rows of each output by on a Z-order
+                        curve, so filters on any of them can skip row groups (exclusive with sort_by)
+            sort_buffer_mb: Decoded size (MB) of rows sorted in memory before a streamed group
+                            spills a sorted run to disk
+            spill_dir: Directory sorted runs are spilled under (default: the system temp dir)
+            row_group_mb: Target written size (MB) of each output row group
+            row_group_rows: Target rows per output row group (the smaller wins if both are given)
+            data_page_kb: Target size (KB) of each data page
+            page_index: Write the column index and offset index, so readers can skip pages
+            bloom_filters: Write a bloom filter for each of these 'column' or 'column:fpp' specs (fpp
+                           being the false-positive probability), so point lookups by key can skip
+                           row groups whose min/max statistics don't rule the key out
+            table_layouts: Per-table overrides of the options above, e.g.
+                           {'public.tasks_tasks': {'row_group_mb': 64, 'page_index': True, 'bloom_filters': ['id']}}
+            partition_by: Repartition each table into Hive-style directories while combining, on
+                          'column' or 'column:year|month|day' specs, outermost first
+            max_open_partitions: Most partitions of a job with an output open at once
         """
         self.bucket_name = bucket_name
         self.prefix = prefix.rstrip('/') + '/' if prefix else ''
+        self.workers = max(1, workers)
+        self.max_inflight_bytes = max_inflight_mb * 1024 * 1024
+        self.fetch_workers = max(1, fetch_workers)
+        self.fetch_budget_bytes = fetch_budget_mb * 1024 * 1024
+        self.streaming = streaming
+        self.binary_merge = binary_merge
+        self.compression = compression
+        self.compression_level = compression_level
+        self.use_dictionary = use_dictionary
+        self.column_compression = column_compression or {}
+        self.rolling = rolling
+        self.packing = packing
+        self.part_size_bytes = part_size_mb * 1024 * 1024
+        self.upload_concurrency = max(1, upload_concurrency)
+        self.resume = resume
+        self.incremental = incremental
+        self.top_up = top_up
+        self.verify = verify
+        self.listing_cache = listing_cache
+        self.listing_cache_max_age = listing_cache_max_age
+        self.inventory_report = inventory_report
+        self.list_workers = max(1, list_workers)
+        self.schema_scope = schema_scope
+        self.table_schemas = {}  # table -> unified schema, with schema_scope 'table'
+        if sort_by and cluster_by:
+            raise ValueError("sort_by and cluster_by are mutually exclusive")
+        self.sort_by = sort_by or []
+        self.cluster_by = cluster_by or []
+        self.sort_buffer_bytes = sort_buffer_mb * 1024 * 1024
+        self.spill_dir = spill_dir
+        self.layout = {'row_group_mb': row_group_mb, 'row_group_rows': row_group_rows,
+                       'data_page_kb': data_page_kb, 'page_index': page_index,
+                       'bloom_filters': [parse_bloom_filter_spec(spec) for spec in bloom_filters or []]}
+        self.table_layouts = {}
+        self.partition_by = [parse_partition_spec(spec) for spec in partition_by or []]
+        if self.partition_by and top_up:
+            raise ValueError("top_up can't be combined with partition_by")
+        self.max_open_partitions = max(1, max_open_partitions)
+        self.output_indexes = {}  # (table, directory) -> number of its next output, for outputs numbered as written
+        self.output_index_lock = threading.Lock()
+        self.running_jobs = {}  # output_key of a running job -> (job, outputs closed so far)
+        for table_name, overrides in (table_layouts or {}).items():
+            unknown = set(overrides) - set(LAYOUT_OPTIONS)
+            if unknown:
+                raise ValueError(f"Unknown layout options {sorted(unknown)} for table {table_name}; "
+                                 f"expected some of {list(LAYOUT_OPTIONS)}")
+            overrides = dict(overrides)
+            if 'bloom_filters' in overrides:
+                overrides['bloom_filters'] = [parse_bloom_filter_spec(spec) for spec in overrides['bloom_filters']]
+            self.table_layouts[table_name] = overrides
+        path_columns = {column for column, transform in self.partition_by if transform == 'identity'}
+        for layout in [self.layout, *self.table_layouts.values()]:
+            stored_elsewhere = sorted(path_columns & {column for column, _ in layout.get('bloom_filters', [])})
+            if stored_elsewhere:
+                raise ValueError(f"Can't write bloom filters for partition columns {stored_elsewhere}; "
+                                 f"their values are only stored in the partition paths")
+        self.combined_outputs = defaultdict(list)  # table -> existing (file_key, size, relative_path) outputs
+        self.top_up_keys = set()  # Existing outputs being recombined with new files
+        self.output_manifests = {}  # Existing output key -> output_key of the job that wrote it
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
         )
+        self.inventory = S3Inventory(self.s3_client, bucket_name, self.prefix)  # Filled in while listing
 
         # Initialize s3fs for PyArrow
         self.s3fs = s3fs.S3FileSystem(
@@ -78,51 +576,48 @@ class S3ParquetCombiner:
         logger.info(f"Using prefix: '{self.prefix}'")
 
         try:
-            paginator = self.s3_client.get_paginator('list_objects_v2')
-            page_iterator = paginator.paginate(
-                Bucket=self.bucket_name,
-                Prefix=self.prefix
-            )
+            self.inventory.populate(self.listing_cache, self.listing_cache_max_age, self.inventory_report,
+                                    self.list_workers)
 
             total_objects = 0
-            for page in page_iterator:
-                if 'Contents' not in page:
-                    logger.warning(f"No 'Contents' found in page - bucket may be empty or prefix may not exist")
-                    continue
+            for key, size, _, _ in self.inventory.objects():
+                total_objects += 1
 
-                for obj in page['Contents']:
-                    key = obj['Key']
-                    size = obj['Size']
-                    total_objects += 1
+                all_files_found.append(key)
 
-                    all_files_found.append(key)
+                # Log first few files for debugging
+                if len(all_files_found) <= 10:
+                    logger.debug(f"Found file: {key} ({size} bytes)")
 
-                    # Log first few files for debugging
-                    if len(all_files_found) <= 10:
-                        logger.debug(f"Found file: {key} ({size} bytes)")
+                # Skip if not a parquet file
+                if not key.lower().endswith('.parquet'):
+                    continue
 
-                    # Skip if not a parquet file
-                    if not key.lower().endswith('.parquet'):
-                        continue
+                # Extract table name (first subdirectory after prefix)
+                relative_path = key[len(self.prefix):] if self.prefix else key
+                path_parts = relative_path.split('/')
 
-                    parquet_files_found.append(key)
+                # Outputs of earlier runs are not inputs of a resumed or incremental run
+                if (self.resume or self.incremental) and COMBINED_FILE_PATTERN.match(path_parts[-1]):
+                    logger.debug(f"Skipping combined output: {key}")
+                    if len(path_parts) >= 2:
+                        self.combined_outputs[path_parts[0]].append((key, size, '/'.join(path_parts[1:-1])))
+                    continue
 
-                    # Extract table name (first subdirectory after prefix)
-                    relative_path = key[len(self.prefix):] if self.prefix else key
-                    path_parts = relative_path.split('/')
+                parquet_files_found.append(key)
 
-                    logger.debug(f"Processing parquet file: {key}")
-                    logger.debug(f"  Relative path: {relative_path}")
-                    logger.debug(f"  Path parts: {path_parts}")
+                logger.debug(f"Processing parquet file: {key}")
+                logger.debug(f"  Relative path: {relative_path}")
+                logger.debug(f"  Path parts: {path_parts}")
 
-                    if len(path_parts) >= 2:  # At least table/...file.parquet
-                        table_name = path_parts[0]
-                        # Store the relative path within the table for organizing combined files
-                        file_relative_path = '/'.join(path_parts[1:-1]) if len(path_parts) > 2 else ''
-                        tables[table_name].append((key, size, file_relative_path))
-                        logger.debug(f"  Added to table '{table_name}', subdir: '{file_relative_path}'")
-                    else:
-                        logger.warning(f"Skipping parquet file with insufficient path depth: {key}")
+                if len(path_parts) >= 2:  # At least table/...file.parquet
+                    table_name = path_parts[0]
+                    # Store the relative path within the table for organizing combined files
+                    file_relative_path = '/'.join(path_parts[1:-1]) if len(path_parts) > 2 else ''
+                    tables[table_name].append((key, size, file_relative_path))
+                    logger.debug(f"  Added to table '{table_name}', subdir: '{file_relative_path}'")
+                else:
+                    logger.warning(f"Skipping parquet file with insufficient path depth: {key}")
 
             # Summary logging
             logger.info(f"Search completed:")
@@ -189,35 +684,7 @@ class S3ParquetCombiner:
         all_groups = {}
 
         for subdir_path, subdir_files in files_by_subdir.items():
-            # Sort files by size (smallest first for better packing)
-            files_sorted = sorted(subdir_files, key=lambda x: x[1])
-
-            groups = []
-            current_group = []
-            current_size = 0
-
-            for file_key, file_size, rel_path in files_sorted:
-                # If file is already larger than target, it goes in its own group
-                if file_size >= TARGET_SIZE_BYTES:
-                    if current_group:
-                        groups.append(current_group)
-                        current_group = []
-                        current_size = 0
-                    groups.append([(file_key, file_size, rel_path)])
-                    continue
-
-                # If adding this file would exceed target size, start new group
-                if current_size + file_size > TARGET_SIZE_BYTES and current_group:
-                    groups.append(current_group)
-                    current_group = [(file_key, file_size, rel_path)]
-                    current_size = file_size
-                else:
-                    current_group.append((file_key, file_size, rel_path))
-                    current_size += file_size
-
-            # Add the last group if it exists
-            if current_group:
-                groups.append(current_group)
+            groups = PACKING_STRATEGIES[self.packing](subdir_files, TARGET_SIZE_BYTES)
 
             # Only keep groups that have multiple files or are close to target size
             valid_groups = [group for group in groups if len(group) >= MIN_FILES_TO_COMBINE or 
@@ -247,104 +714,961 @@ class S3ParquetCombiner:
                 Bucket=self.bucket_name,
                 Delete={'Objects': objects_to_delete}
             )
+            for key in s3_keys:
+                self.inventory.forget(key)
             logger.info(f"Deleted {len(s3_keys)} files from S3")
         except ClientError as e:
             logger.error(f"Error deleting files: {e}")
             raise
 
-    def combine_parquet_files(self, file_group: List[Tuple[str, int, str]], output_key: str):
+    def fetch_source(self, s3_key: str) -> pa.Buffer:
+        """Fetch a whole source object from S3 with a single GET"""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            return pa.py_buffer(response['Body'].read())
+        except ClientError as e:
+            logger.error(f"Error fetching {s3_key}: {e}")
+            raise
+
+    def prefetch_sources(self, file_group: List[Tuple[str, int, str]]) -> Iterator[Tuple[str, pa.Buffer]]:
+        """
+        Yield (file_key, buffer) for every file in the group, in group order
+
+        Up to fetch_workers GETs run ahead of the consumer, as long as the files fetched
+        but not yet handed out stay within fetch_budget_bytes. A file is released from the
+        budget when the consumer asks for the next one. The first outstanding file is
+        always fetched, even when it alone is larger than the budget.
+        """
+        pending = deque()
+        pending_bytes = 0
+        next_index = 0
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+            try:
+                while next_index < len(file_group) or pending:
+                    # Top up the read-ahead window
+                    while next_index < len(file_group) and len(pending) < self.fetch_workers:
+                        s3_key, size, _ = file_group[next_index]
+                        if pending and pending_bytes + size > self.fetch_budget_bytes:
+                            break
+                        logger.debug(f"Fetching file {next_index+1}/{len(file_group)}: {s3_key}")
+                        pending.append((s3_key, size, pool.submit(self.fetch_source, s3_key)))
+                        pending_bytes += size
+                        next_index += 1
+
+                    s3_key, size, future = pending.popleft()
+                    data = future.result()
+                    pending_bytes -= size
+                    yield s3_key, data
+            finally:
+                for _, _, future in pending:
+                    future.cancel()
+
+    def open_output(self, output_key: str) -> S3MultipartWriter:
+        """
+        Open an S3 object for writing
+
+        Parts are uploaded in the background as soon as they fill up, so later row groups
+        are encoded while earlier ones are still uploading. Nothing appears at the key until
+        the writer is closed; abort() discards it.
+        """
+        return S3MultipartWriter(self.s3_client, self.bucket_name, output_key,
+                                 part_size=self.part_size_bytes, upload_concurrency=self.upload_concurrency,
+                                 on_complete=self.inventory.record)
+
+    def next_output_key(self, table_name: str, directory: str) -> str:
+        """
+        Key for the next output of a table directory whose outputs are numbered as they are written
+
+        Rolling and partitioned jobs don't know how many outputs they will write, so every
+        job writing to a directory draws from one counter, which starts after the outputs
+        a resumed or incremental run found there. The key is labelled with the target size,
+        which name_output() replaces with the written size when it still can.
+        """
+        with self.output_index_lock:
+            slot = (table_name, directory)
+            if slot not in self.output_indexes:
+                existing = [self.output_index(key) for key, _, relative_path in self.combined_outputs.get(table_name, [])
+                            if relative_path == directory]
+                self.output_indexes[slot] = max(existing, default=0) + 1
+            index = self.output_indexes[slot]
+            self.output_indexes[slot] += 1
+        directory = f"{directory}/" if directory else ""
+        return f"{self.prefix}{table_name}/{directory}combined_{index:03d}_{TARGET_SIZE_MB}MB.parquet"
+
+    def job_output_key(self, output_key: str, part: int) -> str:
+        """Key of the part-th (0-based) output of the job planned as output_key"""
+        if not (self.rolling or self.partition_by):
+            return output_key  # One output per job, numbered when it was planned
+        path_parts = output_key[len(self.prefix):].split('/')
+        return self.next_output_key(path_parts[0], '/'.join(path_parts[1:-1]))
+
+    def name_output(self, output_key: str, sink: S3MultipartWriter, size: int) -> str:
+        """
+        Key to close an output at once its size is known
+
+        A rolling or partitioned output still under one part is named by its written
+        size, e.g. combined_003_41MB.parquet. One whose upload has started stays at the
+        target-size key it was opened with, and a single-output job keeps its planned key.
+        """
+        if not (self.rolling or self.partition_by):
+            return output_key
+        directory, filename = output_key.rsplit('/', 1)
+        sized_key = f"{directory}/combined_{self.output_index(filename):03d}_{size / (1024 * 1024):.0f}MB.parquet"
+        return sized_key if sink.rename(sized_key) else output_key
+
+    def record_output(self, output_key: str, output: dict):
+        """
+        Add an output to the in-progress manifest of the job planned as output_key
+
+        Outputs are recorded just before they are closed, so every output an interrupted
+        job leaves behind is known by key and a later run can delete it before redoing
+        the job.
+        """
+        job, outputs = self.running_jobs[output_key]
+        outputs.append(output)
+        self.save_manifest(job, 'in_progress', {'outputs': outputs, 'rows': None})
+
+    def combine_parquet_files(self, file_group: List[Tuple[str, int, str]], output_key: str,
+                              schema: pa.Schema = None, layout: dict = None) -> dict:
         """
         Combine multiple parquet files into a single file using PyArrow directly on S3
 
+        In rolling mode the group is split across as many outputs as it takes to keep
+        each one at TARGET_SIZE_MB, numbered on from output_key. With verify, the rows are
+        fingerprinted as the sources stream through and checked against the outputs.
+
+        Sources whose schemas have drifted apart are cast to one unified schema as they
+        are read, so a column added part way through an export or widened from int32 to
+        int64 doesn't stop the group from combining. With sort_by or cluster_by the rows
+        are ordered across the group's outputs, spilling to disk when streamed. With
+        partition_by the rows are ordered by partition, spilling to disk like a sort,
+        and streamed into rolling outputs per Hive partition of the table instead;
+        output_key then only names the job.
+
         Args:
             file_group: List of (file_key, size, relative_path) tuples to combine
             output_key: S3 key for the combined output file
+            schema: Schema to write; None unifies the schemas in the group's footers
+            layout: Row group and page options (see table_layout()); None uses the defaults
+
+        Returns:
+            Dictionary with 'outputs' ({'key', 'size', 'rows'} per file written) and total 'rows',
+            plus 'fingerprints' ({'input', 'output'} digests) when verifying
         """
         try:
-            logger.info(f"Reading {len(file_group)} parquet files directly from S3...")
-
-            # Read all parquet files directly from S3
-            tables = []
-            for i, (s3_key, _, _) in enumerate(file_group):
-                s3_path = f"s3://{self.bucket_name}/{s3_key}"
-                logger.debug(f"Reading file {i+1}/{len(file_group)}: {s3_path}")
-
-                # Read parquet file directly from S3
-                table = pq.read_table(s3_path, filesystem=self.s3fs)
-                tables.append(table)
-
-            # Concatenate all tables
-            logger.info("Concatenating tables...")
-            combined_table = pa.concat_tables(tables)
-
-            # Write combined table directly to S3
-            output_s3_path = f"s3://{self.bucket_name}/{output_key}"
-            logger.info(f"Writing combined file to S3: {output_s3_path}")
-
-            pq.write_table(
-                combined_table,
-                output_s3_path,
-                filesystem=self.s3fs,
-                compression='snappy'  # Use snappy compression for better performance
-            )
+            footers = self.fetch_footers(file_group)
+            if schema is None:
+                schema = self.unified_schema(footers)
+            order = self.row_order(footers, schema)
+            layout = layout or self.layout
+            write_options = self.writer_options(footers, layout)
+            sizing = self.row_group_sizing(file_group, footers, layout)
+            if layout.get('bloom_filters'):
+                write_options['bloom_filter_options'] = self.bloom_filter_options(
+                    layout['bloom_filters'], schema, footers, sizing)
+            target_bytes = TARGET_SIZE_BYTES if self.rolling or self.partition_by else None
+            fingerprint = TableFingerprint() if self.verify else None
+
+            if self.binary_merge and self.partition_by:
+                logger.info("Rows are being repartitioned - falling back to decoding")
+            elif self.binary_merge and order is not None:
+                logger.info("Rows are being reordered - falling back to decoding")
+            elif self.binary_merge and any(layout.values()):
+                logger.info("Row groups, pages or indexes are being rewritten - falling back to decoding")
+            if (self.binary_merge and order is None and not any(layout.values()) and not self.partition_by
+                    and self.can_binary_merge(footers, schema)):
+                result = self.binary_merge_parquet_files(file_group, output_key, target_bytes, fingerprint)
+            elif self.streaming or self.rolling or self.partition_by:
+                result = self.stream_parquet_files(file_group, output_key, footers, target_bytes, fingerprint,
+                                                   schema, order, write_options, sizing)
+            else:
+                logger.info(f"Reading {len(file_group)} parquet files directly from S3...")
+
+                # Read all parquet files directly from S3, fetching several at a time
+                tables = []
+                for s3_key, data in self.prefetch_sources(file_group):
+                    tables.append(conform(pq.read_table(pa.BufferReader(data)), schema))
+                    if fingerprint is not None:
+                        fingerprint.update(tables[-1])
+
+                # Concatenate all tables
+                logger.info("Concatenating tables...")
+                combined_table = pa.concat_tables(tables)
+                if order is not None:
+                    logger.info(f"Ordering rows by {order.sort_keys}...")
+                    combined_table = order.sort(combined_table)
+
+                # Write combined table directly to S3
+                logger.info(f"Writing combined file to S3: s3://{self.bucket_name}/{output_key}")
+                result = self.write_outputs(schema, [combined_table], output_key, write_options, target_bytes,
+                                            sizing)
+
+            if fingerprint is not None:
+                self.verify_outputs(result, fingerprint, schema)
 
             # Delete original files
             # original_keys = [key for key, _, _ in file_group]
             # self.delete_s3_files(original_keys)
 
-            # Get size of combined file for logging
-            try:
-                response = self.s3_client.head_object(Bucket=self.bucket_name, Key=output_key)
-                combined_size_mb = response['ContentLength'] / (1024 * 1024)
-                logger.info(f"Successfully combined {len(file_group)} files into {output_key} ({combined_size_mb:.2f} MB)")
-            except ClientError:
-                logger.info(f"Successfully combined {len(file_group)} files into {output_key}")
+            for output in result['outputs']:
+                logger.info(f"Successfully combined {len(file_group)} files into {output['key']} "
+                            f"({output['size'] / (1024 * 1024):.2f} MB)")
+
+            input_size = sum(size for _, size, _ in file_group)
+            output_size = sum(output['size'] for output in result['outputs'])
+            if input_size:
+                logger.info(f"Combined output is {output_size / input_size:.0%} of input size")
+
+            return result
 
         except Exception as e:
             logger.error(f"Error combining files: {e}")
             logger.error(f"Failed files: {[key for key, _, _ in file_group]}")
             raise
 
-    def process_table(self, table_name: str, files: List[Tuple[str, int, str]]):
-        """Process all files for a single table, handling nested subdirectories"""
+    def fingerprint_output(self, output_key: str, schema: pa.Schema = None) -> TableFingerprint:
+        """
+        Read a freshly written output back from S3 row group by row group and fingerprint it
+
+        With schema, partition columns the output only holds in its path are restored first.
+        """
+        partitions = hive_partitions(output_key[len(self.prefix):]) if schema is not None else {}
+        fingerprint = TableFingerprint()
+        with self.s3fs.open(f"s3://{self.bucket_name}/{output_key}", 'rb') as f:
+            for batch in pq.ParquetFile(f).iter_batches():
+                fingerprint.update(restore_partition_columns(batch, partitions, schema) if partitions else batch)
+        return fingerprint
+
+    def verify_outputs(self, result: dict, input_fingerprint: TableFingerprint, schema: pa.Schema = None):
+        """
+        Check a job's outputs against the fingerprint of the rows read from its sources
+
+        Only the outputs are read back, so the sources are read once for both combining
+        and verifying. Both digests are added to the result (and so to the manifest).
+        With schema, repartitioned outputs are read back with their partition columns.
+
+        Raises:
+            RuntimeError: if the outputs don't hold exactly the source rows. The outputs are
+                          deleted first, as they are when reading them back fails.
+        """
+        output_keys = [output['key'] for output in result['outputs']]
+        output_fingerprint = TableFingerprint()
+        try:
+            for output in result['outputs']:
+                output_fingerprint.merge(self.fingerprint_output(output['key'], schema if self.partition_by else None))
+        except Exception:
+            # An output that can't be read back is no more trustworthy than one that differs
+            self.delete_s3_files(output_keys)
+            raise
+
+        result['fingerprints'] = {'input': input_fingerprint.hexdigest(), 'output': output_fingerprint.hexdigest()}
+        if output_fingerprint != input_fingerprint:
+            self.delete_s3_files(output_keys)
+            raise RuntimeError(f"Verification failed for {output_keys}: source fingerprint "
+                               f"{result['fingerprints']['input']}, output fingerprint {result['fingerprints']['output']}")
+        logger.info(f"✓ Verified {len(output_keys)} outputs against their sources "
+                    f"({input_fingerprint.num_rows:,} rows, fingerprint {result['fingerprints']['input']})")
+
+    def write_outputs(self, schema: pa.Schema, tables, output_key: str, write_options: dict,
+                      target_bytes: int = None, sizing: dict = None) -> dict:
+        """
+        Write a stream of tables through a RollingParquetWriter, sized by row_group_sizing()
+
+        With partition_by, a PartitionedWriter gives every partition of the table its own
+        rolling writer instead. If anything fails part way through, every output touched
+        is removed so a partial file can't be mistaken for a complete combined file.
+
+        Returns:
+            Dictionary with 'outputs' ({'key', 'size', 'rows'} per file written) and total 'rows'
+        """
+        def open_output(output_key):
+            return output_key, self.open_output(output_key)
+
+        def on_output(output):
+            if job_key in self.running_jobs:
+                self.record_output(job_key, output)
+
+        job_key = output_key
+        if self.partition_by:
+            table_name = output_key[len(self.prefix):].split('/', 1)[0]
+            partitioner = Partitioner(self.partition_by, schema)
+            writer = PartitionedWriter(
+                partitioner,
+                lambda path: RollingParquetWriter(lambda part: open_output(self.next_output_key(table_name, path)),
+                                                  partitioner.file_schema, write_options, target_bytes,
+                                                  name_output=self.name_output, on_output=on_output,
+                                                  **(sizing or {})),
+                self.max_open_partitions
+            )
+        else:
+            writer = RollingParquetWriter(
+                lambda part: open_output(self.job_output_key(output_key, part)),
+                schema,
+                write_options,
+                target_bytes,
+                name_output=self.name_output,
+                on_output=on_output,
+                **(sizing or {})
+            )
+        try:
+            for table in tables:
+                writer.write(table)
+            outputs = writer.close()
+        except Exception:
+            self.delete_s3_files(writer.abort())
+            raise
+
+        return {'outputs': outputs, 'rows': writer.rows}
+
+    def row_order(self, footers: List[bytes], schema: pa.Schema):
+        """
+        The RowOrder a group's outputs are written in, or None to keep the source order
+
+        Clustering scales each column by the min/max recorded in the source footers; if
+        some source doesn't record them, the rows are sorted by the cluster columns instead.
+        """
+        if not self.sort_by and not self.cluster_by:
+            return None
+        bounds = None
+        if self.cluster_by:
+            columns = summarize_footers(footers)['columns']
+            bounds = {}
+            for name in self.cluster_by:
+                stats = columns.get(name)
+                if stats is None or stats['min'] is None or schema.get_field_index(name) < 0:
+                    bounds[name] = None
+                    continue
+                field_type = schema.field(name).type
+                if pa.types.is_temporal(field_type):
+                    storage = pa.int32() if field_type.bit_width == 32 else pa.int64()
+                    bounds[name] = tuple(pa.scalar(stats[stat], field_type).cast(storage).as_py()
+                                         for stat in ('min', 'max'))
+                else:
+                    bounds[name] = (float(stats['min']), float(stats['max']))
+        order = RowOrder(schema, sort_by=self.sort_by, cluster_by=self.cluster_by, bounds=bounds)
+        if self.cluster_by and not order.cluster_by:
+            logger.warning(f"Sources lack min/max statistics for {self.cluster_by} - sorting by them instead")
+        return order
+
+    def unified_schema(self, footers: List[bytes]) -> pa.Schema:
+        """
+        Work out from their footers the schema a set of sources is combined into
+
+        Raises:
+            ValueError: if some column's types can't be reconciled across the sources
+        """
+        schema = unify_schemas([footer_schema(tail) for tail in footers])
+        if not all(footer_schema(tail).equals(schema) for tail in footers):
+            logger.info(f"Sources differ in schema - casting them to the unified schema: "
+                        f"{schema.to_string(show_schema_metadata=False)}".replace('\n', ', '))
+        return schema
+
+    def fetch_footers(self, file_group: List[Tuple[str, int, str]]) -> List[bytes]:
+        """Fetch the footer of every file in the group with concurrent ranged GETs"""
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+            return list(pool.map(
+                lambda file_info: fetch_footer(self.s3_client, self.bucket_name, file_info[0]),
+                file_group
+            ))
+
+    def table_layout(self, table_name: str) -> dict:
+        """Row group and page options for a table: the defaults with its table_layouts overrides applied"""
+        layout = dict(self.layout)
+        layout.update(self.table_layouts.get(table_name, {}))
+        return layout
+
+    def row_group_sizing(self, file_group: List[Tuple[str, int, str]], footers: List[bytes],
+                         layout: dict) -> dict:
+        """
+        Resolve a layout's row group targets into RollingParquetWriter keyword arguments
+
+        A byte target starts out from the sources' compressed bytes per row; the writer
+        corrects it from the bytes it actually writes once the first row group is out.
+        """
+        sizing = {}
+        if layout.get('row_group_rows'):
+            sizing['row_group_rows'] = int(layout['row_group_rows'])
+        if layout.get('row_group_mb'):
+            sizing['row_group_bytes'] = int(layout['row_group_mb'] * 1024 * 1024)
+            rows = sum(pq.read_metadata(pa.BufferReader(tail)).num_rows for tail in footers)
+            if rows:
+                sizing['bytes_per_row'] = sum(size for _, size, _ in file_group) / rows
+        return sizing
+
+    def bloom_filter_options(self, specs: List[Tuple[str, float]], schema: pa.Schema, footers: List[bytes],
+                             sizing: dict) -> dict:
+        """
+        Resolve a layout's bloom filter specs into pq.ParquetWriter bloom_filter_options
+
+        Filters are sized for the rows of one output row group: the row group target
+        (estimated from bytes per row for a byte target), else PyArrow's largest row
+        group, and never more than the rows the group holds in all.
+
+        Raises:
+            ValueError: if a column isn't in the schema
+        """
+        missing = [column for column, _ in specs if schema.get_field_index(column) < 0]
+        if missing:
+            raise ValueError(f"Bloom filter columns {missing} are not in the schema")
+
+        rows_per_row_group = sizing.get('row_group_rows') or DEFAULT_ROW_GROUP_ROWS
+        if sizing.get('row_group_bytes') and sizing.get('bytes_per_row'):
+            rows_per_row_group = min(rows_per_row_group, sizing['row_group_bytes'] / sizing['bytes_per_row'])
+        rows = sum(pq.read_metadata(pa.BufferReader(tail)).num_rows for tail in footers)
+        return bloom_filter_options(specs, min(rows, rows_per_row_group))
+
+    def writer_options(self, footers: List[bytes], layout: dict = None) -> dict:
+        """
+        Resolve the compression, encoding and page options for a group's output
+
+        With compression 'auto' every column keeps the codec that holds most of its
+        bytes in the source footers, so re-encoding doesn't silently swap a compact
+        codec for a weaker default.
+
+        Returns:
+            Keyword arguments for pq.write_table / pq.ParquetWriter
+        """
+        column_paths = []
+        for tail in footers:
+            schema = pq.read_metadata(pa.BufferReader(tail)).schema
+            for i in range(len(schema)):
+                if schema.column(i).path not in column_paths:
+                    column_paths.append(schema.column(i).path)
+
+        options = resolve_compression(
+            column_paths,
+            detect_column_codecs(footers),
+            compression=self.compression,
+            column_overrides=self.column_compression,
+            compression_level=self.compression_level
+        )
+        options['use_dictionary'] = self.use_dictionary
+        if layout and layout.get('data_page_kb'):
+            options['data_page_size'] = int(layout['data_page_kb'] * 1024)
+        if layout and layout.get('page_index'):
+            options['write_page_index'] = True
+        logger.debug(f"Writer options: {options}")
+        return options
+
+    def keeps_source_encoding(self, footers: List[bytes]) -> bool:
+        """True if the configured writer options would reproduce the codecs the sources already use"""
+        if self.compression_level is not None or not self.use_dictionary:
+            return False
+        detected = detect_column_codecs(footers)
+        requested = self.writer_options(footers)['compression']
+        if isinstance(requested, str):
+            return all(codec == requested for codec in detected.values())
+        return requested == detected
+
+    def can_binary_merge(self, footers: List[bytes], schema: pa.Schema = None) -> bool:
+        """Check from the footers alone whether a group can be merged without decoding"""
+        if schema is not None and not footer_schema(footers[0]).equals(schema):
+            logger.info("Sources need casting to the unified schema - falling back to decoding")
+            return False
+        if not self.keeps_source_encoding(footers):
+            logger.info("Requested compression differs from the sources - falling back to decoding")
+            return False
+        if not can_concatenate(footers):
+            logger.info("Files differ in schema or compression, or have page indexes - falling back to decoding")
+            return False
+        return True
+
+    def binary_merge_parquet_files(self, file_group: List[Tuple[str, int, str]], output_key: str,
+                                   target_bytes: int = None, fingerprint: TableFingerprint = None) -> dict:
+        """
+        Combine files by copying their column chunks verbatim and rewriting only the footer
+
+        Pages are never decompressed or re-encoded, so the output keeps the codec,
+        encodings, row groups and statistics of its sources. Callers must check the
+        group with can_binary_merge() first. With target_bytes, a new output is started
+        before a source that would push the current one past the target.
+
+        Args:
+            file_group: List of (file_key, size, relative_path) tuples to combine
+            output_key: S3 key for the (first) combined output file
+            target_bytes: Size at which to start a new output; None writes a single output
+            fingerprint: If given, every source is decoded from memory and folded into it
+
+        Returns:
+            Dictionary with 'outputs' ({'key', 'size', 'rows'} per file written) and total 'rows'
+        """
+        logger.info(f"Binary merging {len(file_group)} parquet files into s3://{self.bucket_name}/{output_key}...")
+
+        outputs = []
+        current_key, sink, concatenator = None, None, None
+
+        def close_current():
+            rows = concatenator.close()
+            size = concatenator.position
+            output = {'key': self.name_output(current_key, sink, size), 'size': size, 'rows': rows}
+            if output_key in self.running_jobs:
+                self.record_output(output_key, output)
+            sink.close()
+            outputs.append(output)
+
+        try:
+            for s3_key, data in self.prefetch_sources(file_group):
+                if concatenator is not None and target_bytes and concatenator.position + len(data) > target_bytes:
+                    close_current()
+                    concatenator = None
+
+                if concatenator is None:
+                    current_key = self.job_output_key(output_key, len(outputs))
+                    sink = self.open_output(current_key)
+                    concatenator = ParquetConcatenator(sink)
+
+                concatenator.append(data)
+                if fingerprint is not None:
+                    fingerprint.update(pq.ParquetFile(pa.BufferReader(data)).iter_batches())
+            close_current()
+        except Exception:
+            touched = [output['key'] for output in outputs]
+            if concatenator is not None and not sink.closed:
+                sink.abort()
+                touched.append(sink.key)
+            self.delete_s3_files(touched)
+            raise
+
+        return {'outputs': outputs, 'rows': sum(output['rows'] for output in outputs)}
+
+    def stream_parquet_files(self, file_group: List[Tuple[str, int, str]], output_key: str,
+                             footers: List[bytes], target_bytes: int = None,
+                             fingerprint: TableFingerprint = None, schema: pa.Schema = None,
+                             order: RowOrder = None, write_options: dict = None, sizing: dict = None) -> dict:
+        """
+        Combine files row group by row group into ParquetWriters on S3
+
+        Only the prefetch window and one decoded row group are held in memory, however
+        large the group is. With an order, or with partition_by, the row groups are
+        sorted externally instead: up to sort_buffer_bytes of rows are held in memory,
+        with sorted runs spilled under spill_dir and merged back as the outputs are
+        written. Repartitioned rows are ordered by their partition columns first, so
+        each partition arrives in one run and fills its outputs before the next opens.
+
+        Args:
+            file_group: List of (file_key, size, relative_path) tuples to combine
+            output_key: S3 key for the (first) combined output file
+            footers: Source footers from fetch_footers()
+            target_bytes: Size at which to start a new output; None writes a single output
+            fingerprint: If given, every row group read is folded into it
+            schema: Schema every row group is cast to; None uses the first source's
+            order: RowOrder the rows are written in; None keeps the source order
+            write_options: Options from writer_options(); None resolves the defaults from the footers
+            sizing: Row group sizing from row_group_sizing(); None writes each source row group as it is
+
+        Returns:
+            Dictionary with 'outputs' ({'key', 'size', 'rows'} per file written) and total 'rows'
+        """
+        logger.info(f"Streaming {len(file_group)} parquet files into s3://{self.bucket_name}/{output_key}...")
+
+        def row_groups():
+            for s3_key, data in self.prefetch_sources(file_group):
+                parquet_file = pq.ParquetFile(pa.BufferReader(data))
+                for i in range(parquet_file.metadata.num_row_groups):
+                    row_group = conform(parquet_file.read_row_group(i), schema)
+                    if fingerprint is not None:
+                        fingerprint.update(row_group)
+                    yield row_group
+
+        if schema is None:
+            schema = footer_schema(footers[0])
+        if write_options is None:
+            write_options = self.writer_options(footers)
+        partitioner = Partitioner(self.partition_by, schema) if self.partition_by else None
+        if order is None and partitioner is None:
+            return self.write_outputs(schema, row_groups(), output_key, write_options, target_bytes, sizing)
+
+        sort_keys = (partitioner.sort_keys if partitioner else []) + (order.sort_keys if order else [])
+
+        def keyed(table):
+            table = order.keyed(table) if order else table
+            return partitioner.keyed(table) if partitioner else table
+
+        def strip(table):
+            table = partitioner.strip(table) if partitioner else table
+            return order.strip(table) if order else table
+
+        with ExternalSorter(sort_keys, self.sort_buffer_bytes, self.spill_dir) as sorter:
+            for row_group in row_groups():
+                sorter.add(keyed(row_group))
+            if sorter.runs:
+                logger.info(f"Merging {len(sorter.runs) + 1} sorted runs spilled to disk...")
+            return self.write_outputs(schema, (strip(table) for table in sorter.sorted()), output_key,
+                                      write_options, target_bytes, sizing)
+
+    def manifest_key(self, output_key: str) -> str:
+        """Key of the manifest recording the job whose first output is output_key"""
+        relative_key = output_key[len(self.prefix):]
+        return f"{self.prefix}{MANIFEST_DIR}/{relative_key[:-len('.parquet')]}.json"
+
+    def load_manifest(self, output_key: str) -> dict:
+        """Read a job's manifest; returns None if it has none"""
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=self.manifest_key(output_key))
+            return json.loads(response['Body'].read())
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+
+    def save_manifest(self, job: Tuple[str, list, str], status: str, result: dict = None, error: str = None):
+        """
+        Record the state of a job in its manifest
+
+        The manifest lists every input with its ETag, so a resumed run can tell whether
+        a completed group was built from the files it would combine now.
+        """
+        table_name, group, output_key = job
+        manifest = {
+            'table': table_name,
+            'output_key': output_key,
+            'status': status,
+            'inputs': [{'key': key, 'size': size, 'etag': self.inventory.etag(key)} for key, size, _ in group],
+            'outputs': result['outputs'] if result else [],
+            'rows': result['rows'] if result else None,
+            'fingerprints': result.get('fingerprints') if result else None,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+        if error:
+            manifest['error'] = error
+        self.write_manifest(output_key, manifest)
+
+    def write_manifest(self, output_key: str, manifest: dict):
+        """Store the manifest of the job whose first output is output_key"""
+        body = json.dumps(manifest, indent=2).encode('utf-8')
+        response = self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=self.manifest_key(output_key),
+            Body=body,
+            ContentType='application/json'
+        )
+        self.inventory.record(self.manifest_key(output_key), len(body), response.get('ETag'))
+
+    def load_all_manifests(self) -> List[dict]:
+        """Read every manifest under the prefix"""
+        manifest_keys = [key for key, _, _, _ in self.inventory.objects(f"{self.prefix}{MANIFEST_DIR}/")
+                         if key.endswith('.json')]
+
+        def load(manifest_key):
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=manifest_key)
+            return json.loads(response['Body'].read())
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+            return list(pool.map(load, manifest_keys))
+
+    def retire_outputs(self, output_keys: List[str], replaced_by: str):
+        """
+        Delete outputs that have been recombined into a newer output
+
+        The manifest of the job that wrote them keeps its inputs, so those stay recorded
+        as combined; once all of its outputs are gone it is marked superseded.
+        """
+        if not output_keys:
+            return
+        self.delete_s3_files(output_keys)
+
+        for output_key in output_keys:
+            owner = self.output_manifests.get(output_key)
+            manifest = self.load_manifest(owner) if owner else None
+            if manifest is None:
+                continue
+            manifest.setdefault('superseded_outputs', []).append({'key': output_key, 'replaced_by': replaced_by})
+            superseded = {entry['key'] for entry in manifest['superseded_outputs']}
+            if all(output['key'] in superseded for output in manifest['outputs']):
+                manifest['status'] = 'superseded'
+            manifest['updated_at'] = datetime.now(timezone.utc).isoformat()
+            self.write_manifest(owner, manifest)
+            logger.info(f"Retired {output_key} (recombined into {replaced_by})")
+
+    def select_new_files(self, tables: dict) -> dict:
+        """
+        Reduce a listing to the source files no earlier run has combined
+
+        A source counts as combined when a complete (or superseded) manifest lists it
+        with the same ETag; a file rewritten since then is combined again. Outputs that
+        a later job recombined but that are still present, because the run stopped before
+        deleting them, are retired first, and outputs left by a job that never completed
+        are deleted so their rows aren't combined twice. With top_up the last output of
+        every subdirectory with new files is added as an input when it is still under the
+        target size.
+
+        Returns:
+            Dictionary with table names as keys and the new (file_key, size, relative_path) tuples as values
+        """
+        manifests = self.load_all_manifests()
+        consumed = {}
+        recombined = {}  # Output key -> output_key of the job that recombined it
+        unfinished = []
+        for manifest in manifests:
+            if manifest['status'] not in ('complete', 'superseded'):
+                if manifest['status'] != 'discarded':
+                    unfinished.append(manifest)
+                continue
+            for output in manifest['outputs']:
+                self.output_manifests[output['key']] = manifest['output_key']
+            for source in manifest['inputs']:
+                consumed[source['key']] = source['etag']
+                if COMBINED_FILE_PATTERN.match(source['key'].rsplit('/', 1)[-1]):
+                    recombined[source['key']] = manifest['output_key']
+
+        for table_name, outputs in self.combined_outputs.items():
+            for key, _, _ in outputs:
+                if key in recombined:
+                    self.retire_outputs([key], recombined[key])
+            self.combined_outputs[table_name] = [output for output in outputs if output[0] not in recombined]
+
+        # An interrupted job leaves the outputs it closed behind, recorded in its in-progress manifest
+        for manifest in unfinished:
+            table_name, start = manifest['table'], manifest['output_key']
+            recorded = {output['key'] for output in manifest['outputs']}
+            leftovers = [key for key, _, _ in self.combined_outputs.get(table_name, [])
+                         if key in recorded and key not in self.output_manifests]
+            if leftovers:
+                logger.warning(f"Deleting {len(leftovers)} outputs left by unfinished job {start}")
+                self.delete_s3_files(leftovers)
+                self.combined_outputs[table_name] = [output for output in self.combined_outputs[table_name]
+                                                     if output[0] not in leftovers]
+            manifest['status'] = 'discarded'
+            manifest['updated_at'] = datetime.now(timezone.utc).isoformat()
+            self.write_manifest(start, manifest)
+
+        new_tables = {}
+        for table_name, files in tables.items():
+            new_files = [file_info for file_info in files
+                         if consumed.get(file_info[0]) != self.inventory.etag(file_info[0])]
+            logger.info(f"Table '{table_name}': {len(new_files)} new of {len(files)} parquet files")
+            if not new_files:
+                continue
+
+            if self.top_up:
+                for subdir_path in sorted({relative_path for _, _, relative_path in new_files}):
+                    existing = [output for output in self.combined_outputs.get(table_name, [])
+                                if output[2] == subdir_path]
+                    if not existing:
+                        continue
+                    last = max(existing, key=lambda output: self.output_index(output[0]))
+                    if last[1] < TARGET_SIZE_BYTES * ROLL_THRESHOLD:
+                        logger.info(f"Topping up {last[0]} ({last[1] / (1024 * 1024):.2f} MB) with new files")
+                        new_files.append(last)
+                        self.top_up_keys.add(last[0])
+
+            new_tables[table_name] = new_files
+
+        return new_tables
+
+    def output_index(self, output_key: str) -> int:
+        """Number of a combined output, e.g. 3 for combined_003_512MB.parquet"""
+        return int(re.match(r'combined_(\d+)_', output_key.rsplit('/', 1)[-1]).group(1))
+
+    def first_output_index(self, table_name: str, subdir_path: str) -> int:
+        """Number for the first new output of a subdirectory, after any outputs already there"""
+        if not self.incremental:
+            return 1
+        existing = [self.output_index(key) for key, _, relative_path in self.combined_outputs.get(table_name, [])
+                    if relative_path == subdir_path]
+        return max(existing, default=0) + 1
+
+    def pending_jobs(self, jobs: List[Tuple[str, list, str]]) -> List[Tuple[str, list, str]]:
+        """
+        Drop the jobs a previous run already completed from the same inputs
+
+        A job whose manifest is missing, not complete, or lists different inputs or ETags
+        is redone. The outputs its manifest records, from an interrupted attempt or from
+        a completed one whose inputs have changed, are deleted first: the redo names its
+        outputs afresh, so they would otherwise sit beside the new ones holding the same
+        rows. Outputs already recombined into a later job are left to that job.
+        """
+        def delete_recorded_outputs(manifest):
+            superseded = {entry['key'] for entry in manifest.get('superseded_outputs', [])}
+            self.delete_s3_files([output['key'] for output in manifest['outputs']
+                                  if output['key'] not in superseded and self.inventory.etag(output['key']) is not None])
+
+        def is_complete(job):
+            _, group, output_key = job
+            manifest = self.load_manifest(output_key)
+            if manifest is None:
+                return False
+            if manifest['status'] != 'complete':
+                logger.info(f"Redoing {output_key}: previous attempt is {manifest['status']}")
+                if manifest['status'] == 'in_progress':
+                    delete_recorded_outputs(manifest)
+                return False
+            recorded = [(source['key'], source['etag']) for source in manifest['inputs']]
+            if recorded != [(key, self.inventory.etag(key)) for key, _, _ in group]:
+                logger.warning(f"Redoing {output_key}: its inputs changed since it was combined")
+                delete_recorded_outputs(manifest)
+                return False
+            return True
+
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as pool:
+            completed = list(pool.map(is_complete, jobs))
+
+        pending = [job for job, done in zip(jobs, completed) if not done]
+        logger.info(f"Resuming: {len(jobs) - len(pending)} of {len(jobs)} groups already complete")
+        return pending
+
+    def split_rolling(self, files: List[Tuple[str, int, str]]) -> List[list]:
+        """
+        Split a subdirectory's files into contiguous runs for concurrent rolling jobs
+
+        Each worker gets a run of roughly equal size, but no run is cut smaller than the
+        target size or MIN_FILES_TO_COMBINE files, since every job closes one output that
+        is usually under the target.
+        """
+        total_bytes = sum(size for _, size, _ in files)
+        jobs = max(1, min(self.workers, math.ceil(total_bytes / TARGET_SIZE_BYTES),
+                          len(files) // MIN_FILES_TO_COMBINE))
+        runs, run, written = [], [], 0
+        for file_info in files:
+            run.append(file_info)
+            written += file_info[1]
+            if len(runs) < jobs - 1 and written >= total_bytes * (len(runs) + 1) / jobs:
+                runs.append(run)
+                run = []
+        if run:
+            runs.append(run)
+        return runs
+
+    def plan_table(self, table_name: str, files: List[Tuple[str, int, str]]) -> List[Tuple[str, list, str]]:
+        """
+        Plan the combine jobs for a single table, handling nested subdirectories
+
+        Returns:
+            List of (table_name, file_group, output_key) jobs
+        """
         logger.info(f"Processing table: {table_name} ({len(files)} files)")
 
         # Calculate total size
         total_size_mb = sum(size for _, size, _ in files) / (1024 * 1024)
         logger.info(f"Total size: {total_size_mb:.2f} MB")
 
+        if self.partition_by:
+            # One job streams the whole table into its partitions, so each partition's
+            # outputs fill up to the target size
+            if not files:
+                return []
+            index = 1
+            if self.incremental:
+                index = max((self.output_index(key) for key, _, _ in self.combined_outputs.get(table_name, [])),
+                            default=0) + 1
+            if self.schema_scope == 'table':
+                self.table_schemas[table_name] = self.unified_schema(self.fetch_footers(files))
+            output_key = f"{self.prefix}{table_name}/combined_{index:03d}_partitioned.parquet"
+            logger.info(f"Will repartition {len(files)} files of table {table_name} by "
+                        f"{[f'{column}:{transform}' for column, transform in self.partition_by]}")
+            return [(table_name, files, output_key)]
+
         # Group files for combining by subdirectory
-        groups_by_subdir = self.group_files_for_combining(files)
+        if self.rolling:
+            # A rolling writer splits each subdirectory into outputs by written size
+            groups_by_subdir = defaultdict(list)
+            for file_info in files:
+                groups_by_subdir[file_info[2]].append(file_info)
+            groups_by_subdir = {subdir_path: self.split_rolling(group) for subdir_path, group in groups_by_subdir.items()
+                                if len(group) >= MIN_FILES_TO_COMBINE}
+        else:
+            groups_by_subdir = self.group_files_for_combining(files)
 
         if not groups_by_subdir:
             logger.info(f"No files need combining for table {table_name}")
-            return
+            return []
+
+        if self.schema_scope == 'table':
+            table_files = [file_info for groups in groups_by_subdir.values() for group in groups for file_info in group]
+            self.table_schemas[table_name] = self.unified_schema(self.fetch_footers(table_files))
 
         total_combined_files = sum(len(groups) for groups in groups_by_subdir.values())
         logger.info(f"Will create {total_combined_files} combined files across {len(groups_by_subdir)} subdirectories for table {table_name}")
 
-        # Process each subdirectory
+        jobs = []
         for subdir_path, groups in groups_by_subdir.items():
             subdir_display = f"/{subdir_path}" if subdir_path else " (root)"
             logger.info(f"Processing subdirectory{subdir_display}: {len(groups)} combined files")
+            first_index = self.first_output_index(table_name, subdir_path)
 
-            # Process each group within the subdirectory
             for i, group in enumerate(groups):
                 if len(group) == 1:
                     logger.info(f"Skipping single file: {group[0][0]}")
                     continue
 
-                # Generate output filename with subdirectory structure preserved
+                # Generate output filename with subdirectory structure preserved; a rolling
+                # job numbers its outputs as it writes them, so its key only names the job
                 group_size_mb = sum(size for _, size, _ in group) / (1024 * 1024)
+                label = 'rolling' if self.rolling else f"{group_size_mb:.0f}MB"
 
                 # Create output path maintaining subdirectory structure
                 if subdir_path:
-                    output_key = f"{self.prefix}{table_name}/{subdir_path}/combined_{i+1:03d}_{group_size_mb:.0f}MB.parquet"
+                    output_key = f"{self.prefix}{table_name}/{subdir_path}/combined_{first_index+i:03d}_{label}.parquet"
                 else:
-                    output_key = f"{self.prefix}{table_name}/combined_{i+1:03d}_{group_size_mb:.0f}MB.parquet"
+                    output_key = f"{self.prefix}{table_name}/combined_{first_index+i:03d}_{label}.parquet"
+
+                jobs.append((table_name, group, output_key))
+
+        return jobs
+
+    def run_job(self, job: Tuple[str, list, str]) -> bool:
+        """Combine a single planned group; returns True on success"""
+        table_name, group, output_key = job
+        group_size_mb = sum(size for _, size, _ in group) / (1024 * 1024)
+        logger.info(f"Combining {len(group)} files ({group_size_mb:.2f} MB) -> {output_key}")
+        try:
+            self.save_manifest(job, 'in_progress')
+            self.running_jobs[output_key] = (job, [])
+            result = self.combine_parquet_files(group, output_key, self.table_schemas.get(table_name),
+                                                self.table_layout(table_name))
+            self.save_manifest(job, 'complete', result)
+            self.retire_outputs([key for key, _, _ in group if key in self.top_up_keys], output_key)
+            return True
+        except Exception as e:
+            logger.error(f"Error processing group {output_key} of table {table_name}: {e}")
+            try:
+                self.save_manifest(job, 'failed', error=str(e))
+            except ClientError as manifest_error:
+                logger.error(f"Could not record failure of {output_key}: {manifest_error}")
+            return False
+        finally:
+            self.running_jobs.pop(output_key, None)
+
+    def execute_jobs(self, jobs: List[Tuple[str, list, str]]) -> int:
+        """
+        Run planned combine jobs, concurrently when more than one worker is configured
 
-                logger.info(f"Combining {len(group)} files ({group_size_mb:.2f} MB) -> {output_key}")
-                self.combine_parquet_files(group, output_key)
+        Jobs are scheduled in order onto a bounded thread pool. Before a job is handed to
+        the pool its source size (or just its prefetch window, when streaming) is reserved
+        against max_inflight_bytes, so the groups held in memory at any moment never add
+        up to more than that budget.
+
+        Returns:
+            Number of jobs that failed
+        """
+        if self.workers == 1:
+            return sum(1 for job in jobs if not self.run_job(job))
+
+        # Streamed groups only ever hold their prefetch window (and sort buffer), not the whole group
+        streamed = self.streaming or self.rolling or bool(self.partition_by)
+        sorted_groups = self.sort_by or self.cluster_by or self.partition_by
+        window = self.fetch_budget_bytes + (self.sort_buffer_bytes if sorted_groups else 0)
+
+        budget = ByteBudget(self.max_inflight_bytes)
+        failures = []
+
+        def run_and_release(job, reserved):
+            try:
+                if not self.run_job(job):
+                    failures.append(job)
+            finally:
+                budget.release(reserved)
+
+        logger.info(f"Combining {len(jobs)} groups with {self.workers} workers "
+                    f"(max {self.max_inflight_bytes / (1024 * 1024):.0f} MB in flight)")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for job in jobs:
+                group_size = sum(size for _, size, _ in job[1])
+                reserved = budget.acquire(min(group_size, window) if streamed else group_size)
+                pool.submit(run_and_release, job, reserved)
+
+        return len(failures)
 
     def run(self):
         """Main execution method"""
@@ -352,6 +1676,15 @@ class S3ParquetCombiner:
         logger.info(f"Configuration:")
         logger.info(f"  Target file size: {TARGET_SIZE_MB} MB")
         logger.info(f"  Minimum files to combine: {MIN_FILES_TO_COMBINE}")
+        logger.info(f"  Workers: {self.workers}")
+        logger.info(f"  Packing: {self.packing}")
+        logger.info(f"  Resume: {self.resume}")
+        logger.info(f"  Incremental: {self.incremental} (top up: {self.top_up})")
+        logger.info(f"  Verify: {self.verify}")
+        logger.info(f"  Schema scope: {self.schema_scope}")
+        logger.info(f"  Row order: sort by {self.sort_by}, cluster by {self.cluster_by}")
+        logger.info(f"  Layout: {self.layout} ({len(self.table_layouts)} table overrides)")
+        logger.info(f"  Partition by: {self.partition_by} (max {self.max_open_partitions} open)")
 
         # Test S3 connection and s3fs setup
         try:
@@ -391,14 +1724,37 @@ class S3ParquetCombiner:
 
         logger.info(f"Found {len(tables)} tables to process")
 
-        # Process each table
+        try:
+            self.combine_tables(tables)
+        finally:
+            # Keep the saved listing in step with what this run wrote and deleted
+            if self.listing_cache:
+                self.inventory.save()
+
+    def combine_tables(self, tables: dict):
+        """Plan and combine the listed tables"""
+        if self.incremental:
+            tables = self.select_new_files(tables)
+            if not tables:
+                logger.info("No new files since the last run")
+                return
+
+        # Plan every table up front so groups from all tables share one worker pool
+        jobs = []
         for table_name, files in tables.items():
             try:
-                self.process_table(table_name, files)
+                jobs.extend(self.plan_table(table_name, files))
             except Exception as e:
                 logger.error(f"Error processing table {table_name}: {e}")
                 continue
 
+        if self.resume:
+            jobs = self.pending_jobs(jobs)
+
+        failed = self.execute_jobs(jobs)
+        if failed:
+            logger.error(f"{failed} of {len(jobs)} groups failed to combine")
+
         logger.info("Parquet file combination completed")
 
 
@@ -408,17 +1764,187 @@ def main():
     parser = argparse.ArgumentParser(description='Combine small Parquet files in S3 into larger files')
     parser.add_argument('--bucket', required=True, help='S3 bucket name')
     parser.add_argument('--prefix', required=True, help='Source data prefix (do not pass a leading /)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='Number of groups to combine concurrently across all tables')
+    parser.add_argument('--max-inflight-mb', type=int, default=DEFAULT_MAX_INFLIGHT_MB,
+                        help='Maximum total source size (MB) of groups being combined at once')
+    parser.add_argument('--fetch-workers', type=int, default=DEFAULT_FETCH_WORKERS,
+                        help='Number of source files fetched concurrently within a group')
+    parser.add_argument('--fetch-budget-mb', type=int, default=DEFAULT_FETCH_BUDGET_MB,
+                        help='Maximum size (MB) of source files fetched ahead of the reader within a group')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Write each group row group by row group instead of concatenating it in memory')
+    parser.add_argument('--binary-merge', action='store_true',
+                        help='Copy column chunks verbatim when all files in a group share schema and compression '
+                             '(falls back to decoding otherwise)')
+    parser.add_argument('--packing', choices=list(PACKING_STRATEGIES), default=DEFAULT_PACKING,
+                        help='How files are packed into groups: sequential (smallest first, one pass), '
+                             'ffd (first-fit decreasing) or balanced (fewest groups with even sizes)')
+    parser.add_argument('--rolling', action='store_true',
+                        help='Stream each subdirectory into outputs that are closed once they reach the target '
+                             'size in written bytes, with up to --workers jobs per subdirectory (implies --streaming)')
+    parser.add_argument('--part-size-mb', type=int, default=DEFAULT_PART_SIZE_MB,
+                        help='Size (MB) of each multipart upload part of an output (minimum 5)')
+    parser.add_argument('--upload-concurrency', type=int, default=DEFAULT_UPLOAD_CONCURRENCY,
+                        help='Number of parts of one output uploaded concurrently while it is being written')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip groups whose manifest shows they were already combined from the same inputs '
+                             'and redo the rest')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only combine files that no earlier run has combined (tracked by key and ETag in '
+                             'the manifests)')
+    parser.add_argument('--top-up', action='store_true',
+                        help='With --incremental, recombine the last under-target output of each subdirectory '
+                             'together with the new files')
+    parser.add_argument('--verify', action='store_true',
+                        help='Fingerprint the sources while combining and check each output against them, '
+                             'reading back only the outputs')
+    parser.add_argument('--listing-cache', default=None, metavar='PATH',
+                        help='Local file the S3 listing is saved to and reused from by later runs '
+                             '(the verifier accepts the same file)')
+    parser.add_argument('--listing-cache-max-age', type=float, default=DEFAULT_CACHE_MAX_AGE, metavar='SECONDS',
+                        help='Age after which a saved listing is refreshed (0 always lists again)')
+    parser.add_argument('--list-workers', type=int, default=DEFAULT_LIST_WORKERS,
+                        help='List the table prefixes concurrently with this many workers after discovering them '
+                             'with a delimiter (1 walks the whole prefix sequentially)')
+    parser.add_argument('--inventory-report', default=None, metavar='S3_URI',
+                        help='manifest.json of an S3 Inventory report (CSV or Parquet) to seed the listing from '
+                             'instead of listing the prefix')
+    parser.add_argument('--schema-scope', choices=SCHEMA_SCOPES, default=DEFAULT_SCHEMA_SCOPE,
+                        help="Unify differing source schemas over each group, or over the whole table so every "
+                             "output of a table shares one schema")
+    parser.add_argument('--sort-by', default=None, metavar='COLUMNS',
+                        help='Comma-separated columns to sort the rows of each output by, e.g. --sort-by id')
+    parser.add_argument('--cluster-by', default=None, metavar='COLUMNS',
+                        help='Comma-separated numeric or timestamp columns to cluster rows by on a Z-order curve, '
+                             'so filters on any of them can skip row groups, e.g. --cluster-by course_id,created_at')
+    parser.add_argument('--sort-buffer-mb', type=int, default=DEFAULT_SORT_BUFFER_MB,
+                        help='Rows (MB decoded) sorted in memory per streamed group before spilling a run to disk')
+    parser.add_argument('--spill-dir', default=None, metavar='PATH',
+                        help='Directory sorted runs are spilled under (default: the system temp dir)')
+    parser.add_argument('--partition-by', default=None, metavar='SPECS',
+                        help='Repartition each table into Hive-style col=value/ directories while combining; '
+                             'comma-separated COLUMN or COLUMN:year|month|day, e.g. --partition-by created_at:year,course_id')
+    parser.add_argument('--max-open-partitions', type=int, default=DEFAULT_MAX_OPEN_PARTITIONS,
+                        help='Most partitions with an output open at once per job when repartitioning')
+    parser.add_argument('--row-group-mb', type=float, default=None,
+                        help='Target written size (MB) of each output row group (default: one per source row group)')
+    parser.add_argument('--row-group-rows', type=int, default=None,
+                        help='Target rows per output row group (the smaller wins with --row-group-mb)')
+    parser.add_argument('--data-page-kb', type=int, default=None,
+                        help='Target size (KB) of each data page (default: the Parquet writer default, 1024)')
+    parser.add_argument('--page-index', action='store_true',
+                        help='Write column and offset indexes so readers can skip data pages')
+    parser.add_argument('--bloom-filters', default=None, metavar='SPECS',
+                        help='Write bloom filters for point lookups on these columns: comma-separated COLUMN '
+                             'or COLUMN:FPP (false-positive probability, default '
+                             f'{DEFAULT_BLOOM_FILTER_FPP}), e.g. --bloom-filters id,user_id:0.01')
+    parser.add_argument('--table-layout', default=None, metavar='PATH',
+                        help='JSON file of per-table overrides of the options above, e.g. '
+                             '{"public.tasks_tasks": {"row_group_mb": 64, "page_index": true, "bloom_filters": ["id"]}}')
+    parser.add_argument('--compression', choices=COMPRESSION_CHOICES, default='auto',
+                        help="Output codec; 'auto' keeps the codec each column has in the source files")
+    parser.add_argument('--compression-level', type=int, default=None,
+                        help='Compression level for codecs that support one (zstd, gzip, brotli)')
+    parser.add_argument('--no-dictionary', action='store_true', help='Disable dictionary encoding in outputs')
+    parser.add_argument('--column-compression', action='append', default=[], metavar='COLUMN=CODEC',
+                        help='Codec override for one column (repeatable), e.g. --column-compression payload=zstd')
 
     args = parser.parse_args()
 
+    if args.top_up and not args.incremental:
+        parser.error("--top-up requires --incremental")
+    if args.sort_by and args.cluster_by:
+        parser.error("--sort-by and --cluster-by are mutually exclusive")
+    if args.partition_by and args.top_up:
+        parser.error("--top-up can't be combined with --partition-by")
+    partition_by = [spec.strip() for spec in args.partition_by.split(',') if spec.strip()] if args.partition_by else None
+    for spec in partition_by or []:
+        try:
+            parse_partition_spec(spec)
+        except ValueError as e:
+            parser.error(str(e))
+    bloom_filters = [spec.strip() for spec in args.bloom_filters.split(',') if spec.strip()] if args.bloom_filters else []
+    for spec in bloom_filters:
+        try:
+            parse_bloom_filter_spec(spec)
+        except ValueError as e:
+            parser.error(str(e))
+    table_layouts = None
+    if args.table_layout:
+        try:
+            with open(args.table_layout) as f:
+                table_layouts = json.load(f)
+        except (OSError, ValueError) as e:
+            parser.error(f"--table-layout: {e}")
+        for table_name, overrides in table_layouts.items():
+            if not isinstance(overrides, dict) or set(overrides) - set(LAYOUT_OPTIONS):
+                parser.error(f"--table-layout: options for {table_name} must be an object with keys from "
+                             f"{list(LAYOUT_OPTIONS)}")
+            if not isinstance(overrides.get('bloom_filters', []), list):
+                parser.error(f"--table-layout: bloom_filters for {table_name} must be a list of specs")
+            for spec in overrides.get('bloom_filters', []):
+                try:
+                    parse_bloom_filter_spec(spec)
+                except ValueError as e:
+                    parser.error(f"--table-layout: {e}")
+
+    sort_by = [column.strip() for column in args.sort_by.split(',') if column.strip()] if args.sort_by else None
+    cluster_by = [column.strip() for column in args.cluster_by.split(',') if column.strip()] if args.cluster_by else None
+
+    column_compression = {}
+    for override in args.column_compression:
+        column, _, codec = override.partition('=')
+        if not column or codec not in COMPRESSION_CHOICES[1:]:
+            parser.error(f"--column-compression expects COLUMN=CODEC with CODEC one of {COMPRESSION_CHOICES[1:]}")
+        column_compression[column] = codec
+
     logger.info(f"Configuration:")
     logger.info(f"  Bucket: {args.bucket}")
     logger.info(f"  Prefix: {args.prefix}")
     logger.info(f"  Target file size: {TARGET_SIZE_MB} MB")
     logger.info(f"  Minimum files to combine: {MIN_FILES_TO_COMBINE}")
+    logger.info(f"  Workers: {args.workers}")
+    logger.info(f"  Max in-flight: {args.max_inflight_mb} MB")
+    logger.info(f"  Fetch workers: {args.fetch_workers} (budget {args.fetch_budget_mb} MB)")
+    logger.info(f"  Streaming: {args.streaming}")
+    logger.info(f"  Binary merge: {args.binary_merge}")
+    logger.info(f"  Packing: {args.packing}")
+    logger.info(f"  Rolling outputs: {args.rolling}")
+    logger.info(f"  Resume: {args.resume}")
+    logger.info(f"  Incremental: {args.incremental} (top up: {args.top_up})")
+    logger.info(f"  Verify: {args.verify}")
+    logger.info(f"  Schema scope: {args.schema_scope}")
+    logger.info(f"  Layout: row groups {args.row_group_mb} MB / {args.row_group_rows} rows, "
+                f"pages {args.data_page_kb} KB, page index {args.page_index}, bloom filters {bloom_filters} "
+                f"(overrides for {sorted(table_layouts or {})})")
+    logger.info(f"  Partition by: {partition_by} (max {args.max_open_partitions} open)")
+    logger.info(f"  Row order: sort by {sort_by}, cluster by {cluster_by} "
+                f"(buffer {args.sort_buffer_mb} MB, spill dir {args.spill_dir})")
+    logger.info(f"  Upload: {args.part_size_mb} MB parts, {args.upload_concurrency} concurrent")
+    logger.info(f"  Listing: {args.inventory_report or f'list prefix with {args.list_workers} workers'} "
+                f"(cache {args.listing_cache}, max age {args.listing_cache_max_age:.0f}s)")
+    logger.info(f"  Compression: {args.compression} (level {args.compression_level}, "
+                f"dictionary {not args.no_dictionary}, overrides {column_compression})")
 
     # Initialize and run combiner
-    combiner = S3ParquetCombiner(args.bucket, args.prefix)
+    combiner = S3ParquetCombiner(args.bucket, args.prefix, workers=args.workers,
+                                 max_inflight_mb=args.max_inflight_mb, fetch_workers=args.fetch_workers,
+                                 fetch_budget_mb=args.fetch_budget_mb, streaming=args.streaming,
+                                 binary_merge=args.binary_merge, compression=args.compression,
+                                 compression_level=args.compression_level, use_dictionary=not args.no_dictionary,
+                                 column_compression=column_compression, rolling=args.rolling,
+                                 packing=args.packing, part_size_mb=args.part_size_mb,
+                                 upload_concurrency=args.upload_concurrency, resume=args.resume,
+                                 incremental=args.incremental, top_up=args.top_up, verify=args.verify,
+                                 listing_cache=args.listing_cache, listing_cache_max_age=args.listing_cache_max_age,
+                                 inventory_report=args.inventory_report, list_workers=args.list_workers,
+                                 schema_scope=args.schema_scope, sort_by=sort_by, cluster_by=cluster_by,
+                                 sort_buffer_mb=args.sort_buffer_mb, spill_dir=args.spill_dir,
+                                 row_group_mb=args.row_group_mb, row_group_rows=args.row_group_rows,
+                                 data_page_kb=args.data_page_kb, page_index=args.page_index,
+                                 bloom_filters=bloom_filters, table_layouts=table_layouts,
+                                 partition_by=partition_by, max_open_partitions=args.max_open_partitions)
     combiner.run()
 
 
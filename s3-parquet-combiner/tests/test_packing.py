@@ -0,0 +1,41 @@
+import random
+from collections import Counter
+
+import pytest
+
+from s3_parquet_no_download_combiner import PACKING_STRATEGIES, pack_first_fit_decreasing, pack_sequential
+
+TARGET = 512
+
+
+def random_files(seed: int, count: int = 200):
+    """Mostly small files with a long tail, a few at or above the target"""
+    rng = random.Random(seed)
+    sizes = [min(int(rng.paretovariate(1.2) * 8), TARGET * 2) for _ in range(count)]
+    sizes += [TARGET, TARGET + 100]
+    return [(f'part{i:04d}.parquet', size, '') for i, size in enumerate(sizes)]
+
+
+@pytest.mark.parametrize('strategy', sorted(PACKING_STRATEGIES))
+@pytest.mark.parametrize('seed', range(20))
+def test_every_file_is_placed_once_and_groups_fit(strategy, seed):
+    files = random_files(seed)
+    groups = PACKING_STRATEGIES[strategy](files, TARGET)
+
+    assert Counter(file_info for group in groups for file_info in group) == Counter(files)
+    for group in groups:
+        assert group
+        assert sum(size for _, size, _ in group) <= TARGET or len(group) == 1
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_ffd_needs_no_more_groups_than_sequential(seed):
+    files = random_files(seed)
+    assert len(pack_first_fit_decreasing(files, TARGET)) <= len(pack_sequential(files, TARGET))
+
+
+def test_ffd_fills_gaps_left_by_large_files():
+    files = [(f'part{i}.parquet', size, '') for i, size in enumerate([300, 300, 200, 200])]
+    assert len(pack_sequential(files, 500)) == 3
+    assert sorted(sorted(size for _, size, _ in group) for group in pack_first_fit_decreasing(files, 500)) == \
+        [[200, 300], [200, 300]]
@@ -0,0 +1,111 @@
+import io
+from datetime import date, datetime, timezone
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from parquet_bloom import (bloom_filter_contains, candidate_row_groups, lookup, parse_bloom_filter_spec, plain_bytes,
+                           read_bloom_filter, xxhash64)
+
+
+@pytest.mark.parametrize('data, seed, expected', [
+    (b'', 0, 0xEF46DB3751D8E999),
+    (b'a', 0, 0xD24EC4F1A98C6E5B),
+    (b'abc', 0, 0x44BC2CF5AD770999),
+    (b'xxhash', 20141025, 0xB559B98D844E0635),
+    (b'Nobody inspects the spammish repetition', 0, 0xFBCEA83C8A378BF1),  # Takes the 32-byte stripe path
+])
+def test_xxhash64_reference_values(data, seed, expected):
+    assert xxhash64(data, seed) == expected
+
+
+def filtered_file(table: pa.Table, columns, fpp: float = 0.01) -> io.BytesIO:
+    """Table written by PyArrow with a bloom filter on each column"""
+    sink = io.BytesIO()
+    options = {column: {'ndv': table.num_rows, 'fpp': fpp} for column in columns}
+    pq.write_table(table, sink, row_group_size=table.num_rows, bloom_filter_options=options)
+    sink.seek(0)
+    return sink
+
+
+@pytest.mark.parametrize('column, values, absent', [
+    ('id', np.arange(0, 20000, 2, dtype=np.int64), np.arange(1, 20000, 2, dtype=np.int64)),
+    ('day', np.arange(0, 5000, 2, dtype=np.int32), np.arange(1, 5000, 2, dtype=np.int32)),
+    ('score', np.arange(0, 2000, 2) / 8, np.arange(1, 2000, 2) / 8),
+    ('key', [f'key-{i:05d}-{"x" * (i % 50)}' for i in range(0, 4000, 2)],
+     [f'key-{i:05d}-{"x" * (i % 50)}' for i in range(1, 4000, 2)]),
+])
+def test_probes_agree_with_filters_written_by_pyarrow(column, values, absent):
+    f = filtered_file(pa.table({column: values}), [column])
+    chunk = pq.read_metadata(f).row_group(0).column(0)
+    data = read_bloom_filter(f, chunk)
+    physical_type = chunk.physical_type
+
+    def contains(value):
+        return bloom_filter_contains(data, xxhash64(plain_bytes(value, physical_type)))
+
+    assert all(contains(value) for value in pa.array(values).to_pylist())  # A filter never rules out a value it holds
+    false_positives = sum(contains(value) for value in pa.array(absent).to_pylist())
+    assert false_positives <= 0.05 * len(absent)
+
+
+def test_lookup_skips_row_groups_ruled_out_by_their_filters():
+    # Unordered ids, so min/max statistics keep every row group and only the filters can prune
+    ids = np.random.default_rng(0).permutation(40000)[:20000].astype(np.int64)
+    sink = io.BytesIO()
+    pq.write_table(pa.table({'id': ids, 'value': ids * 2}), sink, row_group_size=2000,
+                   bloom_filter_options={'id': {'ndv': 2000, 'fpp': 0.01}})
+    sink.seek(0)
+    metadata = pq.read_metadata(sink)
+
+    present = int(ids[12345])
+    assert candidate_row_groups(sink, metadata, 'id', present) == [12345 // 2000]
+    assert lookup(sink, 'id', present).column('value').to_pylist() == [present * 2]
+    assert len(candidate_row_groups(sink, metadata, 'id', present, use_bloom_filters=False)) > 1
+
+    missing = next(value for value in range(40000) if value not in set(ids.tolist()))
+    assert lookup(sink, 'id', missing).num_rows == 0
+
+
+@pytest.mark.parametrize('column_type, stored, key', [
+    (pa.timestamp('ms'), 2000, datetime(1970, 1, 1, 0, 0, 2)),
+    (pa.timestamp('us', tz='UTC'), 7, datetime(1970, 1, 1, 0, 0, 0, 7, tzinfo=timezone.utc)),
+    (pa.date32(), 4000, date(1980, 12, 14)),
+    (pa.date64(), 12, date(1970, 1, 13)),
+])
+def test_lookup_takes_temporal_keys_as_stored_counts_or_python_values(column_type, stored, key):
+    counts = np.random.default_rng(0).permutation(10000)
+    counts = counts[counts != stored][:5000]
+    counts[1234] = stored
+    if column_type == pa.date32():
+        values = counts.astype(np.int32)
+    else:
+        values = counts * 86400000 if column_type == pa.date64() else counts
+    sink = io.BytesIO()
+    pq.write_table(pa.table({'at': pa.array(values, column_type), 'row': np.arange(5000)}), sink,
+                   row_group_size=500, bloom_filter_options={'at': {'ndv': 500, 'fpp': 0.01}})
+    sink.seek(0)
+    metadata = pq.read_metadata(sink)
+
+    assert candidate_row_groups(sink, metadata, 'at', stored) == candidate_row_groups(sink, metadata, 'at', key)
+    assert 1234 // 500 in candidate_row_groups(sink, metadata, 'at', key)
+    assert lookup(sink, 'at', stored).column('row').to_pylist() == [1234]
+    assert lookup(sink, 'at', key).column('row').to_pylist() == [1234]
+    # Statistics compare the stored counts too: a key past every row group's max keeps none
+    assert candidate_row_groups(sink, metadata, 'at', 20000, use_bloom_filters=False) == []
+
+
+def test_truncated_filter_rules_nothing_out():
+    f = filtered_file(pa.table({'id': np.arange(100, dtype=np.int64)}), ['id'])
+    data = read_bloom_filter(f, pq.read_metadata(f).row_group(0).column(0))
+    assert bloom_filter_contains(data[:len(data) // 2], xxhash64(plain_bytes(-1, 'INT64')))
+
+
+def test_parse_bloom_filter_spec():
+    assert parse_bloom_filter_spec('id') == ('id', 0.05)
+    assert parse_bloom_filter_spec('id:0.01') == ('id', 0.01)
+    for spec in ('id:1', 'id:x', ':0.1'):
+        with pytest.raises(ValueError):
+            parse_bloom_filter_spec(spec)
@@ -0,0 +1,72 @@
+import numpy as np
+import pyarrow as pa
+
+from parquet_fingerprint import TableFingerprint, row_buckets, row_hashes
+
+
+def sample_table(rows: int = 5000, seed: int = 0) -> pa.Table:
+    rng = np.random.default_rng(seed)
+    return pa.table({
+        'id': np.arange(rows),
+        'score': rng.random(rows),
+        'name': pa.array([None if i % 97 == 0 else f'name-{i % 311}' for i in range(rows)]),
+        'tags': pa.array([[f't{j}' for j in range(i % 4)] for i in range(rows)]),
+        'created': pa.array(rng.integers(0, 10 ** 12, rows), pa.timestamp('ms')),
+    })
+
+
+def test_fingerprint_ignores_row_order_and_batching():
+    table = sample_table()
+    shuffled = table.take(np.random.default_rng(1).permutation(table.num_rows))
+
+    whole = TableFingerprint().update(table)
+    in_batches = TableFingerprint().update(shuffled.to_batches(max_chunksize=333))
+    merged = TableFingerprint().update(shuffled.slice(0, 1234)).merge(TableFingerprint().update(shuffled.slice(1234)))
+
+    assert whole == in_batches == merged
+    assert whole.num_rows == table.num_rows
+
+
+def test_fingerprint_sees_changed_dropped_and_duplicated_rows():
+    table = sample_table()
+    reference = TableFingerprint().update(table)
+
+    changed = table.set_column(1, 'score', pa.array(np.r_[table.column('score').to_numpy()[:-1], 2.0]))
+    assert TableFingerprint().update(changed) != reference
+    assert TableFingerprint().update(table.slice(1)) != reference
+
+    # Same row count, but one row twice and another missing
+    duplicated = pa.concat_tables([table.slice(0, table.num_rows - 1), table.slice(0, 1)])
+    assert TableFingerprint().update(duplicated) != reference
+
+
+def test_fingerprint_hashes_logical_values():
+    narrow = pa.table({'id': pa.array([1, 2, 3], pa.int16()), 'name': pa.array(['a', 'b', 'a'])})
+    wide = pa.table({'id': pa.array([3, 1, 2], pa.int64()),
+                     'name': pa.array(['a', 'a', 'b']).dictionary_encode().cast(pa.dictionary(pa.int32(), pa.large_string()))})
+    assert TableFingerprint().update(narrow) == TableFingerprint().update(wide.take([1, 2, 0]))
+
+    floats = pa.table({'x': pa.array([0.0, float('nan')])})
+    other_zero = pa.table({'x': pa.array([-0.0, float('nan')])})
+    assert TableFingerprint().update(floats) == TableFingerprint().update(other_zero)
+
+
+def test_differing_buckets_point_at_the_changed_rows():
+    table = sample_table()
+    changed_rows = [10, 2500, 4999]
+    scores = table.column('score').to_numpy().copy()
+    scores[changed_rows] += 1
+    changed = table.set_column(1, 'score', pa.array(scores))
+
+    expected = TableFingerprint(bucketed=True).update(table)
+    actual = TableFingerprint(bucketed=True).update(changed)
+    assert expected.differing_buckets(expected).size == 0
+
+    hashes = np.concatenate([row_hashes(batch) for batch in table.to_batches()])
+    changed_hashes = np.concatenate([row_hashes(batch) for batch in changed.to_batches()])
+    buckets = set(row_buckets(hashes[changed_rows])) | set(row_buckets(changed_hashes[changed_rows]))
+    assert set(actual.differing_buckets(expected)) == buckets
+
+    # Bucket sums add up to the plain fingerprint
+    assert actual.bucket_rows.sum() == actual.num_rows
+    assert [int(lane.sum(dtype=np.uint64)) for lane in actual.bucket_sums] == actual.sums
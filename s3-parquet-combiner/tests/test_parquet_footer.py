@@ -0,0 +1,94 @@
+import io
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from parquet_footer import (
+    CT_BINARY, CT_BOOLEAN_FALSE, CT_BOOLEAN_TRUE, CT_BYTE, CT_DOUBLE, CT_I16, CT_I32, CT_I64, CT_LIST, CT_MAP, CT_STRUCT,
+    ParquetConcatenator, ThriftCompactReader, ThriftCompactWriter, can_concatenate, decode_file_metadata,
+    encode_file_metadata, footer_length,
+)
+
+
+def parquet_bytes(table: pa.Table, **options) -> bytes:
+    sink = io.BytesIO()
+    pq.write_table(table, sink, **options)
+    return sink.getvalue()
+
+
+def wide_table(offset: int, rows: int = 1000) -> pa.Table:
+    """Ten columns, so list headers in the footer have the high bit set, and a timestamp logical type"""
+    columns = {f'c{i}': np.arange(offset, offset + rows, dtype=np.int64) * (i + 1) for i in range(8)}
+    columns['name'] = [f'row-{offset + i}' for i in range(rows)]
+    columns['created'] = pa.array(np.arange(offset, offset + rows) * 1_000_000, pa.timestamp('us'))
+    return pa.table(columns)
+
+
+def test_thrift_round_trip():
+    struct_value = [
+        [1, CT_I32, -7],
+        [2, CT_I64, 2 ** 40],
+        [3, CT_BOOLEAN_FALSE, False],
+        [4, CT_BINARY, b'\x80\xff payload'],
+        [5, CT_DOUBLE, 1.5],
+        [6, CT_BYTE, 0xF3],
+        [7, CT_LIST, (CT_I16, list(range(-10, 20)))],
+        [9, CT_LIST, (CT_BOOLEAN_TRUE, [True, False, True])],
+        [40, CT_STRUCT, [[1, CT_I32, 300], [2, CT_LIST, (CT_STRUCT, [[[1, CT_I64, -1]]] * 16)]]],
+        [41, CT_MAP, (CT_BINARY, CT_I32, [(b'a', 1), (b'b', -2)])],
+    ]
+    writer = ThriftCompactWriter()
+    writer.write_struct(struct_value)
+    encoded = bytes(writer.out)
+
+    for data in (encoded, bytearray(encoded), memoryview(encoded), pa.py_buffer(encoded)):
+        reader = ThriftCompactReader(data)
+        assert reader.read_struct() == struct_value
+        assert reader.pos == len(encoded)
+
+
+def test_footer_round_trip_from_buffer():
+    data = parquet_bytes(wide_table(0))
+    length = footer_length(data)
+    for source in (data, pa.py_buffer(data)):
+        metadata = decode_file_metadata(source)
+        assert encode_file_metadata(metadata) == data[-8 - length:]
+
+
+def test_concatenate_buffers_keeps_schema_and_rows():
+    sources = [pa.py_buffer(parquet_bytes(wide_table(i * 1000), row_group_size=400)) for i in range(3)]
+    assert can_concatenate(sources)
+
+    sink = io.BytesIO()
+    concatenator = ParquetConcatenator(sink)
+    for source in sources:
+        concatenator.append(source)
+    assert concatenator.close() == 3000
+
+    combined = pq.read_table(io.BytesIO(sink.getvalue()))
+    expected = pa.concat_tables(wide_table(i * 1000) for i in range(3))
+    assert combined.schema.field('created').type == pa.timestamp('us')
+    assert combined.equals(expected)
+    assert pq.read_metadata(io.BytesIO(sink.getvalue())).num_row_groups == 9
+
+
+def test_concatenate_rejects_different_schema():
+    first = parquet_bytes(wide_table(0))
+    other = parquet_bytes(wide_table(0).drop_columns(['name']))
+    assert not can_concatenate([first, other])
+
+    concatenator = ParquetConcatenator(io.BytesIO())
+    concatenator.append(first)
+    with pytest.raises(ValueError):
+        concatenator.append(other)
+
+
+def test_concatenate_refuses_page_indexes():
+    # Offset indexes hold absolute page offsets that a verbatim copy can't move
+    indexed = parquet_bytes(wide_table(0), write_page_index=True)
+    plain = parquet_bytes(wide_table(1000))
+    assert not can_concatenate([indexed, indexed])
+    assert not can_concatenate([plain, indexed])
+    assert can_concatenate([plain, plain])
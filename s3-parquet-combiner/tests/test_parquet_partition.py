@@ -0,0 +1,130 @@
+import io
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from parquet_partition import NULL_PARTITION, Partitioner, hive_partitions, restore_partition_columns
+from s3_parquet_no_download_combiner import PartitionedWriter, RollingParquetWriter
+
+
+def events() -> pa.Table:
+    return pa.table({
+        'id': pa.array(range(6), pa.int64()),
+        'course': pa.array(['a/b', 'c', None, 'a/b', 'c', 'a/b']),
+        'created': pa.array([datetime(2021, 5, 1), datetime(2022, 1, 2), datetime(2021, 7, 3),
+                             datetime(2022, 3, 4), datetime(2021, 9, 5), datetime(2021, 5, 6)], pa.timestamp('ms')),
+    })
+
+
+def test_split_routes_rows_to_escaped_hive_paths():
+    table = events()
+    partitioner = Partitioner([('course', 'identity'), ('created', 'year')], table.schema)
+    parts = dict(partitioner.split(table))
+
+    assert sorted(parts) == [f'course={NULL_PARTITION}/created_year=2021', 'course=a%2Fb/created_year=2021',
+                             'course=a%2Fb/created_year=2022', 'course=c/created_year=2021', 'course=c/created_year=2022']
+    # Rows keep their order, without the column their path holds
+    assert parts['course=a%2Fb/created_year=2021'].column('id').to_pylist() == [0, 5]
+    assert all(rows.schema == partitioner.file_schema for rows in parts.values())
+    assert 'course' not in partitioner.file_schema.names and 'created' in partitioner.file_schema.names
+
+
+def test_restore_partition_columns_round_trips_split():
+    table = events()
+    partitioner = Partitioner([('course', 'identity'), ('created', 'month')], table.schema)
+    restored = []
+    for path, rows in partitioner.split(table):
+        partitions = hive_partitions(f'exports/events/{path}/combined_001_1MB.parquet')
+        for batch in rows.to_batches():
+            restored.append(restore_partition_columns(batch, partitions, table.schema))
+
+    # The derived created_month isn't in the table's schema, so isn't added
+    result = pa.Table.from_batches(restored)
+    assert result.sort_by('id').equals(table)
+
+
+def test_restore_partition_columns_casts_to_the_schema_type():
+    schema = pa.schema([('id', pa.int64()), ('course_id', pa.int32())])
+    data = pa.table({'id': [1, 2]})
+    assert restore_partition_columns(data, {'course_id': '42'}, schema).column('course_id').to_pylist() == [42, 42]
+    assert restore_partition_columns(data, {'course_id': None}, schema).column('course_id').null_count == 2
+    assert restore_partition_columns(data, {}, schema) is data
+
+
+@pytest.mark.parametrize('values', [
+    pa.array([1, -5, None], pa.int8()),
+    pa.array([2 ** 63 + 5, 0], pa.uint64()),
+    pa.array(['a/b', 'x=y', '%', ' ', '']),
+    pa.array([True, False]),
+    pa.array([date(2021, 5, 1), date(1999, 12, 31)]),
+    pa.array([Decimal('1.50'), Decimal('-3.25')], pa.decimal128(5, 2)),
+    pa.array(['a', 'b', 'a']).dictionary_encode(),
+])
+def test_identity_partitions_round_trip_through_paths(values):
+    table = pa.table({'id': pa.array(range(len(values))), 'key': values})
+    partitioner = Partitioner([('key', 'identity')], table.schema)
+    restored = [restore_partition_columns(rows, hive_partitions(f'exports/t/{path}/combined_001_1MB.parquet'),
+                                          table.schema) for path, rows in partitioner.split(table)]
+    assert pa.concat_tables(restored).sort_by('id').equals(table)
+
+
+@pytest.mark.parametrize('field_type', [pa.timestamp('ms'), pa.timestamp('us', tz='UTC'), pa.binary(),
+                                        pa.large_binary(), pa.float64(), pa.float32(), pa.time64('us'),
+                                        pa.duration('s'), pa.list_(pa.int64())])
+def test_identity_partitioning_refuses_values_paths_cant_restore(field_type):
+    with pytest.raises(ValueError, match='round-trip'):
+        Partitioner([('key', 'identity')], pa.schema([('id', pa.int64()), ('key', field_type)]))
+
+
+def test_sort_keys_bring_each_partition_together():
+    table = events()
+    partitioner = Partitioner([('created', 'year'), ('course', 'identity')], table.schema)
+    ordered = partitioner.strip(partitioner.keyed(table).sort_by(partitioner.sort_keys))
+    assert ordered.schema == table.schema
+
+    paths = [path for batch in ordered.to_batches(max_chunksize=1) for path, _ in partitioner.split(pa.table(batch))]
+    runs = [path for i, path in enumerate(paths) if i == 0 or path != paths[i - 1]]
+    assert len(runs) == len(set(runs)) == 5  # No path comes back once another has started
+
+
+class LocalOutputs:
+    def __init__(self):
+        self.files = {}
+
+    def open_writer(self, schema, path):
+        def open_output(part):
+            return f'{path}/combined_{len(self.files) + part:03d}.parquet', io.BytesIO()
+
+        def name_output(key, sink, size):
+            self.files[key] = sink.getvalue()
+            return key
+
+        return RollingParquetWriter(open_output, schema, {}, name_output=name_output)
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_partitioned_writer_warns_when_a_closed_partition_comes_back(caplog, ordered):
+    table = events()
+    partitioner = Partitioner([('course', 'identity')], table.schema)
+    if ordered:
+        table = table.sort_by(partitioner.sort_keys)
+    outputs = LocalOutputs()
+    writer = PartitionedWriter(partitioner, lambda path: outputs.open_writer(partitioner.file_schema, path), max_open=1)
+
+    with caplog.at_level(logging.WARNING):
+        for batch in table.to_batches(max_chunksize=1):
+            writer.write(pa.table(batch))
+        result = writer.close()
+
+    assert sum(output['rows'] for output in result) == writer.rows == table.num_rows
+    if ordered:
+        assert len(result) == 3 and writer.reopened == 0 and not caplog.records
+    else:
+        assert len(result) == 6 and writer.reopened == 3
+        assert 'is written to again' in caplog.records[0].getMessage()
+    for output in result:
+        assert pq.read_table(io.BytesIO(outputs.files[output['key']])).num_rows == output['rows']
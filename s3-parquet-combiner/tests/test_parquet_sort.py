@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+import parquet_sort
+from parquet_sort import ZORDER_COLUMN, ExternalSorter, RowOrder, zorder_keys
+
+
+def random_table(rows: int, seed: int) -> pa.Table:
+    rng = np.random.default_rng(seed)
+    return pa.table({
+        'bucket': rng.integers(0, 20, rows),  # Plenty of ties for the second key to break
+        'value': pa.array([None if i % 53 == 0 else float(x) for i, x in enumerate(rng.random(rows))]),
+        'id': np.arange(seed * rows, (seed + 1) * rows),
+    })
+
+
+@pytest.mark.parametrize('sort_keys', [
+    [('id', 'ascending')],
+    [('bucket', 'ascending'), ('value', 'descending'), ('id', 'ascending')],
+])
+def test_external_sort_matches_in_memory_sort(monkeypatch, tmp_path, sort_keys):
+    # Small batches so the merge has to refill runs many times
+    monkeypatch.setattr(parquet_sort, 'SPILL_BATCH_ROWS', 97)
+    monkeypatch.setattr(parquet_sort, 'SORTED_CHUNK_ROWS', 500)
+    tables = [random_table(1000, seed) for seed in range(7)]
+    shuffled = [table.take(np.random.default_rng(seed).permutation(table.num_rows)) for seed, table in enumerate(tables)]
+
+    with ExternalSorter(sort_keys, buffer_bytes=40_000, spill_dir=str(tmp_path)) as sorter:
+        for table in shuffled:
+            sorter.add(table)
+        chunks = list(sorter.sorted())
+        assert len(sorter.runs) > 1
+    assert not os.listdir(tmp_path)  # Runs are removed on close
+
+    expected = pa.concat_tables(tables).sort_by(sort_keys)
+    result = pa.concat_tables(chunks)
+    assert result.select([name for name, _ in sort_keys]).equals(expected.select([name for name, _ in sort_keys]))
+    assert sorted(result.column('id').to_pylist()) == list(range(7000))
+    assert all(chunk.num_rows >= 500 for chunk in chunks[:-1])
+
+
+def test_external_sort_without_spilling_stays_in_memory(tmp_path):
+    table = random_table(1000, 0)
+    sort_keys = [('value', 'ascending'), ('id', 'ascending')]
+    with ExternalSorter(sort_keys, buffer_bytes=10 ** 9, spill_dir=str(tmp_path)) as sorter:
+        sorter.add(table.slice(500))
+        sorter.add(table.slice(0, 500))
+        result = pa.concat_tables(sorter.sorted())
+        assert sorter.runs == []
+    assert result.equals(table.sort_by(sort_keys))
+
+
+def test_zorder_keys_interleave_bits():
+    x = np.array([0b01, 0b10, 0b11], dtype=np.uint64)
+    y = np.array([0b00, 0b01, 0b11], dtype=np.uint64)
+    assert zorder_keys([x, y], 2).tolist() == [0b0001, 0b0110, 0b1111]
+
+
+def test_row_order_clusters_with_bounds_and_sorts_without():
+    table = pa.table({'a': pa.array([3, 0, 2, 1]), 'b': pa.array([0.0, 1.0, 1.0, 0.0]), 's': ['w', 'x', 'y', 'z']})
+
+    clustered = RowOrder(table.schema, cluster_by=['a', 'b'], bounds={'a': (0, 3), 'b': (0.0, 1.0)})
+    assert clustered.sort_keys == [(ZORDER_COLUMN, 'ascending')]
+    result = clustered.sort(table)
+    assert result.schema == table.schema
+    assert result.column('s').to_pylist() == ['z', 'w', 'x', 'y']
+
+    # Without bounds for every column, rows are sorted by the cluster columns instead
+    fallback = RowOrder(table.schema, cluster_by=['a', 'b'], bounds={'a': (0, 3)})
+    assert fallback.sort(table).column('a').to_pylist() == [0, 1, 2, 3]
+
+    with pytest.raises(ValueError):
+        RowOrder(table.schema, cluster_by=['s'])
+    with pytest.raises(ValueError):
+        RowOrder(table.schema, sort_by=['missing'])
@@ -0,0 +1,187 @@
+import hashlib
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+import s3_parquet_no_download_combiner as combiner
+from s3_inventory import S3Inventory
+from s3_parquet_no_download_combiner import S3ParquetCombiner
+
+PREFIX = 'exports/'
+
+
+class MemoryS3:
+    """The few S3 calls manifests and deletions make, against a dict of objects"""
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[Key] = Body
+        return {'ETag': f'"{hashlib.md5(Body).hexdigest()}"'}
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+        body = self.objects[Key]
+        return {'Body': type('Body', (), {'read': lambda self: body})()}
+
+    def delete_objects(self, Bucket, Delete):
+        for entry in Delete['Objects']:
+            self.objects.pop(entry['Key'], None)
+
+
+@pytest.fixture
+def make_combiner(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    s3 = MemoryS3()
+
+    def make(**options):
+        instance = S3ParquetCombiner('bucket', PREFIX, aws_access_key_id='test', aws_secret_access_key='test',
+                                     workers=1, fetch_workers=1, **options)
+        instance.s3_client = s3
+        instance.inventory = S3Inventory(s3, 'bucket', PREFIX)
+        for key, body in s3.objects.items():
+            instance.inventory.record(key, len(body), hashlib.md5(body).hexdigest())
+            name = key.rsplit('/', 1)[-1]
+            if (instance.resume or instance.incremental) and combiner.COMBINED_FILE_PATTERN.match(name):
+                path_parts = key[len(PREFIX):].split('/')
+                instance.combined_outputs[path_parts[0]].append((key, len(body), '/'.join(path_parts[1:-1])))
+        return instance
+
+    make.s3 = s3
+    return make
+
+
+def put(s3, name: str, body: bytes = None) -> tuple:
+    """Store an object under the table t and return its (key, size, relative_path) file tuple"""
+    key = f'{PREFIX}t/{name}'
+    s3.put_object(Bucket='bucket', Key=key, Body=body or name.encode())
+    return key, len(s3.objects[key]), ''
+
+
+def complete_job(instance, group, output_key, outputs):
+    """Record a finished job whose outputs are the given (name, bytes) pairs"""
+    written = [{'key': put(instance.s3_client, name, body)[0], 'size': len(body), 'rows': 1} for name, body in outputs]
+    instance.save_manifest(('t', group, output_key), 'complete', {'outputs': written, 'rows': len(written)})
+
+
+def test_resume_skips_completed_jobs_and_cleans_up_after_interrupted_ones(make_combiner):
+    s3 = make_combiner.s3
+    first = [put(s3, f'part{i}.parquet') for i in range(3)]
+    second = [put(s3, f'part{i}.parquet') for i in range(3, 6)]
+    planner = make_combiner(rolling=True)
+    done_key, running_key = f'{PREFIX}t/combined_001_rolling.parquet', f'{PREFIX}t/combined_002_rolling.parquet'
+    complete_job(planner, first, done_key, [('combined_001_40MB.parquet', b'done')])
+
+    # The second job was cut short after closing one output
+    leftover = put(s3, 'combined_002_512MB.parquet', b'partial')[0]
+    planner.save_manifest(('t', second, running_key), 'in_progress', {'outputs': [{'key': leftover}], 'rows': None})
+
+    resumed = make_combiner(rolling=True, resume=True)
+    jobs = [('t', first, done_key), ('t', second, running_key)]
+    assert resumed.pending_jobs(jobs) == [jobs[1]]
+    assert leftover not in s3.objects
+    assert f'{PREFIX}t/combined_001_40MB.parquet' in s3.objects
+
+
+def test_resume_deletes_the_outputs_of_a_job_whose_inputs_changed(make_combiner):
+    s3 = make_combiner.s3
+    group = [put(s3, f'part{i}.parquet') for i in range(3)]
+    output_key = f'{PREFIX}t/combined_001_rolling.parquet'
+    complete_job(make_combiner(rolling=True), group, output_key,
+                 [('combined_001_512MB.parquet', b'old rows'), ('combined_002_12MB.parquet', b'more old rows')])
+    put(s3, 'part1.parquet', b'rewritten since')
+
+    resumed = make_combiner(rolling=True, resume=True)
+    assert resumed.pending_jobs([('t', group, output_key)]) == [('t', group, output_key)]
+    # The redo names its outputs by their new sizes, so the old ones must not stay beside them
+    assert not [key for key in s3.objects if key.startswith(f'{PREFIX}t/combined_')]
+
+
+def test_resume_leaves_outputs_recombined_into_a_later_job(make_combiner):
+    s3 = make_combiner.s3
+    group = [put(s3, f'part{i}.parquet') for i in range(3)]
+    output_key = f'{PREFIX}t/combined_001_rolling.parquet'
+    first = make_combiner(rolling=True)
+    complete_job(first, group, output_key, [('combined_001_512MB.parquet', b'old rows'),
+                                            ('combined_002_12MB.parquet', b'more old rows')])
+    first.output_manifests[f'{PREFIX}t/combined_002_12MB.parquet'] = output_key
+    first.retire_outputs([f'{PREFIX}t/combined_002_12MB.parquet'], f'{PREFIX}t/combined_002_40MB.parquet')
+    put(s3, 'combined_002_12MB.parquet', b'a later output at the same key')
+    put(s3, 'part1.parquet', b'rewritten since')
+
+    resumed = make_combiner(rolling=True, resume=True)
+    assert resumed.pending_jobs([('t', group, output_key)]) == [('t', group, output_key)]
+    assert sorted(key for key in s3.objects if key.startswith(f'{PREFIX}t/combined_')) == [f'{PREFIX}t/combined_002_12MB.parquet']
+
+
+def test_incremental_combines_only_new_or_rewritten_files(make_combiner):
+    s3 = make_combiner.s3
+    group = [put(s3, f'part{i}.parquet') for i in range(3)]
+    complete_job(make_combiner(), group, f'{PREFIX}t/combined_001_1MB.parquet', [('combined_001_1MB.parquet', b'rows')])
+    new = put(s3, 'part3.parquet')
+    rewritten = put(s3, 'part0.parquet', b'rewritten since')
+
+    incremental = make_combiner(incremental=True)
+    assert sorted(incremental.select_new_files({'t': group[1:] + [rewritten, new]})['t']) == [rewritten, new]
+    assert incremental.first_output_index('t', '') == 2
+    assert incremental.select_new_files({'t': group[1:]}) == {}
+
+
+def test_incremental_deletes_outputs_of_unfinished_jobs(make_combiner):
+    s3 = make_combiner.s3
+    group = [put(s3, f'part{i}.parquet') for i in range(3)]
+    output_key = f'{PREFIX}t/combined_001_rolling.parquet'
+    leftover = put(s3, 'combined_001_512MB.parquet', b'partial')[0]
+    make_combiner().save_manifest(('t', group, output_key), 'in_progress',
+                                  {'outputs': [{'key': leftover}], 'rows': None})
+
+    incremental = make_combiner(incremental=True)
+    assert incremental.select_new_files({'t': group}) == {'t': group}
+    assert leftover not in s3.objects and incremental.combined_outputs['t'] == []
+    assert incremental.load_manifest(output_key)['status'] == 'discarded'
+
+
+def test_top_up_recombines_the_last_small_output_and_retires_it(make_combiner, monkeypatch):
+    monkeypatch.setattr(combiner, 'TARGET_SIZE_BYTES', 1000)
+    s3 = make_combiner.s3
+    group = [put(s3, f'part{i}.parquet') for i in range(3)]
+    first_key = f'{PREFIX}t/combined_001_1MB.parquet'
+    complete_job(make_combiner(), group, first_key, [('combined_001_1MB.parquet', b'small')])
+    new = [put(s3, f'part{i}.parquet') for i in range(3, 5)]
+
+    topping = make_combiner(incremental=True, top_up=True)
+    selected = topping.select_new_files({'t': group + new})['t']
+    assert selected == new + [(first_key, 5, '')]
+
+    # Once the recombining job completes, the output it absorbed is retired
+    second_key = f'{PREFIX}t/combined_002_1MB.parquet'
+    complete_job(topping, selected, second_key, [('combined_002_1MB.parquet', b'small and new')])
+    topping.retire_outputs([first_key], second_key)
+    assert first_key not in s3.objects
+    manifest = topping.load_manifest(first_key)
+    assert manifest['status'] == 'superseded'
+    assert manifest['superseded_outputs'] == [{'key': first_key, 'replaced_by': second_key}]
+
+    # Nothing is new afterwards
+    later = make_combiner(incremental=True, top_up=True)
+    assert later.select_new_files({'t': group + new}) == {}
+    assert second_key in s3.objects
+
+
+def test_incremental_retires_recombined_outputs_a_crash_left_behind(make_combiner):
+    s3 = make_combiner.s3
+    group = [put(s3, f'part{i}.parquet') for i in range(3)]
+    first_key = f'{PREFIX}t/combined_001_1MB.parquet'
+    complete_job(make_combiner(), group, first_key, [('combined_001_1MB.parquet', b'small')])
+    new = put(s3, 'part3.parquet')
+    # The top-up job completed, but the run stopped before deleting the output it absorbed
+    second_key = f'{PREFIX}t/combined_002_1MB.parquet'
+    complete_job(make_combiner(), [new, (first_key, 5, '')], second_key, [('combined_002_1MB.parquet', b'all')])
+
+    incremental = make_combiner(incremental=True)
+    assert incremental.select_new_files({'t': group + [new]}) == {}
+    assert first_key not in s3.objects
+    assert json.loads(s3.objects[incremental.manifest_key(first_key)])['status'] == 'superseded'
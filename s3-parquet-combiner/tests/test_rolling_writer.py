@@ -0,0 +1,125 @@
+import io
+from types import SimpleNamespace
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import s3_parquet_no_download_combiner as combiner
+from s3_parquet_no_download_combiner import RollingParquetWriter, S3ParquetCombiner
+
+
+class LocalOutputs:
+    """open_output/name_output pair keeping every output in memory"""
+
+    def __init__(self):
+        self.files = {}
+
+    def open_output(self, part):
+        return f'out/combined_{part + 1:03d}_512MB.parquet', io.BytesIO()
+
+    def name_output(self, key, sink, size):
+        final_key = key.replace('512MB', f'{size}B')
+        self.files[final_key] = sink.getvalue()
+        return final_key
+
+    def row_groups(self, key):
+        metadata = pq.read_metadata(io.BytesIO(self.files[key]))
+        return [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+
+
+def batches(count, rows):
+    rng = np.random.default_rng(0)
+    for i in range(count):
+        yield pa.table({'id': np.arange(i * rows, (i + 1) * rows), 'value': rng.random(rows)})
+
+
+def test_rollover_carries_rows_into_the_next_row_group():
+    outputs = LocalOutputs()
+    closed = []
+    writer = RollingParquetWriter(outputs.open_output, pa.schema([('id', pa.int64()), ('value', pa.float64())]),
+                                  {'compression': 'none'}, target_bytes=200_000, row_group_rows=3000,
+                                  name_output=outputs.name_output, on_output=closed.append)
+    for table in batches(40, 700):
+        writer.write(table)
+    result = writer.close()
+
+    assert len(result) > 1
+    assert closed == result
+    assert [output['key'] for output in result] == list(outputs.files)
+    assert all(output['size'] == len(outputs.files[output['key']]) for output in result)
+
+    # Only the very last row group of the stream may be short
+    row_groups = [rows for output in result for rows in outputs.row_groups(output['key'])]
+    assert all(rows == 3000 for rows in row_groups[:-1])
+    assert sum(row_groups) == writer.rows == 40 * 700
+
+    ids = pa.concat_tables(pq.read_table(io.BytesIO(outputs.files[output['key']])) for output in result)
+    assert ids.column('id').to_pylist() == list(range(40 * 700))
+
+
+def test_unsized_writer_keeps_tables_whole():
+    outputs = LocalOutputs()
+    writer = RollingParquetWriter(outputs.open_output, pa.schema([('id', pa.int64()), ('value', pa.float64())]),
+                                  {}, name_output=outputs.name_output)
+    for table in batches(3, 500):
+        writer.write(table)
+    (output,) = writer.close()
+    assert outputs.row_groups(output['key']) == [500, 500, 500]
+
+
+def test_split_rolling_gives_each_worker_a_contiguous_run(monkeypatch):
+    monkeypatch.setattr(combiner, 'TARGET_SIZE_BYTES', 1000)
+    files = [(f'part{i:03d}.parquet', size, '') for i, size in enumerate([100, 300, 50, 50, 200, 100, 100, 100] * 8)]
+
+    runs = S3ParquetCombiner.split_rolling(SimpleNamespace(workers=4), files)
+    assert len(runs) == 4
+    assert [file_info for run in runs for file_info in run] == files
+    assert max(sum(size for _, size, _ in run) for run in runs) <= 2000
+
+    # No more runs than target-sized outputs, however many workers there are
+    assert len(S3ParquetCombiner.split_rolling(SimpleNamespace(workers=64), files)) == 8
+    assert S3ParquetCombiner.split_rolling(SimpleNamespace(workers=1), files) == [files]
+
+
+class Sink(io.BytesIO):
+    def __init__(self, key, started=False):
+        super().__init__()
+        self.key, self.started = key, started
+
+    def rename(self, key):
+        if self.started:
+            return False
+        self.key = key
+        return True
+
+
+def test_outputs_are_recorded_before_they_are_closed():
+    sinks = []
+
+    def open_output(part):
+        sinks.append(Sink(f'out/combined_{part + 1:03d}_512MB.parquet'))
+        return sinks[-1].key, sinks[-1]
+
+    def on_output(output):
+        assert not sinks[-1].closed  # A crash from here on leaves only recorded keys behind
+
+    writer = RollingParquetWriter(open_output, pa.schema([('id', pa.int64()), ('value', pa.float64())]), {},
+                                  target_bytes=50_000, on_output=on_output)
+    for table in batches(10, 1000):
+        writer.write(table)
+    assert len(writer.close()) > 1 and all(sink.closed for sink in sinks)
+
+
+def test_name_output_renames_only_while_an_upload_can_still_move():
+    rolling = SimpleNamespace(rolling=True, partition_by=None,
+                              output_index=lambda key: S3ParquetCombiner.output_index(None, key))
+    key = 'exports/t/combined_007_512MB.parquet'
+    size = 41 * 1024 * 1024
+    assert S3ParquetCombiner.name_output(rolling, key, Sink(key), size) == 'exports/t/combined_007_41MB.parquet'
+    assert S3ParquetCombiner.name_output(rolling, key, Sink(key, started=True), size) == key
+
+    # A single-output job keeps the key it was planned with
+    planned = SimpleNamespace(rolling=False, partition_by=None)
+    assert S3ParquetCombiner.name_output(planned, 'exports/t/combined_001_480MB.parquet', Sink(key), size) == \
+        'exports/t/combined_001_480MB.parquet'
@@ -0,0 +1,80 @@
+import io
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from parquet_footer import row_group_bounds
+from s3_parquet_combined_integrity_verifier import S3ParquetVerifier
+
+
+@pytest.fixture
+def verifier(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    return S3ParquetVerifier('bucket', 'exports', aws_access_key_id='test', aws_secret_access_key='test',
+                             level='sample')
+
+
+def metadata_of(table: pa.Table, **options) -> pq.FileMetaData:
+    sink = io.BytesIO()
+    pq.write_table(table, sink, **options)
+    return pq.read_metadata(io.BytesIO(sink.getvalue()))
+
+
+def keyed_table() -> pa.Table:
+    return pa.table({
+        'id': pa.array(list(range(0, 300)), pa.int64()),
+        'created': pa.array([i * 1000 for i in range(300)], pa.timestamp('ms')),
+        'score': pa.array([i / 3 for i in range(300)]),
+        'note': pa.array([None] * 100 + [f'n{i:03d}' for i in range(100, 300)]),
+    })
+
+
+def test_row_group_bounds_reads_per_row_group_statistics():
+    metadata = metadata_of(keyed_table(), row_group_size=100)
+    assert row_group_bounds(metadata, 'id') == [(100, 0, 99), (100, 100, 199), (100, 200, 299)]
+    # A row group holding only nulls has no bounds
+    assert row_group_bounds(metadata, 'note') == [(100, None, None), (100, 'n100', 'n199'), (100, 'n200', 'n299')]
+    assert row_group_bounds(metadata_of(keyed_table(), write_statistics=False), 'id') == [(300, None, None)]
+
+
+def test_key_bounds_compare_timestamps_as_integers(verifier):
+    metadata = metadata_of(keyed_table(), row_group_size=100)
+    bounds = verifier.key_bounds(metadata, 'created', pa.timestamp('ms'))
+    assert bounds == [(100, 0, 99000), (100, 100000, 199000), (100, 200000, 299000)]
+    assert verifier.sample_key_type(pa.float64()) is None
+
+
+def test_choose_sample_column_prefers_the_best_covered_orderable_column(verifier):
+    table = keyed_table()
+    metadatas = [metadata_of(table, row_group_size=100)]
+    # id and created are covered in every row group, note in two; score is a float and never keys a sample
+    assert verifier.choose_sample_column(table.schema, metadatas) == 'id'
+    assert verifier.choose_sample_column(table.select(['score', 'note']).schema, metadatas) == 'note'
+
+    verifier.sample_column = 'created'
+    assert verifier.choose_sample_column(table.schema, metadatas) == 'created'
+    verifier.sample_column = 'missing'
+    with pytest.raises(ValueError):
+        verifier.choose_sample_column(table.schema, metadatas)
+
+
+def test_overlapping_ranges(verifier):
+    ranges = [(0, 9), (20, 29), (40, 49)]
+    assert verifier.overlapping_ranges(ranges, 5, 25) == [(0, 9), (20, 29)]
+    assert verifier.overlapping_ranges(ranges, 10, 19) == []
+    assert verifier.overlapping_ranges(ranges, 49, 100) == [(40, 49)]
+
+
+def test_filter_key_ranges_keeps_rows_inside_the_ranges(verifier):
+    table = keyed_table()
+    sampled = verifier.filter_key_ranges(table, 'id', [(10, 12), (250, 251)])
+    assert sampled.column('id').to_pylist() == [10, 11, 12, 250, 251]
+
+    sampled = verifier.filter_key_ranges(table, 'created', [(5000, 6000)])
+    assert sampled.column('id').to_pylist() == [5, 6]
+
+    # Null keys never fall in a range
+    sampled = verifier.filter_key_ranges(table, 'note', [('n000', 'n150')])
+    assert sampled.num_rows == 51
+    assert verifier.filter_key_ranges(table.slice(0, 100), 'note', [('a', 'z')]).num_rows == 0